@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2 hasher whose work factor comes from PASSWORD_PBKDF2_ITERATIONS.
+
+    Size the value with `manage.py benchmark_hashers --target-ms ...`.
+    Existing hashes are upgraded to the configured iterations on next login.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', None) or PBKDF2PasswordHasher.iterations
@@ -0,0 +1,57 @@
+import statistics
+import time
+
+from django.contrib.auth.hashers import get_hasher, get_hashers
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure password hasher cost on this machine (one worker) and suggest '
+        'PBKDF2 iterations for a target login latency.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--algorithm', action='append', dest='algorithms',
+                            help='Hasher algorithm to measure (repeatable). Default: all configured hashers.')
+        parser.add_argument('--rounds', type=int, default=5, help='Timed verifications per hasher.')
+        parser.add_argument('--target-ms', type=float, default=None,
+                            help='Suggest PASSWORD_PBKDF2_ITERATIONS for this per-login hashing budget.')
+
+    def _measure(self, hasher, rounds):
+        encoded = hasher.encode('benchmark-password', hasher.salt())
+        hasher.verify('benchmark-password', encoded)  # warm up
+        timings = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            hasher.verify('benchmark-password', encoded)
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
+
+    def handle(self, *args, **options):
+        if options['algorithms']:
+            try:
+                hashers = [get_hasher(algorithm) for algorithm in options['algorithms']]
+            except ValueError as e:
+                raise CommandError(e)
+        else:
+            hashers = get_hashers()
+
+        self.stdout.write(f"{'algorithm':<24}{'work factor':>14}{'ms/hash':>10}{'logins/s/worker':>18}")
+        for hasher in hashers:
+            try:
+                seconds = self._measure(hasher, options['rounds'])
+            except ValueError as e:
+                # Optional libraries (argon2, bcrypt) may not be installed
+                self.stdout.write(f'{hasher.algorithm:<24}  skipped: {e}')
+                continue
+            work = getattr(hasher, 'iterations', None) or getattr(hasher, 'rounds', None) or getattr(hasher, 'work_factor', '-')
+            self.stdout.write(
+                f'{hasher.algorithm:<24}{str(work):>14}{seconds * 1000:>10.1f}{1 / seconds:>18.1f}'
+            )
+
+            if options['target_ms'] and hasher.algorithm == 'pbkdf2_sha256':
+                suggested = int(hasher.iterations * options['target_ms'] / (seconds * 1000))
+                self.stdout.write(self.style.SUCCESS(
+                    f'  -> PASSWORD_PBKDF2_ITERATIONS = {suggested} for ~{options["target_ms"]:.0f} ms per login'
+                ))
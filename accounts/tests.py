@@ -1,3 +1,158 @@
-from django.test import TestCase
+import threading
+import time
+import warnings
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from ecommerce_site.clientip import get_client_ip
+from perf.querybudget import QueryBudgetMixin
+from .throttling import TokenBucket
+
+
+class AccountsQueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('ada', 'ada@example.com', 'analytical-engine')
+
+    def test_register(self):
+        with self.assertQueryBudget(0):
+            self.client.get(reverse('accounts:register'))
+        with self.assertQueryBudget(4):
+            self.client.post(reverse('accounts:register'), {
+                'username': 'grace', 'email': 'grace@example.com',
+                'first_name': 'Grace', 'last_name': 'Hopper',
+                'password1': 'compiler-1952', 'password2': 'compiler-1952',
+            })
+
+    def test_login(self):
+        with self.assertQueryBudget(0):
+            self.client.get(reverse('accounts:login'))
+        with self.assertQueryBudget(12):
+            self.client.post(reverse('accounts:login'), {
+                'username': 'ada', 'password': 'analytical-engine',
+            })
+
+    def test_logout(self):
+        self.client.force_login(self.user)
+        with self.assertQueryBudget(4):
+            self.client.get(reverse('accounts:logout'))
+
+    def test_profile(self):
+        self.client.force_login(self.user)
+        with self.assertQueryBudget(4):
+            self.client.get(reverse('accounts:profile'))
+
+
+class ClientIPTests(SimpleTestCase):
+
+    def _ip(self, remote_addr, forwarded=None):
+        extra = {'HTTP_X_FORWARDED_FOR': forwarded} if forwarded else {}
+        return get_client_ip(RequestFactory().get('/', REMOTE_ADDR=remote_addr, **extra))
+
+    @override_settings(TRUSTED_PROXIES=['127.0.0.1', '10.0.0.0/8'])
+    def test_forwarded_for_from_trusted_proxies(self):
+        self.assertEqual(self._ip('127.0.0.1', '203.0.113.7'), '203.0.113.7')
+        # Client-supplied entries left of the real client are ignored
+        self.assertEqual(self._ip('127.0.0.1', '1.2.3.4, 203.0.113.7, 10.1.2.3'), '203.0.113.7')
+        self.assertEqual(self._ip('127.0.0.1'), '127.0.0.1')
+        # Unix socket
+        self.assertEqual(self._ip('', '203.0.113.7'), '203.0.113.7')
+        # Not a trusted proxy: the header is the client's own claim
+        self.assertEqual(self._ip('198.51.100.1', '203.0.113.7'), '198.51.100.1')
+
+    @override_settings(TRUSTED_PROXIES=[])
+    def test_no_trusted_proxies(self):
+        self.assertEqual(self._ip('127.0.0.1', '203.0.113.7'), '127.0.0.1')
+
+
+class SlowCache:
+    """A cache whose reads take a network round trip, to widen races"""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self.cache, name)
+
+    def get(self, *args, **kwargs):
+        value = self.cache.get(*args, **kwargs)
+        time.sleep(0.001)
+        return value
+
+
+@override_settings(LOGIN_THROTTLE_RATES={'ip': '3/60', 'username': '2/60'}, TRUSTED_PROXIES=['127.0.0.1'])
+class LoginThrottleTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user('ada', 'ada@example.com', 'analytical-engine')
+
+    def _login(self, username='ada', password='wrong', client_ip='203.0.113.7'):
+        return self.client.post(
+            reverse('accounts:login'), {'username': username, 'password': password},
+            HTTP_X_FORWARDED_FOR=client_ip,
+        )
+
+    def test_username_bucket(self):
+        self.assertEqual(self._login().status_code, 200)
+        self.assertEqual(self._login(username='ADA', client_ip='203.0.113.8').status_code, 200)
+        response = self._login(password='analytical-engine', client_ip='203.0.113.9')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+    def test_ip_bucket_is_per_client_behind_the_proxy(self):
+        for username in ('a', 'b', 'c'):
+            self.assertEqual(self._login(username=username).status_code, 200)
+        self.assertEqual(self._login(username='d').status_code, 429)
+        # Another client behind the same proxy is unaffected
+        self.assertEqual(self._login(username='d', client_ip='203.0.113.99').status_code, 200)
+
+    def test_successful_login_resets_username_bucket(self):
+        self._login()
+        self.assertEqual(self._login(password='analytical-engine').status_code, 302)
+        self.client.logout()
+        self.assertEqual(self._login(client_ip='203.0.113.8').status_code, 200)
+
+    def test_refused_attempts_do_not_use_up_the_other_bucket(self):
+        self._login()
+        self._login()
+        # Refused by the username bucket; the client IP keeps its last attempt
+        self.assertEqual(self._login().status_code, 429)
+        self.assertEqual(self._login(username='bob').status_code, 200)
+        self.assertEqual(self._login(username='eve').status_code, 429)
+
+    def test_any_username_makes_a_valid_cache_key(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', CacheKeyWarning)
+            self.assertEqual(self._login(username=' ada lovelace\x00' + 'x' * 300).status_code, 200)
+
+    def test_attempt_goes_ahead_when_the_lock_is_stuck(self):
+        bucket = TokenBucket('login-throttle:test', capacity=5, refill_rate=0.001)
+        bucket.lock_timeout = 0.05
+        cache.add('login-throttle:test:lock', 'crashed worker', 60)
+
+        self.assertEqual(bucket.consume(), 0)
+        self.assertEqual(cache.get('login-throttle:test')[0], 4)
+        self.assertEqual(cache.get('login-throttle:test:lock'), 'crashed worker')
+
+    def test_parallel_attempts_cannot_overdraw(self):
+        bucket = TokenBucket('login-throttle:test', capacity=5, refill_rate=0.001, cache=SlowCache(cache))
+        start = threading.Barrier(20)
+        results = []
+
+        def attempt():
+            start.wait()
+            results.append(bucket.consume())
+
+        threads = [threading.Thread(target=attempt) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count(0), 5)
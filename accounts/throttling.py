@@ -0,0 +1,144 @@
+"""
+Login Throttling
+Token buckets per client IP and per username, kept in the Django cache,
+checked before any password hashing happens. The client IP is read through
+the trusted proxies (see ecommerce_site/clientip.py), so clients behind the
+local reverse proxy don't share one bucket.
+"""
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+from ecommerce_site.clientip import get_client_ip
+
+
+def parse_rate(rate):
+    """
+    Parse a ``'<count>/<seconds>'`` rate into (capacity, tokens per second)
+
+    Example: '5/300' allows a burst of 5 attempts, refilling 5 every 5 minutes.
+    """
+    count, seconds = rate.split('/')
+    return int(count), int(count) / float(seconds)
+
+
+class TokenBucket:
+    """
+    Token bucket stored as ``(tokens, updated_at)`` under a cache key.
+
+    The read-modify-write runs under a short ``cache.add()`` lock, which is
+    atomic on every backend, so parallel attempts (across workers on a shared
+    cache) can't all see the same full bucket. Only a burst against the same
+    key contends for it; an attempt that still can't get it after
+    ``lock_timeout`` (when a crashed holder's lock has expired anyway) goes
+    ahead without it rather than refusing a legitimate login.
+    """
+    lock_timeout = 2
+
+    def __init__(self, key, capacity, refill_rate, cache=None):
+        self.key = key
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.cache = cache or caches[settings.LOGIN_THROTTLE_CACHE]
+
+    def _current(self, now):
+        tokens, updated_at = self.cache.get(self.key, (self.capacity, now))
+        return min(self.capacity, tokens + (now - updated_at) * self.refill_rate)
+
+    def _take(self, available, tokens, now):
+        # Expire the key once the bucket would be full again anyway
+        timeout = int((self.capacity - available + tokens) / self.refill_rate) + 1
+        self.cache.set(self.key, (available - tokens, now), timeout)
+
+    def _acquire(self):
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.lock_timeout
+        delay = 0.005
+        while not self.cache.add(f'{self.key}:lock', token, self.lock_timeout):
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+        return token
+
+    def _release(self, token):
+        # Don't delete a lock that timed out and was taken over by another attempt
+        if token is not None and self.cache.get(f'{self.key}:lock') == token:
+            self.cache.delete(f'{self.key}:lock')
+
+    def consume(self, tokens=1):
+        """
+        Take tokens from the bucket.
+
+        Returns:
+            float: 0 if allowed, otherwise seconds until enough tokens refill
+        """
+        return consume_all([self], tokens)
+
+    def reset(self):
+        self.cache.delete(self.key)
+
+
+def consume_all(buckets, tokens=1):
+    """
+    Take tokens from every bucket, or from none of them: an attempt refused
+    by one bucket doesn't use up the others. The locks are always taken in
+    the order given, so two attempts can't wait on each other.
+
+    Returns:
+        float: 0 if allowed, otherwise seconds until every bucket has enough tokens
+    """
+    locks = []
+    try:
+        for bucket in buckets:
+            locks.append((bucket, bucket._acquire()))
+        now = time.time()
+        available = [bucket._current(now) for bucket in buckets]
+        wait = max(
+            ((tokens - left) / bucket.refill_rate for bucket, left in zip(buckets, available) if left < tokens),
+            default=0,
+        )
+        if wait:
+            return wait
+        for bucket, left in zip(buckets, available):
+            bucket._take(left, tokens, now)
+        return 0
+    finally:
+        for bucket, token in reversed(locks):
+            bucket._release(token)
+
+
+def _bucket_key(scope, value):
+    # Usernames are user input: hashed, they can't break the cache key
+    digest = hashlib.sha256(value.encode()).hexdigest()
+    return f'login-throttle:{scope}:{digest}'
+
+
+def _buckets(request, username):
+    buckets = []
+    for scope, value in (('ip', get_client_ip(request)), ('username', (username or '').strip().lower())):
+        rate = settings.LOGIN_THROTTLE_RATES.get(scope)
+        if rate and value:
+            capacity, refill_rate = parse_rate(rate)
+            buckets.append(TokenBucket(_bucket_key(scope, value), capacity, refill_rate))
+    return buckets
+
+
+def throttle_login(request, username):
+    """
+    Consume one login attempt for the client IP and the username.
+
+    Returns:
+        float: 0 if the attempt may proceed, otherwise seconds to wait
+    """
+    return consume_all(_buckets(request, username))
+
+
+def reset_login_throttle(request, username):
+    """Forget the username's failed attempts after a successful login"""
+    for bucket in _buckets(request, username):
+        if bucket.key.startswith('login-throttle:username:'):
+            bucket.reset()
@@ -1,9 +1,11 @@
+import math
 from django.shortcuts import render, redirect
-from django.contrib.auth import login, authenticate, logout
+from django.contrib.auth import login, logout
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from .forms import CustomUserCreationForm
+from .throttling import reset_login_throttle, throttle_login
 
 
 def register(request):
@@ -27,19 +29,25 @@ def user_login(request):
     User login view using Django's AuthenticationForm.
     """
     if request.method == 'POST':
+        # Throttle before the form runs authenticate() and hashes the password
+        wait = throttle_login(request, request.POST.get('username'))
+        if wait:
+            messages.error(request, f'Too many login attempts. Please try again in {math.ceil(wait)} seconds.')
+            response = render(request, 'accounts/login.html', {'form': AuthenticationForm()}, status=429)
+            response['Retry-After'] = str(math.ceil(wait))
+            return response
+        
         form = AuthenticationForm(request, data=request.POST)
         if form.is_valid():
-            username = form.cleaned_data.get('username')
-            password = form.cleaned_data.get('password')
-            user = authenticate(username=username, password=password)
-            if user is not None:
-                login(request, user)
-                messages.info(request, f'You are now logged in as {username}.')
-                # Redirect to next page if specified, otherwise to home
-                next_page = request.GET.get('next', 'shop:product_list')
-                return redirect(next_page)
-            else:
-                messages.error(request, 'Invalid username or password.')
+            # The form has already authenticated the user; don't hash the password twice
+            user = form.get_user()
+            username = user.get_username()
+            reset_login_throttle(request, request.POST.get('username'))
+            login(request, user)
+            messages.info(request, f'You are now logged in as {username}.')
+            # Redirect to next page if specified, otherwise to home
+            next_page = request.GET.get('next', 'shop:product_list')
+            return redirect(next_page)
         else:
             messages.error(request, 'Invalid username or password.')
     else:
@@ -61,10 +69,10 @@ def profile(request):
     """
     User profile view (requires login).
     """
-    from orders.models import Order
+    from orders.archive import cached_order_history
     
     # Get recent orders for the user
-    recent_orders = Order.objects.filter(user=request.user)[:5]
+    recent_orders = cached_order_history(request.user)[:5]
     
     return render(request, 'accounts/profile.html', {
         'user': request.user,
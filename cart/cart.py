@@ -9,11 +9,9 @@ class Cart:
         Initialize the cart.
         """
         self.session = request.session
-        cart = self.session.get(settings.CART_SESSION_ID)
-        if not cart:
-            # save an empty cart in the session
-            cart = self.session[settings.CART_SESSION_ID] = {}
-        self.cart = cart
+        # An empty cart is only written to the session on the first save(),
+        # so browsing doesn't create a session for every visitor
+        self.cart = self.session.get(settings.CART_SESSION_ID) or {}
 
     def add(self, product, quantity=1, override_quantity=False):
         """
@@ -33,8 +31,9 @@ class Cart:
 
     def save(self):
         """
-        Mark the session as "modified" to make sure it gets saved.
+        Store the cart in the session and mark it as "modified" to make sure it gets saved.
         """
+        self.session[settings.CART_SESSION_ID] = self.cart
         self.session.modified = True
 
     def remove(self, product):
@@ -51,9 +50,19 @@ class Cart:
         Iterate over the items in the cart and get the products
         from the database.
         """
-        product_ids = self.cart.keys()
-        # get the product objects and add them to the cart
-        products = Product.objects.filter(id__in=product_ids)
+        yield from self._items(self._products())
+
+    async def aitems(self):
+        """
+        List the cart items like iterating over the cart, for async views.
+        """
+        return list(self._items([product async for product in self._products()]))
+
+    def _products(self):
+        return Product.objects.filter(id__in=self.cart.keys()).select_related('category')
+
+    def _items(self, products):
+        # add the product objects to the cart
         cart = self.cart.copy()
         for product in products:
             cart[str(product.id)]['product'] = product
@@ -79,5 +88,6 @@ class Cart:
         """
         Remove cart from session.
         """
-        del self.session[settings.CART_SESSION_ID]
-        self.save()
\ No newline at end of file
+        self.session.pop(settings.CART_SESSION_ID, None)
+        self.cart = {}
+        self.session.modified = True
\ No newline at end of file
@@ -1,3 +1,66 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from perf.querybudget import QueryBudgetMixin
+from shop.models import Category, Product
+
+
+class CartQueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Books', slug='books')
+        self.products = [
+            Product.objects.create(
+                category=category, name=f'Book {i}', slug=f'book-{i}',
+                price=Decimal('10.00'), stock=5
+            )
+            for i in range(5)
+        ]
+
+    def _fill_cart(self):
+        session = self.client.session
+        session['cart'] = {
+            str(product.id): {'quantity': 1, 'price': str(product.price)}
+            for product in self.products
+        }
+        session.save()
+
+    def test_cart_detail(self):
+        self._fill_cart()
+        # One query for all products with their categories, plus the session
+        with self.assertQueryBudget(2, max_repeats=1):
+            response = self.client.get(reverse('cart:cart_detail'))
+        self.assertContains(response, 'Book 4')
+
+    def test_cart_add(self):
+        with self.assertQueryBudget(5):
+            self.client.post(reverse('cart:cart_add', args=[self.products[0].id]), {'quantity': 1})
+
+    def test_cart_remove(self):
+        self._fill_cart()
+        with self.assertQueryBudget(5):
+            self.client.post(reverse('cart:cart_remove', args=[self.products[0].id]))
+
+
+@override_settings(ASYNC_VIEWS=True)
+class AsyncCartViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Books', slug='books')
+        self.product = Product.objects.create(
+            category=category, name='Book', slug='book', price=Decimal('10.00'), stock=5
+        )
+
+    async def test_cart_detail(self):
+        response = await self.async_client.get(reverse('cart:cart_detail'))
+        self.assertEqual(response.status_code, 200)
+
+        await self.async_client.post(reverse('cart:cart_add', args=[self.product.id]), {'quantity': 3})
+        response = await self.async_client.get(reverse('cart:cart_detail'))
+        self.assertContains(response, 'Book')
+        self.assertContains(response, '30.00')
@@ -1,10 +1,11 @@
 from django.urls import path
+from ecommerce_site.async_views import async_path
 from . import views
 
 app_name = 'cart'
 
 urlpatterns = [
-    path('', views.cart_detail, name='cart_detail'),
+    async_path('', views.cart_detail, views.acart_detail, name='cart_detail'),
     path('add/<int:product_id>/', views.cart_add, name='cart_add'),
     path('remove/<int:product_id>/', views.cart_remove, name='cart_remove'),
 ]
\ No newline at end of file
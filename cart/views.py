@@ -1,5 +1,7 @@
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.decorators.http import require_POST
+from ecommerce_site.async_views import aload_request
 from shop.models import Product
 from .cart import Cart
 from .forms import CartAddProductForm
@@ -39,11 +41,27 @@ def cart_detail(request):
     Display the cart contents.
     """
     cart = Cart(request)
-    for item in cart:
+    # Iterate once: every pass over the cart queries the products
+    items = list(cart)
+    return _render_detail(request, cart, items)
+
+
+async def acart_detail(request):
+    """
+    cart_detail() for ASGI.
+    """
+    await aload_request(request)
+    cart = Cart(request)
+    items = await cart.aitems()
+    return _render_detail(request, cart, items)
+
+
+def _render_detail(request, cart, items):
+    for item in items:
         item['update_quantity_form'] = CartAddProductForm(
             initial={
                 'quantity': item['quantity'],
                 'override': True
             }
         )
-    return render(request, 'cart/detail.html', {'cart': cart})
+    return render(request, 'cart/detail.html', {'cart': cart, 'items': items}, using=settings.HOT_TEMPLATE_ENGINE)
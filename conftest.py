@@ -0,0 +1 @@
+pytest_plugins = ['perf.pytest_plugin']
@@ -12,5 +12,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce_site.settings')
+# Serve the async views (see ecommerce_site/async_views.py)
+os.environ.setdefault('ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
+
+# Load views and URL patterns now: in the gunicorn master when preloading
+from ecommerce_site.startup import warm_up  # noqa: E402
+
+warm_up()
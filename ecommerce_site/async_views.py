@@ -0,0 +1,48 @@
+"""
+Async Views
+Read-heavy pages have async implementations that run on the event loop under
+ASGI, so a request waiting on the cache or the database doesn't hold a
+thread. Under WSGI Django would have to start an event loop for each call to
+an async view, so the sync implementation is served there instead:
+async_path() routes to one or the other per request, following
+settings.ASYNC_VIEWS (switched on by ecommerce_site/asgi.py).
+"""
+from django.conf import settings
+from django.urls import URLPattern
+from django.urls.resolvers import RoutePattern
+
+
+class AsyncURLPattern(URLPattern):
+    """URL pattern resolving to ``async_callback`` while ASYNC_VIEWS is on"""
+
+    def __init__(self, pattern, callback, async_callback, default_args=None, name=None):
+        super().__init__(pattern, callback, default_args, name)
+        self.async_callback = async_callback
+
+    def resolve(self, path):
+        match = super().resolve(path)
+        if match is not None and settings.ASYNC_VIEWS:
+            match.func = self.async_callback
+        return match
+
+
+def async_path(route, view, async_view, kwargs=None, name=None):
+    """path() with an async implementation of the view for ASGI"""
+    return AsyncURLPattern(RoutePattern(route, name=name, is_endpoint=True), view, async_view, kwargs, name)
+
+
+async def aload_request(request):
+    """
+    Load the session and the user without blocking the event loop.
+
+    Templates and context processors (cart badge, user menu, messages) read
+    both synchronously; once loaded they are served from memory, whereas a
+    lazy load from async code would raise SynchronousOnlyOperation.
+    """
+    await request.session.akeys()
+    request.user = await request.auser()
+
+
+async def alist(queryset):
+    """Evaluate a queryset (prefetches included) from async code"""
+    return [obj async for obj in queryset]
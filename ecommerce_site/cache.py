@@ -0,0 +1,236 @@
+"""
+Cache-Aside Helper
+Caches expensive computations (querysets, aggregates) without stampedes:
+
+- single-flight: only the worker holding a short ``cache.add()`` lock
+  recomputes a key, the others wait for it (cold key) or keep serving the
+  previous value (stale key)
+- probabilistic early refresh (XFetch): as expiry approaches, a worker is
+  increasingly likely to refresh early, weighted by how long the last
+  recomputation took
+- stale-while-revalidate: entries outlive their TTL by ``stale_ttl`` so
+  there is always something to serve while one worker refreshes
+- per-process hit/miss/recompute counters, see cache_metrics()
+
+Works with any Django cache backend; on local-memory caches single-flight
+applies per process, on shared backends (Redis, Memcached) across all nodes.
+aget_or_compute() and aversioned_key() are the same for async views.
+"""
+import asyncio
+import math
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+_metrics = Counter()
+_metrics_lock = threading.Lock()
+
+
+def record_event(key, event):
+    """Count a cache event under the key's namespace (the part before the first ':')"""
+    namespace = key.split(':', 1)[0]
+    with _metrics_lock:
+        _metrics[namespace, event] += 1
+
+
+def cache_metrics():
+    """
+    Return the counters recorded by this process as
+    ``{namespace: {event: count}}``. Events: hit, stale, miss, wait,
+    recompute, early_refresh.
+    """
+    with _metrics_lock:
+        snapshot = {}
+        for (namespace, event), count in _metrics.items():
+            snapshot.setdefault(namespace, {})[event] = count
+        return snapshot
+
+
+def reset_cache_metrics():
+    with _metrics_lock:
+        _metrics.clear()
+
+
+def get_cache():
+    return caches[getattr(settings, 'CACHE_ASIDE_CACHE', 'default')]
+
+
+def _acquire(cache, key, timeout):
+    token = uuid.uuid4().hex
+    return token if cache.add(f'{key}:lock', token, timeout) else None
+
+
+def _release(cache, key, token):
+    # Don't delete a lock that timed out and was taken over by another worker
+    if cache.get(f'{key}:lock') == token:
+        cache.delete(f'{key}:lock')
+
+
+def _recompute(cache, key, compute, ttl, stale_ttl):
+    started = time.perf_counter()
+    value = compute()
+    delta = time.perf_counter() - started
+    cache.set(key, (value, time.time() + ttl, delta), ttl + stale_ttl)
+    record_event(key, 'recompute')
+    return value
+
+
+def _fresh(now, expires_at, delta, beta):
+    # XFetch: -log(u) is exponentially distributed, so early refreshes
+    # become likely only within a few recompute durations of expiry
+    return now - delta * beta * math.log(1.0 - random.random()) < expires_at
+
+
+def get_or_compute(key, compute, ttl=300, stale_ttl=60, beta=1.0, lock_timeout=10):
+    """
+    Return the cached value for ``key``, computing it with ``compute()`` when
+    needed. ``compute`` must return a picklable value (evaluate querysets
+    with list()); None is cached like any other value.
+
+    Args:
+        ttl: Seconds the value is fresh
+        stale_ttl: Extra seconds a stale value may be served during a refresh
+        beta: Early refresh eagerness; 0 disables early refresh
+        lock_timeout: Max seconds one worker may hold the recompute lock
+    """
+    cache = get_cache()
+    entry = cache.get(key)
+    if entry is not None:
+        value, expires_at, delta = entry
+        now = time.time()
+        if _fresh(now, expires_at, delta, beta):
+            record_event(key, 'hit')
+            return value
+        token = _acquire(cache, key, lock_timeout)
+        if token is None:
+            # Someone else is refreshing; keep serving what we have
+            record_event(key, 'stale' if now >= expires_at else 'hit')
+            return value
+        if now < expires_at:
+            record_event(key, 'early_refresh')
+        try:
+            return _recompute(cache, key, compute, ttl, stale_ttl)
+        finally:
+            _release(cache, key, token)
+
+    record_event(key, 'miss')
+    token = _acquire(cache, key, lock_timeout)
+    if token is not None:
+        try:
+            return _recompute(cache, key, compute, ttl, stale_ttl)
+        finally:
+            _release(cache, key, token)
+
+    # Cold key being computed by another worker: wait for its result
+    # rather than piling onto the database
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            record_event(key, 'wait')
+            return entry[0]
+    # The lock holder died or is too slow
+    return _recompute(cache, key, compute, ttl, stale_ttl)
+
+
+async def _aacquire(cache, key, timeout):
+    token = uuid.uuid4().hex
+    return token if await cache.aadd(f'{key}:lock', token, timeout) else None
+
+
+async def _arelease(cache, key, token):
+    if await cache.aget(f'{key}:lock') == token:
+        await cache.adelete(f'{key}:lock')
+
+
+async def _arecompute(cache, key, compute, ttl, stale_ttl):
+    started = time.perf_counter()
+    value = await compute()
+    delta = time.perf_counter() - started
+    await cache.aset(key, (value, time.time() + ttl, delta), ttl + stale_ttl)
+    record_event(key, 'recompute')
+    return value
+
+
+async def aget_or_compute(key, compute, ttl=300, stale_ttl=60, beta=1.0, lock_timeout=10):
+    """
+    get_or_compute() for async views: ``compute`` is a coroutine function,
+    and waiting for another worker's recomputation doesn't block the event loop.
+    """
+    cache = get_cache()
+    entry = await cache.aget(key)
+    if entry is not None:
+        value, expires_at, delta = entry
+        now = time.time()
+        if _fresh(now, expires_at, delta, beta):
+            record_event(key, 'hit')
+            return value
+        token = await _aacquire(cache, key, lock_timeout)
+        if token is None:
+            record_event(key, 'stale' if now >= expires_at else 'hit')
+            return value
+        if now < expires_at:
+            record_event(key, 'early_refresh')
+        try:
+            return await _arecompute(cache, key, compute, ttl, stale_ttl)
+        finally:
+            await _arelease(cache, key, token)
+
+    record_event(key, 'miss')
+    token = await _aacquire(cache, key, lock_timeout)
+    if token is not None:
+        try:
+            return await _arecompute(cache, key, compute, ttl, stale_ttl)
+        finally:
+            await _arelease(cache, key, token)
+
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        entry = await cache.aget(key)
+        if entry is not None:
+            record_event(key, 'wait')
+            return entry[0]
+    return await _arecompute(cache, key, compute, ttl, stale_ttl)
+
+
+def invalidate(key):
+    get_cache().delete(key)
+
+
+def _new_version():
+    # Seeds a namespace version that is missing (never set, or evicted). In
+    # nanoseconds, so it is past every earlier seed plus the bumps made since:
+    # the version can't fall back to one whose entries are still cached.
+    return time.time_ns()
+
+
+def versioned_key(namespace, *parts):
+    """
+    Build a key inside a namespace that can be invalidated as a whole with
+    bump_namespace(), e.g. versioned_key('catalog', 'product', 42).
+    """
+    version = get_cache().get_or_set(f'{namespace}:version', _new_version, None)
+    return ':'.join([namespace, f'v{version}', *map(str, parts)])
+
+
+async def aversioned_key(namespace, *parts):
+    """versioned_key() for async views"""
+    version = await get_cache().aget_or_set(f'{namespace}:version', _new_version, None)
+    return ':'.join([namespace, f'v{version}', *map(str, parts)])
+
+
+def bump_namespace(namespace):
+    """Invalidate every versioned_key() in the namespace"""
+    cache = get_cache()
+    try:
+        cache.incr(f'{namespace}:version')
+    except ValueError:
+        cache.set(f'{namespace}:version', _new_version(), None)
@@ -0,0 +1,46 @@
+"""
+Client IP
+The address login throttling and rate limits key on. Behind a reverse
+proxy REMOTE_ADDR is the proxy's, so when the connection comes from one of
+settings.TRUSTED_PROXIES (or over a unix socket, which only a local proxy
+can reach) the client is read from X-Forwarded-For instead: the right-most
+address that wasn't added by a trusted proxy. Entries further left were
+sent by the client and can be forged.
+"""
+import ipaddress
+from functools import lru_cache
+
+from django.conf import settings
+
+
+@lru_cache(maxsize=8)
+def _networks(proxies):
+    return tuple(ipaddress.ip_network(proxy.strip(), strict=False) for proxy in proxies if proxy.strip())
+
+
+def _ip(address):
+    try:
+        return ipaddress.ip_address(address)
+    except ValueError:
+        return None
+
+
+def _trusted(ip, networks):
+    return ip is not None and any(ip in network for network in networks)
+
+
+def get_client_ip(request):
+    remote_addr = request.META.get('REMOTE_ADDR', '')
+    networks = _networks(tuple(settings.TRUSTED_PROXIES))
+    remote_ip = _ip(remote_addr)
+    if not networks or (remote_ip is not None and not _trusted(remote_ip, networks)):
+        return remote_addr
+    client = remote_addr
+    for hop in reversed(request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')):
+        hop = hop.strip()
+        if not hop:
+            continue
+        client = hop
+        if not _trusted(_ip(hop), networks):
+            break
+    return client
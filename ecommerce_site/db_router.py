@@ -0,0 +1,142 @@
+"""
+Primary/Replica Database Router
+Sends catalog and order-history reads made during safe (GET/HEAD) requests to
+the replica aliases in settings.DATABASE_REPLICAS; every write, and every read
+outside a request (management commands, shell, tests), uses the primary.
+
+After a request writes to one of the replicated apps, the client is pinned to
+the primary for REPLICA_PIN_SECONDS via a cookie, so users always read their
+own writes regardless of replication lag.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+
+PIN_COOKIE = 'db_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_routing = ContextVar('db_routing', default=None)
+
+
+class RoutingState:
+    """Per-request routing decision"""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def _replicated(model):
+    return model._meta.app_label in getattr(settings, 'REPLICA_READ_APPS', [])
+
+
+@contextmanager
+def use_primary():
+    """
+    Read from the primary for the duration of the block. Also usable as a
+    view decorator for pages that must show fresh data (e.g. payment status).
+    """
+    state = _routing.get()
+    if state is None:
+        yield
+        return
+    pinned, state.pinned = state.pinned, True
+    try:
+        yield
+    finally:
+        state.pinned = pinned
+
+
+@contextmanager
+def use_replicas(pinned=False):
+    """Allow replica reads for the block; used by the middleware per request"""
+    state = RoutingState(pinned=pinned)
+    token = _routing.set(state)
+    try:
+        yield state
+    finally:
+        _routing.reset(token)
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        replicas = replica_aliases()
+        if state is None or state.pinned or not replicas or not _replicated(model):
+            # None falls back to the instance's database, then the primary
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Follow relations on the connection the instance came from
+            return instance._state.db
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None and _replicated(model):
+            state.wrote = True
+            state.pinned = True
+        # Explicit so objects read from a replica are still saved to the primary
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replica_aliases():
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Enable replica reads for safe requests and pin clients that have just
+    written to the primary.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        unsafe = request.method not in SAFE_METHODS
+        with use_replicas(pinned=unsafe or PIN_COOKIE in request.COOKIES) as state:
+            response = self.get_response(request)
+        return self._pin(response, state)
+
+    async def __acall__(self, request):
+        # The routing state is a context variable, so sync_to_async() ORM
+        # calls made by async views see it too
+        unsafe = request.method not in SAFE_METHODS
+        with use_replicas(pinned=unsafe or PIN_COOKIE in request.COOKIES) as state:
+            response = await self.get_response(request)
+        return self._pin(response, state)
+
+    def _pin(self, response, state):
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 10),
+                httponly=True, samesite='Lax',
+            )
+        return response
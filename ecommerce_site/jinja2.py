@@ -0,0 +1,70 @@
+"""
+Jinja2 Environment
+Optional engine for the hottest pages (HOT_TEMPLATE_ENGINE=jinja2). The
+environment is set up so its templates render exactly what the Django
+templates render: every {{ }} value is localized and escaped the way Django
+does it, url()/static()/now() match the Django tags, and punch() fills the
+user-specific fragments from the same Django partials as {% punch %}.
+"""
+from datetime import datetime
+
+from django.conf import settings
+from django.template import Context, engines
+from django.template.defaultfilters import date, pluralize, truncatewords
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.formats import localize
+from django.utils.html import conditional_escape
+from jinja2 import Environment, pass_context
+from markupsafe import Markup
+
+from .page_cache import hole_marker, punching_holes
+from .templatetags.assets import tailwind_uses_cdn
+
+
+def finalize(value):
+    """Format a {{ }} value like Django: local time, localized numbers, Django's escapes"""
+    if isinstance(value, str):
+        return conditional_escape(value)
+    return conditional_escape(localize(timezone.template_localtime(value)))
+
+
+def url(viewname, *args, **kwargs):
+    """{% url %}: url('cart:cart_add', product.id)"""
+    return reverse(viewname, args=args or None, kwargs=kwargs or None)
+
+
+def now(format_string):
+    """{% now %}: now('Y')"""
+    tzinfo = timezone.get_current_timezone() if settings.USE_TZ else None
+    return date(datetime.now(tz=tzinfo), format_string)
+
+
+@pass_context
+def punch(context, template_name):
+    """{% punch %}: a hole marker on cached pages, else the rendered Django partial"""
+    if punching_holes(context.get('request')):
+        return Markup(hole_marker(template_name))
+    fragment = engines['django'].engine.get_template(template_name)
+    return Markup(fragment.render(Context(context.get_all())))
+
+
+def environment(**options):
+    options.setdefault('finalize', finalize)
+    # Django keeps the final newline of a template
+    options.setdefault('keep_trailing_newline', True)
+    env = Environment(**options)
+    env.globals.update({
+        'now': now,
+        'punch': punch,
+        'static': static,
+        'tailwind_uses_cdn': tailwind_uses_cdn,
+        'url': url,
+    })
+    env.filters.update({
+        'date': date,
+        'pluralize': pluralize,
+        'truncatewords': truncatewords,
+    })
+    return env
@@ -0,0 +1,188 @@
+"""
+Page Cache With Hole Punching
+Caches the rendered body and headers of catalog pages once per URL for all
+visitors. User-specific fragments, marked with {% punch %} in templates
+(cart badge, auth links, flash messages) and CSRF tokens, are stored as
+markers and filled in for each request by rendering only those small
+templates.
+
+A hit for an anonymous visitor needs no database queries: the fragments only
+read the session, which is cached (cached_db engine) or absent.
+
+Pages are keyed on the path and the query parameters the view declares;
+requests with any other parameter are served uncached, so made-up query
+strings can't fill the cache. Pages live in a cache of their own
+(PAGE_CACHE_ALIAS) with a bounded size, away from the login throttling
+buckets and the catalog version.
+"""
+import hashlib
+import re
+from functools import wraps
+from urllib.parse import urlencode
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.template.loader import get_template
+from django.utils.functional import SimpleLazyObject
+
+from .async_views import aload_request
+from .cache import aversioned_key, record_event, versioned_key
+
+
+HOLE_RE = re.compile(r'<!--punch:([\w./-]+)-->')
+CSRF_INPUT_RE = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+CSRF_HOLE = 'csrf_token'
+
+
+def hole_marker(name):
+    return f'<!--punch:{name}-->'
+
+
+def punching_holes(request):
+    """Whether the page being rendered for this request will be cached"""
+    return getattr(request, '_page_cache_holes', False)
+
+
+def fill_holes(body, request):
+    """Render every marked fragment for this request into the cached body"""
+    from cart.cart import Cart
+
+    context = {
+        'request': request,
+        'user': request.user,
+        'cart': SimpleLazyObject(lambda: Cart(request)),
+        'messages': get_messages(request),
+    }
+
+    def render_hole(match):
+        name = match.group(1)
+        if name == CSRF_HOLE:
+            return get_token(request)
+        return get_template(name).render(context)
+
+    return HOLE_RE.sub(render_hole, body)
+
+
+def get_page_cache():
+    return caches[settings.PAGE_CACHE_ALIAS]
+
+
+def _page_key_parts(request, query_params):
+    """Key parts for the page, or None when it has query parameters the view doesn't declare"""
+    if not set(request.GET).issubset(query_params):
+        return None
+    query = urlencode(sorted((name, value) for name in request.GET for value in request.GET.getlist(name)))
+    return 'page', hashlib.md5(f'{request.path}?{query}'.encode()).hexdigest()
+
+
+def _cacheable_body(response):
+    """The body to store for a response, with CSRF tokens as holes; None if not cacheable"""
+    content_type = response.get('Content-Type', '')
+    if response.status_code != 200 or response.streaming or not content_type.startswith('text/html'):
+        return None
+    return CSRF_INPUT_RE.sub(rf'\g<1>{hole_marker(CSRF_HOLE)}\g<2>', response.content.decode(response.charset))
+
+
+def _cache_entry(body, response):
+    """What's stored for a page: the body and the view's headers (Content-Type, Vary, ...)"""
+    headers = [(name, value) for name, value in response.items() if name.lower() != 'content-length']
+    return body, headers
+
+
+def _cached_response(entry, request):
+    """A response for this request from a stored page"""
+    body, headers = entry
+    response = HttpResponse(fill_holes(body, request))
+    for name, value in headers:
+        response[name] = value
+    return response
+
+
+def page_cache(view_func=None, timeout=None, query_params=()):
+    """
+    Cache a GET view's page body per path and ``query_params`` values in the
+    'catalog' cache namespace, so it is dropped whenever products or
+    categories change.
+
+    Only 200 HTML responses are stored; other methods and statuses, and
+    requests with undeclared query parameters, pass through. Async views are
+    wrapped with an async wrapper using the async cache API.
+    """
+    allowed = frozenset(query_params)
+
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            return _async_page_cache(view_func, timeout, allowed)
+
+        @wraps(view_func)
+        def wrapped(request, *args, **kwargs):
+            parts = _page_key_parts(request, allowed)
+            if request.method not in ('GET', 'HEAD') or parts is None:
+                return view_func(request, *args, **kwargs)
+
+            key = versioned_key('catalog', *parts)
+            cache = get_page_cache()
+            entry = cache.get(key)
+            if entry is not None:
+                record_event('pages', 'hit')
+                return _cached_response(entry, request)
+
+            record_event('pages', 'miss')
+            request._page_cache_holes = True
+            try:
+                response = view_func(request, *args, **kwargs)
+                if hasattr(response, 'render') and callable(response.render):
+                    response = response.render()
+            finally:
+                request._page_cache_holes = False
+
+            body = _cacheable_body(response)
+            if body is None:
+                return response
+            cache.set(key, _cache_entry(body, response), timeout or settings.PAGE_CACHE_TTL)
+            response.content = fill_holes(body, request)
+            return response
+        return wrapped
+
+    if view_func is not None:
+        return decorator(view_func)
+    return decorator
+
+
+def _async_page_cache(view_func, timeout, query_params):
+    @wraps(view_func)
+    async def wrapped(request, *args, **kwargs):
+        # The holes and the context processors read the session and the user,
+        # cached or not
+        await aload_request(request)
+        parts = _page_key_parts(request, query_params)
+        if request.method not in ('GET', 'HEAD') or parts is None:
+            return await view_func(request, *args, **kwargs)
+
+        key = await aversioned_key('catalog', *parts)
+        cache = get_page_cache()
+        entry = await cache.aget(key)
+        if entry is not None:
+            record_event('pages', 'hit')
+            return _cached_response(entry, request)
+
+        record_event('pages', 'miss')
+        request._page_cache_holes = True
+        try:
+            response = await view_func(request, *args, **kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                response = response.render()
+        finally:
+            request._page_cache_holes = False
+
+        body = _cacheable_body(response)
+        if body is None:
+            return response
+        await cache.aset(key, _cache_entry(body, response), timeout or settings.PAGE_CACHE_TTL)
+        response.content = fill_holes(body, request)
+        return response
+    return wrapped
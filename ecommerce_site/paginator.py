@@ -0,0 +1,53 @@
+"""
+Estimated Count Paginator
+Avoids exact COUNT(*) on large admin changelists by using database
+estimates once a result set is known to exceed a threshold.
+"""
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max
+from django.utils.functional import cached_property
+
+
+def estimate_count(queryset):
+    """
+    Return a cheap row estimate for a queryset, or None if the database
+    can't provide one.
+
+    PostgreSQL uses the planner's row estimate for the actual query. Other
+    databases can only estimate unfiltered tables, using the highest primary
+    key (which ignores deleted rows, so it over-estimates slightly).
+    """
+    queryset = queryset.order_by()
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        return int(plan[0]['Plan']['Plan Rows'])
+    if not queryset.query.where and not queryset.query.distinct:
+        return queryset.aggregate(estimate=Max('pk'))['estimate'] or 0
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that counts exactly up to ``exact_threshold`` rows (a bounded
+    query) and switches to an estimate beyond that.
+    """
+
+    exact_threshold = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not hasattr(queryset, 'query'):
+            return super().count
+        capped = queryset.order_by()[:self.exact_threshold + 1].count()
+        if capped <= self.exact_threshold:
+            return capped
+        estimate = estimate_count(queryset)
+        if estimate is None:
+            return super().count
+        return max(estimate, capped)
@@ -0,0 +1,254 @@
+"""
+Request Rate Limiting
+Sliding-window rate limits per client IP (read through the trusted
+proxies, see ecommerce_site/clientip.py), declared per URL name in
+settings.RATE_LIMITS (enforced by RateLimitMiddleware) or per view with the
+@ratelimit decorator. Over-limit requests get a plain 429 before the view
+runs, so no session or database work is done for them.
+"""
+import re
+import threading
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.module_loading import import_string
+
+from .clientip import get_client_ip
+
+
+_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """
+    Parse '30/m', '1000/h' or '5/10s' into (limit, window seconds)
+    """
+    match = re.fullmatch(r'(\d+)/(\d*)([smhd]?)', rate.strip())
+    if not match:
+        raise ValueError(f'Invalid rate {rate!r}; expected e.g. "30/m" or "5/10s"')
+    limit, count, unit = match.groups()
+    return int(limit), int(count or 1) * _UNITS[unit or 's']
+
+
+class LocalMemoryStore:
+    """Per-process window counters; suitable for a single node"""
+
+    def __init__(self):
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def incr(self, key, window):
+        with self._lock:
+            if len(self._counters) > 10000:
+                self._prune()
+            now = time.monotonic()
+            expires, count = self._counters.get(key, (0, 0))
+            if expires <= now:
+                expires, count = now + 2 * window, 0
+            self._counters[key] = (expires, count + 1)
+            return count + 1
+
+    def get(self, key):
+        with self._lock:
+            expires, count = self._counters.get(key, (0, 0))
+            return count if expires > time.monotonic() else 0
+
+    # Never blocks for long, so async callers use it from the event loop
+    async def aincr(self, key, window):
+        return self.incr(key, window)
+
+    async def aget(self, key):
+        return self.get(key)
+
+    def _prune(self):
+        now = time.monotonic()
+        self._counters = {k: v for k, v in self._counters.items() if v[0] > now}
+
+
+class CacheStore:
+    """Window counters in a Django cache shared by all nodes (Redis, Memcached)"""
+
+    def __init__(self, alias=None):
+        self.cache = caches[alias or getattr(settings, 'RATE_LIMIT_CACHE', 'default')]
+
+    def incr(self, key, window):
+        # add() is a no-op if the key exists; incr() is atomic on shared backends
+        self.cache.add(key, 0, timeout=2 * window)
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # Expired between add() and incr()
+            self.cache.set(key, 1, timeout=2 * window)
+            return 1
+
+    def get(self, key):
+        return self.cache.get(key, 0)
+
+    async def aincr(self, key, window):
+        await self.cache.aadd(key, 0, timeout=2 * window)
+        try:
+            return await self.cache.aincr(key)
+        except ValueError:
+            await self.cache.aset(key, 1, timeout=2 * window)
+            return 1
+
+    async def aget(self, key):
+        return await self.cache.aget(key, 0)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = import_string(getattr(settings, 'RATE_LIMIT_STORE', 'ecommerce_site.ratelimit.LocalMemoryStore'))()
+    return _store
+
+
+def _windows(request, scope, rate):
+    limit, window = parse_rate(rate)
+    now = time.time()
+    current_window = int(now // window)
+    elapsed = (now % window) / window
+    prefix = f'ratelimit:{scope}:{get_client_ip(request)}'
+    return limit, window, elapsed, f'{prefix}:{current_window - 1}', f'{prefix}:{current_window}'
+
+
+def _retry_after(limit, window, elapsed, previous, current):
+    if previous * (1 - elapsed) + current > limit:
+        return max(1, int(window * (1 - elapsed)) + 1)
+    return 0
+
+
+def check_rate(request, scope, rate):
+    """
+    Count this request against a sliding window and check the limit.
+
+    The sliding window is approximated from the current and previous fixed
+    windows: previous_count * (share of previous window still in range) +
+    current_count.
+
+    Returns:
+        int: 0 if allowed, otherwise seconds the client should wait
+    """
+    limit, window, elapsed, previous_key, current_key = _windows(request, scope, rate)
+    store = get_store()
+    previous = store.get(previous_key)
+    current = store.incr(current_key, window)
+    return _retry_after(limit, window, elapsed, previous, current)
+
+
+async def acheck_rate(request, scope, rate):
+    """Async check_rate(), through the store's aget()/aincr()"""
+    limit, window, elapsed, previous_key, current_key = _windows(request, scope, rate)
+    store = get_store()
+    previous = await store.aget(previous_key)
+    current = await store.aincr(current_key, window)
+    return _retry_after(limit, window, elapsed, previous, current)
+
+
+def too_many_requests(retry_after):
+    response = HttpResponse('Too Many Requests\n', status=429, content_type='text/plain')
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def ratelimit(rate, scope=None, methods=None):
+    """
+    Rate limit a view per client IP, e.g. @ratelimit('10/m', methods=['POST'])
+    """
+    def decorator(view_func):
+        key = scope or f'{view_func.__module__}.{view_func.__name__}'
+
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def wrapped(request, *args, **kwargs):
+                if methods is None or request.method in methods:
+                    retry_after = await acheck_rate(request, key, rate)
+                    if retry_after:
+                        return too_many_requests(retry_after)
+                return await view_func(request, *args, **kwargs)
+            return wrapped
+
+        @wraps(view_func)
+        def wrapped(request, *args, **kwargs):
+            if methods is None or request.method in methods:
+                retry_after = check_rate(request, key, rate)
+                if retry_after:
+                    return too_many_requests(retry_after)
+            return view_func(request, *args, **kwargs)
+        return wrapped
+    return decorator
+
+
+class RateLimitMiddleware:
+    """
+    Enforce settings.RATE_LIMITS, keyed by URL name:
+
+        RATE_LIMITS = {
+            'cart:cart_add': {'rate': '30/m'},
+            'orders:order_create': {'rate': '10/m', 'methods': ['POST']},
+        }
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.limits = getattr(settings, 'RATE_LIMITS', {})
+        if not self.limits:
+            raise MiddlewareNotUsed
+        # Requests in other methods are never limited, so they skip the URL lookup
+        self.methods = set()
+        for limit in self.limits.values():
+            if not limit.get('methods'):
+                self.methods = None
+                break
+            self.methods.update(limit['methods'])
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    # Checked before the view is resolved rather than in process_view(),
+    # which Django would run in a thread under ASGI
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        limit = self._limit(request)
+        retry_after = check_rate(request, *limit) if limit else 0
+        if retry_after:
+            return too_many_requests(retry_after)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        limit = self._limit(request)
+        retry_after = await acheck_rate(request, *limit) if limit else 0
+        if retry_after:
+            return too_many_requests(retry_after)
+        return await self.get_response(request)
+
+    def _limit(self, request):
+        if self.methods is not None and request.method not in self.methods:
+            return None
+        try:
+            match = resolve(request.path_info, getattr(request, 'urlconf', None))
+        except Resolver404:
+            return None
+        limit = self.limits.get(match.view_name)
+        if not limit:
+            return None
+        methods = limit.get('methods')
+        if methods and request.method not in methods:
+            return None
+        return match.view_name, limit['rate']
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 
+from decouple import Csv, config
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -23,7 +25,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-1r+9c)&xfd%bt%#wy)1m#p898n3-jen6-x+*o9#=b%t&*i(f1^'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = config('DEBUG', default=True, cast=bool)
 
 ALLOWED_HOSTS = []
 
@@ -42,10 +44,16 @@ INSTALLED_APPS = [
     'cart.apps.CartConfig',
     'accounts.apps.AccountsConfig',
     'orders.apps.OrdersConfig',
+    'perf.apps.PerfConfig',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'ecommerce_site.staticfiles.WhiteNoiseMiddleware',
+    'perf.middleware.MetricsMiddleware',
+    'perf.middleware.SlowQueryMiddleware',
+    'ecommerce_site.ratelimit.RateLimitMiddleware',
+    'ecommerce_site.db_router.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -56,23 +64,60 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'ecommerce_site.urls'
 
+CONTEXT_PROCESSORS = [
+    'django.template.context_processors.request',
+    'django.contrib.auth.context_processors.auth',
+    'django.contrib.messages.context_processors.messages',
+    'cart.context_processors.cart',
+]
+
+# Templates are compiled once per process by the cached loader and warmed at
+# startup (ecommerce_site/startup.py), so no request pays for compilation
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
-            'context_processors': [
-                'django.template.context_processors.request',
-                'django.contrib.auth.context_processors.auth',
-                'django.contrib.messages.context_processors.messages',
-                'cart.context_processors.cart',
+            'context_processors': CONTEXT_PROCESSORS,
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
             ],
+            'libraries': {
+                'page_cache': 'ecommerce_site.templatetags.page_cache',
+                'assets': 'ecommerce_site.templatetags.assets',
+            },
         },
     },
 ]
 
+# Optional Jinja2 engine (pip install Jinja2) for the hot pages, the product
+# list and the cart: HOT_TEMPLATE_ENGINE=jinja2 renders them from the
+# jinja2/ template directories, with identical output. Compare the engines
+# with `manage.py bench_templates`.
+JINJA2_ENGINE = {
+    'BACKEND': 'django.template.backends.jinja2.Jinja2',
+    'NAME': 'jinja2',
+    'DIRS': [BASE_DIR / 'jinja2'],
+    'APP_DIRS': True,
+    'OPTIONS': {
+        'environment': 'ecommerce_site.jinja2.environment',
+        'context_processors': CONTEXT_PROCESSORS,
+    },
+}
+HOT_TEMPLATE_ENGINE = config('HOT_TEMPLATE_ENGINE', default='django')
+if HOT_TEMPLATE_ENGINE == 'jinja2':
+    TEMPLATES.append(JINJA2_ENGINE)
+
 WSGI_APPLICATION = 'ecommerce_site.wsgi.application'
+ASGI_APPLICATION = 'ecommerce_site.asgi.application'
+
+# Serve the async implementations of the read-heavy views (catalog, cart,
+# order history); ecommerce_site/asgi.py switches this on. Under WSGI each
+# async view call would need its own event loop.
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
 
 
 # Database
@@ -80,11 +125,60 @@ WSGI_APPLICATION = 'ecommerce_site.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'ENGINE': config('DB_ENGINE', default='django.db.backends.sqlite3'),
+        'NAME': config('DB_NAME', default=str(BASE_DIR / 'db.sqlite3')),
+        'USER': config('DB_USER', default=''),
+        'PASSWORD': config('DB_PASSWORD', default=''),
+        'HOST': config('DB_HOST', default=''),
+        'PORT': config('DB_PORT', default=''),
+        # Keep connections open between requests; verify them before reuse
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Opt-in SQLite profile for single-node deployments (DB_SQLITE_TUNED=True): WAL
+# lets readers run alongside the writer, BEGIN IMMEDIATE takes the write lock up
+# front so concurrent transactions queue on the busy timeout instead of failing
+# with "database is locked". Compare with `manage.py bench_sqlite`.
+SQLITE_TUNED_OPTIONS = {
+    'init_command': (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        'PRAGMA mmap_size=268435456;'
+        'PRAGMA temp_store=MEMORY;'
+        'PRAGMA cache_size=-20000;'
+    ),
+    'transaction_mode': 'IMMEDIATE',
+    'timeout': 20,
+}
+if 'sqlite' in DATABASES['default']['ENGINE'] and config('DB_SQLITE_TUNED', default=False, cast=bool):
+    DATABASES['default']['OPTIONS'] = SQLITE_TUNED_OPTIONS
+
+# Under ASGI each request runs its queries in a thread of its own, so
+# persistent connections are not reused between requests; use psycopg's
+# connection pool instead (PostgreSQL, DB_POOL=True).
+if 'postgresql' in DATABASES['default']['ENGINE'] and config('DB_POOL', default=False, cast=bool):
+    DATABASES['default']['OPTIONS'] = {'pool': True}
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+
+# Read replicas: comma-separated hosts for server databases, or database files
+# for SQLite (point one at db.sqlite3 itself to run a local stand-in replica).
+DATABASE_REPLICAS = []
+for number, replica in enumerate(config('DB_REPLICAS', default='', cast=Csv()), start=1):
+    alias = f'replica{number}'
+    DATABASES[alias] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+    DATABASES[alias]['NAME' if 'sqlite' in DATABASES[alias]['ENGINE'] else 'HOST'] = replica
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['ecommerce_site.db_router.PrimaryReplicaRouter']
+
+# Apps whose reads may be served by a replica during GET requests
+REPLICA_READ_APPS = ['shop', 'orders']
+
+# Seconds a client reads from the primary after writing to a replicated app
+REPLICA_PIN_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -104,6 +198,16 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing; PBKDF2 work factor is tunable (see `manage.py benchmark_hashers`)
+PASSWORD_HASHERS = [
+    'accounts.hashers.TunablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PASSWORD_PBKDF2_ITERATIONS = None  # None keeps Django's default
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -121,9 +225,41 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
+STATICFILES_FINDERS = [
+    'django.contrib.staticfiles.finders.FileSystemFinder',
+    'django.contrib.staticfiles.finders.AppDirectoriesFinder',
+    'ecommerce_site.staticfiles.TailwindFinder',
+]
+
+# Production: collectstatic writes content-hashed names plus .br/.gz variants,
+# which WhiteNoise serves with far-future immutable cache headers
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+        ),
+    },
+}
+
+# In development WhiteNoise serves straight from the finders, so STATIC_ROOT
+# doesn't have to exist and edited files are picked up without collectstatic
+WHITENOISE_USE_FINDERS = DEBUG
+WHITENOISE_AUTOREFRESH = DEBUG
+
+# Tailwind: the CDN script compiles styles in the browser (development only);
+# otherwise `manage.py build_css` builds a purged, minified stylesheet with
+# TAILWIND_CLI for collectstatic to pick up
+TAILWIND_USE_CDN = config('TAILWIND_USE_CDN', default=DEBUG, cast=bool)
+TAILWIND_CLI = config('TAILWIND_CLI', default=str(BASE_DIR / 'node_modules' / '.bin' / 'tailwindcss'))
+TAILWIND_BUILD_DIR = BASE_DIR / 'build' / 'static'
 
 # Media files (User uploads)
 MEDIA_URL = 'media/'
@@ -140,16 +276,128 @@ MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
 # Cart configuration
 CART_SESSION_ID = 'cart'
 
+# Notification outbox (drained by `manage.py send_outbox`)
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_RETRY_BASE_SECONDS = 30
+OUTBOX_RETRY_MAX_SECONDS = 6 * 60 * 60
+
+# Orders older than this are moved to the archive by `manage.py archive_orders`
+ORDER_ARCHIVE_AFTER_DAYS = 365
+# Most archived orders listed in a user's order history (newest first)
+ORDER_HISTORY_ARCHIVED_LIMIT = 50
+
 # Authentication settings
 LOGIN_URL = 'accounts:login'
 LOGIN_REDIRECT_URL = 'shop:product_list'
 LOGOUT_REDIRECT_URL = 'shop:product_list'
 
+# Reverse proxies (IPs or networks) whose X-Forwarded-For gives the client IP
+# used by login throttling and rate limits; unix socket connections count as
+# local. Empty: always use REMOTE_ADDR.
+TRUSTED_PROXIES = config('TRUSTED_PROXIES', default='127.0.0.1,::1', cast=Csv())
+
+# Login throttling: '<attempts>/<seconds>' token buckets per client IP and per username
+LOGIN_THROTTLE_RATES = {
+    'ip': '20/60',
+    'username': '5/300',
+}
+# RATE_LIMIT_ENABLED=False turns off login throttling and request rate limits,
+# e.g. for load benchmarks that send every request from one IP
+RATE_LIMIT_ENABLED = config('RATE_LIMIT_ENABLED', default=True, cast=bool)
+if not RATE_LIMIT_ENABLED:
+    LOGIN_THROTTLE_RATES = {}
+LOGIN_THROTTLE_CACHE = 'default'
+
+# Request rate limits per URL name, per client IP (see ecommerce_site/ratelimit.py).
+# Use 'ecommerce_site.ratelimit.CacheStore' to share counters between nodes.
+RATE_LIMITS = {
+    'cart:cart_add': {'rate': '30/m', 'methods': ['POST']},
+    'orders:order_create': {'rate': '10/m', 'methods': ['POST']},
+} if RATE_LIMIT_ENABLED else {}
+RATE_LIMIT_STORE = 'ecommerce_site.ratelimit.LocalMemoryStore'
+RATE_LIMIT_CACHE = 'default'
+
+# Cache: local memory per process by default; set REDIS_URL to share it between nodes
+if config('REDIS_URL', default=''):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': config('REDIS_URL'),
+        },
+        'pages': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': config('REDIS_URL'),
+            'KEY_PREFIX': 'pages',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'ecommerce',
+        },
+        'pages': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'pages',
+            'OPTIONS': {'MAX_ENTRIES': config('PAGE_CACHE_MAX_ENTRIES', default=1000, cast=int)},
+        },
+    }
+
+# Cache-aside helper (ecommerce_site/cache.py) and what it caches
+CACHE_ASIDE_CACHE = 'default'
+CATALOG_CACHE_TTL = 300
+ORDER_HISTORY_CACHE_TTL = 60
+
+# Catalog pages cached whole by @page_cache (ecommerce_site/page_cache.py), in
+# a cache of their own so pages can't evict throttling buckets or versions
+PAGE_CACHE_TTL = 300
+PAGE_CACHE_ALIAS = 'pages'
+
+# Sessions are read from the cache, so cached pages can fill in the cart
+# badge and auth links without touching the database
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Per-view metrics, scraped from /metrics (Prometheus text format). Set
+# PERF_METRICS_DIR to a directory shared by the worker processes of one host
+# so the endpoint reports all of them; snapshots of exited workers are
+# removed when it is read. The endpoint is closed until PERF_METRICS_TOKEN or
+# PERF_METRICS_ALLOWED_IPS is set.
+PERF_METRICS_ENABLED = config('PERF_METRICS_ENABLED', default=True, cast=bool)
+if PERF_METRICS_ENABLED:
+    # Template render time per view (perf/template_backends.py)
+    TEMPLATES[0].update(BACKEND='perf.template_backends.DjangoTemplates', NAME='django')
+    JINJA2_ENGINE['BACKEND'] = 'perf.template_backends.Jinja2'
+PERF_METRICS_DIR = config('PERF_METRICS_DIR', default='')
+PERF_METRICS_FLUSH_SECONDS = config('PERF_METRICS_FLUSH_SECONDS', default=5, cast=float)
+PERF_METRICS_TOKEN = config('PERF_METRICS_TOKEN', default='')
+PERF_METRICS_ALLOWED_IPS = config('PERF_METRICS_ALLOWED_IPS', default='', cast=Csv())
+
+# Slow query log (perf/slowqueries.py): statements slower than
+# PERF_SLOW_QUERY_MS milliseconds are logged with their view and origin, and
+# a sample of them explained; see /admin/perf/slow-queries/ (superusers).
+# 0 turns it off.
+PERF_SLOW_QUERY_MS = config('PERF_SLOW_QUERY_MS', default=0, cast=float)
+PERF_SLOW_QUERY_EXPLAIN_RATE = config('PERF_SLOW_QUERY_EXPLAIN_RATE', default=0.1, cast=float)
+PERF_SLOW_QUERY_BUFFER = config('PERF_SLOW_QUERY_BUFFER', default=500, cast=int)
+# Statements on these tables are logged without parameters and not explained
+PERF_SLOW_QUERY_REDACTED_TABLES = config(
+    'PERF_SLOW_QUERY_REDACTED_TABLES', default='django_session,auth_user', cast=Csv()
+)
+
 # Stripe Configuration
 import os
-from decouple import config
 
 # Stripe Test Keys (use test keys for development)
 STRIPE_PUBLISHABLE_KEY = config('STRIPE_PUBLISHABLE_KEY', default='pk_test_51234567890abcdef')
 STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY', default='sk_test_51234567890abcdef')
 STRIPE_WEBHOOK_SECRET = config('STRIPE_WEBHOOK_SECRET', default='whsec_test_webhook_secret')
+
+# Override the Stripe API host, e.g. http://127.0.0.1:12111 for the local fake Stripe server
+STRIPE_API_BASE = config('STRIPE_API_BASE', default='')
+
+# Simulated gateway delay (seconds) for the demo card/PayPal/bank transfer methods
+PAYMENT_SIMULATED_DELAY = config('PAYMENT_SIMULATED_DELAY', default=1.0, cast=float)
+
+# Email
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='E-Commerce Store <orders@example.com>')
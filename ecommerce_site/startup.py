@@ -0,0 +1,57 @@
+"""
+Worker Startup
+Work done once when the WSGI/ASGI application is loaded rather than on the
+first request. Under ``gunicorn --preload`` it runs in the master process, so
+forked workers share the loaded modules, URL patterns and compiled templates
+copy-on-write instead of each building them again.
+"""
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.urls import get_resolver
+
+
+def _project_templates(engine):
+    """Names of the templates an engine finds in the project (not in installed packages)"""
+    if not isinstance(engine, DjangoTemplates):
+        # Jinja2: its loader already knows every template directory
+        return engine.env.list_templates()
+    directories = (Path(d) for loader in engine.engine.template_loaders for d in loader.get_dirs())
+    names = set()
+    for directory in directories:
+        if directory.is_relative_to(settings.BASE_DIR) and directory.is_dir():
+            names.update(
+                path.relative_to(directory).as_posix() for path in directory.rglob('*') if path.is_file()
+            )
+    return sorted(names)
+
+
+def warm_templates():
+    """
+    Compile every project template into each engine's cache (the cached
+    loader for Django, the environment cache for Jinja2). Returns the number
+    of templates compiled.
+    """
+    count = 0
+    for engine in engines.all():
+        for name in _project_templates(engine):
+            engine.get_template(name)
+            count += 1
+    return count
+
+
+def warm_up():
+    """Import the URL configuration (and with it every view module), build the URL maps and compile the templates"""
+    resolver = get_resolver()
+    resolver.url_patterns
+    resolver.reverse_dict
+    warm_templates()
+    # A connection opened while loading must not be inherited by forked
+    # workers. Only touch open ones: uvicorn imports the application inside
+    # its event loop, where closing is not allowed.
+    for connection in connections.all(initialized_only=True):
+        if connection.connection is not None:
+            connection.close()
@@ -0,0 +1,121 @@
+"""
+Static Asset Pipeline
+`manage.py build_css` builds the purged, minified Tailwind stylesheet;
+collectstatic then picks it up through TailwindFinder, so it is hashed,
+compressed (Brotli/gzip) and served with immutable cache headers by
+WhiteNoise like every other static file. The WhiteNoise middleware
+is subclassed so it can run in an async middleware chain.
+"""
+import shlex
+import subprocess
+from pathlib import Path
+
+import whitenoise.middleware
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.staticfiles.finders import BaseFinder
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import FileSystemStorage
+from django.http import HttpResponse
+
+
+TAILWIND_OUTPUT = 'css/tailwind.min.css'
+
+
+def build_tailwind():
+    """
+    Run the Tailwind CLI over the templates listed in tailwind.config.js.
+
+    Raises:
+        ImproperlyConfigured: If the CLI is missing or the build fails
+    """
+    output = Path(settings.TAILWIND_BUILD_DIR) / TAILWIND_OUTPUT
+    output.parent.mkdir(parents=True, exist_ok=True)
+    command = [
+        *shlex.split(settings.TAILWIND_CLI),
+        '--config', str(settings.BASE_DIR / 'tailwind.config.js'),
+        '--input', str(settings.BASE_DIR / 'static' / 'css' / 'tailwind.css'),
+        '--output', str(output),
+        '--minify',
+    ]
+    try:
+        subprocess.run(command, cwd=settings.BASE_DIR, check=True, capture_output=True, text=True, timeout=300)
+    except FileNotFoundError as e:
+        raise ImproperlyConfigured(
+            f'Tailwind CLI not found ({settings.TAILWIND_CLI}); run `npm install` or set TAILWIND_CLI.'
+        ) from e
+    except subprocess.CalledProcessError as e:
+        raise ImproperlyConfigured(f'Tailwind build failed:\n{e.stderr}') from e
+    except subprocess.TimeoutExpired as e:
+        raise ImproperlyConfigured('Tailwind build timed out.') from e
+    return output
+
+
+class TailwindFinder(BaseFinder):
+    """
+    Staticfiles finder for the stylesheet built by `manage.py build_css`.
+    Finding and listing never build it; collectstatic fails if there is no
+    build while the site doesn't use the CDN script.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.storage = FileSystemStorage(location=settings.TAILWIND_BUILD_DIR)
+
+    def check(self, **kwargs):
+        return []
+
+    def find(self, path, find_all=False, **kwargs):
+        if path == TAILWIND_OUTPUT and self.storage.exists(path):
+            match = self.storage.path(path)
+            return [match] if find_all else match
+        return [] if find_all else None
+
+    def list(self, ignore_patterns):
+        if self.storage.exists(TAILWIND_OUTPUT):
+            yield TAILWIND_OUTPUT, self.storage
+        elif not settings.TAILWIND_USE_CDN:
+            raise ImproperlyConfigured(f'{TAILWIND_OUTPUT} has not been built; run `manage.py build_css` first.')
+
+
+class WhiteNoiseMiddleware(whitenoise.middleware.WhiteNoiseMiddleware):
+    """
+    WhiteNoise that keeps the middleware chain async under ASGI. Files are
+    read in a worker thread and sent in one piece rather than streamed from
+    a synchronous file iterator.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is None:
+            return await self.get_response(request)
+        return await sync_to_async(self.serve_buffered, thread_sensitive=False)(static_file, request)
+
+    @staticmethod
+    def serve_buffered(static_file, request):
+        response = static_file.get_response(request.method, request.META)
+        content = b''
+        if response.file is not None:
+            with response.file as f:
+                content = f.read()
+        http_response = HttpResponse(content, status=int(response.status))
+        del http_response['Content-Type']
+        for key, value in response.headers:
+            http_response[key] = value
+        return http_response
@@ -0,0 +1,11 @@
+from django import template
+from django.conf import settings
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def tailwind_uses_cdn():
+    """Whether pages load the Tailwind CDN script instead of the built stylesheet"""
+    return settings.TAILWIND_USE_CDN
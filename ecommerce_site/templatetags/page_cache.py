@@ -0,0 +1,34 @@
+from django import template
+
+from ecommerce_site.page_cache import hole_marker, punching_holes
+
+
+register = template.Library()
+
+
+class PunchNode(template.Node):
+
+    def __init__(self, template_name):
+        self.template_name = template_name
+
+    def render(self, context):
+        template_name = self.template_name.resolve(context)
+        if punching_holes(getattr(context, 'request', None)):
+            return hole_marker(template_name)
+        fragment = context.template.engine.get_template(template_name)
+        with context.push():
+            return fragment.render(context)
+
+
+@register.tag
+def punch(parser, token):
+    """
+    Render a user-specific fragment, e.g. {% punch "partials/cart_badge.html" %}.
+
+    Behaves like {% include %}, except on pages cached by @page_cache, where
+    it leaves a marker that is filled in for each request.
+    """
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError(f'{bits[0]} takes a single template name')
+    return PunchNode(parser.compile_filter(bits[1]))
@@ -0,0 +1,493 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import connection, router
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from orders.models import Order
+from shop.models import Category, Product
+from .cache import (
+    aget_or_compute, aversioned_key, bump_namespace, cache_metrics, get_cache, get_or_compute, reset_cache_metrics,
+    versioned_key,
+)
+from .page_cache import page_cache
+from .paginator import EstimatedCountPaginator
+from .db_router import PIN_COOKIE, ReplicaRoutingMiddleware, use_primary
+from .ratelimit import CacheStore, LocalMemoryStore, RateLimitMiddleware, parse_rate, ratelimit
+from .staticfiles import TAILWIND_OUTPUT, TailwindFinder
+
+
+@override_settings(
+    RATE_LIMITS={'cart:cart_add': {'rate': '2/m', 'methods': ['POST']}},
+    TRUSTED_PROXIES=['127.0.0.1'],
+)
+class RateLimitTests(TestCase):
+
+    def _add(self, client_ip, method='post'):
+        # No such product: the view answers 404 whenever the request gets through
+        return getattr(self.client, method)(reverse('cart:cart_add', args=[0]), HTTP_X_FORWARDED_FOR=client_ip)
+
+    def test_limit_per_client_behind_the_proxy(self):
+        self.assertEqual(self._add('203.0.113.10').status_code, 404)
+        self.assertEqual(self._add('203.0.113.10').status_code, 404)
+        response = self._add('203.0.113.10')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+        # Other clients of the same proxy have their own window
+        self.assertEqual(self._add('203.0.113.11').status_code, 404)
+
+    def test_only_limited_methods_count(self):
+        for _ in range(3):
+            self.assertEqual(self._add('203.0.113.12', method='get').status_code, 405)
+        self.assertEqual(self._add('203.0.113.12').status_code, 404)
+
+    def test_unlimited_methods_skip_the_url_lookup(self):
+        with mock.patch('ecommerce_site.ratelimit.resolve') as resolve:
+            self.assertEqual(self._add('203.0.113.14', method='get').status_code, 405)
+        resolve.assert_not_called()
+
+    async def test_async_stack_checks_limits_on_the_event_loop(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(RateLimitMiddleware(get_response)))
+        self.assertFalse(hasattr(RateLimitMiddleware, 'process_view'))
+
+        url = reverse('cart:cart_add', args=[0])
+        for _ in range(2):
+            response = await self.async_client.post(url, headers={'X-Forwarded-For': '203.0.113.13'})
+            self.assertEqual(response.status_code, 404)
+        response = await self.async_client.post(url, headers={'X-Forwarded-For': '203.0.113.13'})
+        self.assertEqual(response.status_code, 429)
+
+
+@ratelimit('2/m', methods=['POST'])
+def limited_view(request):
+    return HttpResponse('ok')
+
+
+@ratelimit('2/m', scope='async-test')
+async def alimited_view(request):
+    return HttpResponse('ok')
+
+
+@override_settings(TRUSTED_PROXIES=[])
+class RateLimitDecoratorTests(SimpleTestCase):
+
+    def setUp(self):
+        patcher = mock.patch('ecommerce_site.ratelimit._store', LocalMemoryStore())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _request(self, method='post', client_ip='203.0.113.20'):
+        return getattr(RequestFactory(), method)('/', REMOTE_ADDR=client_ip)
+
+    def test_sync_view(self):
+        self.assertEqual([limited_view(self._request()).status_code for _ in range(3)], [200, 200, 429])
+        self.assertEqual(limited_view(self._request('get')).status_code, 200)
+        self.assertEqual(limited_view(self._request(client_ip='203.0.113.21')).status_code, 200)
+
+    async def test_async_view(self):
+        self.assertTrue(iscoroutinefunction(alimited_view))
+        self.assertEqual([(await alimited_view(self._request('get'))).status_code for _ in range(3)], [200, 200, 429])
+
+
+class RateLimitStoreTests(SimpleTestCase):
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('30/m'), (30, 60))
+        self.assertEqual(parse_rate('5/10s'), (5, 10))
+        self.assertEqual(parse_rate('1000/h'), (1000, 3600))
+        with self.assertRaises(ValueError):
+            parse_rate('often')
+
+    def test_stores_count_per_key(self):
+        cache.clear()
+        for store in (LocalMemoryStore(), CacheStore()):
+            with self.subTest(store=type(store).__name__):
+                self.assertEqual([store.incr('ratelimit:test:a', 60) for _ in range(3)], [1, 2, 3])
+                self.assertEqual(store.incr('ratelimit:test:b', 60), 1)
+                self.assertEqual(store.get('ratelimit:test:a'), 3)
+                self.assertEqual(store.get('ratelimit:test:missing'), 0)
+
+    def test_local_counters_expire(self):
+        store = LocalMemoryStore()
+        with mock.patch('ecommerce_site.ratelimit.time.monotonic', return_value=1000):
+            store.incr('ratelimit:test:a', 60)
+            store.incr('ratelimit:test:a', 60)
+        with mock.patch('ecommerce_site.ratelimit.time.monotonic', return_value=1121):
+            self.assertEqual(store.get('ratelimit:test:a'), 0)
+            self.assertEqual(store.incr('ratelimit:test:a', 60), 1)
+
+    async def test_async_stores_count_per_key(self):
+        await cache.aclear()
+        for store in (LocalMemoryStore(), CacheStore()):
+            with self.subTest(store=type(store).__name__):
+                self.assertEqual([await store.aincr('ratelimit:test:a', 60) for _ in range(3)], [1, 2, 3])
+                self.assertEqual(await store.aget('ratelimit:test:a'), 3)
+                self.assertEqual(await store.aget('ratelimit:test:missing'), 0)
+
+
+# The router only names the alias; QuerySet.db asks it without connecting,
+# so the replica aliases don't have to exist
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'], REPLICA_READ_APPS=['shop', 'orders'])
+class DatabaseRouterTests(TestCase):
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Books', slug='books')
+
+    def _request(self, method='get', cookies=None, view=None):
+        request = getattr(RequestFactory(), method)('/')
+        request.COOKIES.update(cookies or {})
+        seen = {}
+
+        def get_response(request):
+            seen['product'] = Product.objects.all().db
+            seen['user'] = User.objects.all().db
+            if view:
+                view(seen)
+            seen['after'] = Product.objects.all().db
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(get_response)(request)
+        return response, seen
+
+    def test_outside_requests_use_the_primary(self):
+        self.assertEqual(Product.objects.all().db, 'default')
+
+    def test_safe_requests_read_replicated_apps_from_replicas(self):
+        response, seen = self._request()
+        self.assertIn(seen['product'], ['replica1', 'replica2'])
+        # auth is not replicated
+        self.assertEqual(seen['user'], 'default')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_unsafe_requests_read_the_primary(self):
+        response, seen = self._request('post')
+        self.assertEqual(seen['product'], 'default')
+
+    def test_write_pins_the_request_and_the_client(self):
+        def view(seen):
+            Product.objects.create(category=self.category, name='Book', slug='book', price=Decimal('1'), stock=1)
+
+        response, seen = self._request(view=view)
+        self.assertIn(seen['product'], ['replica1', 'replica2'])
+        # Read your own writes, for the rest of the request...
+        self.assertEqual(seen['after'], 'default')
+        # ...and for the next requests of this client
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 10)
+        response, seen = self._request(cookies={PIN_COOKIE: '1'})
+        self.assertEqual(seen['product'], 'default')
+
+    def test_writes_to_other_apps_do_not_pin(self):
+        response, seen = self._request(view=lambda seen: User.objects.create_user('ada'))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_use_primary(self):
+        def view(seen):
+            with use_primary():
+                seen['primary'] = Order.objects.all().db
+            seen['replica'] = Order.objects.all().db
+
+        response, seen = self._request(view=view)
+        self.assertEqual(seen['primary'], 'default')
+        self.assertIn(seen['replica'], ['replica1', 'replica2'])
+
+    def test_objects_read_from_a_replica_are_saved_to_the_primary(self):
+        def view(seen):
+            product = Product(category=self.category, name='Book', slug='book', price=Decimal('1'), stock=1)
+            product._state.db = 'replica1'
+            seen['write'] = router.db_for_write(Product, instance=product)
+
+        response, seen = self._request(view=view)
+        self.assertEqual(seen['write'], 'default')
+
+    async def test_async_requests(self):
+        seen = {}
+
+        async def get_response(request):
+            seen['product'] = Product.objects.all().db
+            return HttpResponse()
+
+        await ReplicaRoutingMiddleware(get_response)(RequestFactory().get('/'))
+        self.assertIn(seen['product'], ['replica1', 'replica2'])
+
+
+class CacheAsideTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        reset_cache_metrics()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return f'value {self.calls}'
+
+    def _entry(self, value, expires_in, delta=0.01):
+        get_cache().set('test:key', (value, time.time() + expires_in, delta), 300)
+
+    def test_miss_then_hit(self):
+        self.assertEqual(get_or_compute('test:key', self.compute), 'value 1')
+        self.assertEqual(get_or_compute('test:key', self.compute), 'value 1')
+        self.assertEqual(cache_metrics()['test'], {'miss': 1, 'recompute': 1, 'hit': 1})
+
+    def test_stale_value_served_while_another_worker_refreshes(self):
+        self._entry('old', expires_in=-1)
+        get_cache().add('test:key:lock', 'other worker', 10)
+
+        self.assertEqual(get_or_compute('test:key', self.compute), 'old')
+        self.assertEqual(self.calls, 0)
+        self.assertEqual(cache_metrics()['test'], {'stale': 1})
+
+    def test_stale_value_refreshed_by_the_lock_holder(self):
+        self._entry('old', expires_in=-1)
+
+        self.assertEqual(get_or_compute('test:key', self.compute), 'value 1')
+        self.assertEqual(get_or_compute('test:key', self.compute), 'value 1')
+        # The lock is released
+        self.assertIsNone(get_cache().get('test:key:lock'))
+
+    def test_early_refresh(self):
+        # One second left, but the last recompute took ten
+        self._entry('old', expires_in=1, delta=10)
+        with mock.patch('ecommerce_site.cache.random.random', return_value=0.5):
+            self.assertEqual(get_or_compute('test:key', self.compute, beta=0), 'old')
+            self.assertEqual(get_or_compute('test:key', self.compute), 'value 1')
+        self.assertEqual(cache_metrics()['test'], {'hit': 1, 'early_refresh': 1, 'recompute': 1})
+
+    def test_cold_key_waits_for_the_lock_holder(self):
+        get_cache().add('test:key:lock', 'other worker', 10)
+        threading.Timer(0.1, self._entry, args=('computed elsewhere', 60)).start()
+
+        self.assertEqual(get_or_compute('test:key', self.compute, lock_timeout=5), 'computed elsewhere')
+        self.assertEqual(self.calls, 0)
+        self.assertEqual(cache_metrics()['test'], {'miss': 1, 'wait': 1})
+
+    def test_cold_key_recomputed_when_the_lock_holder_gives_up(self):
+        get_cache().add('test:key:lock', 'other worker', 10)
+        self.assertEqual(get_or_compute('test:key', self.compute, lock_timeout=0.1), 'value 1')
+
+    async def test_async(self):
+        async def compute():
+            return self.compute()
+
+        self.assertEqual(await aget_or_compute('test:key', compute), 'value 1')
+        self.assertEqual(await aget_or_compute('test:key', compute), 'value 1')
+        self.assertEqual(cache_metrics()['test'], {'miss': 1, 'recompute': 1, 'hit': 1})
+
+
+class NamespaceVersionTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_changes_every_key(self):
+        key = versioned_key('catalog', 'product', 42)
+        self.assertEqual(versioned_key('catalog', 'product', 42), key)
+        self.assertTrue(key.startswith('catalog:v') and key.endswith(':product:42'))
+
+        bump_namespace('catalog')
+        self.assertNotEqual(versioned_key('catalog', 'product', 42), key)
+
+    def test_evicted_version_does_not_revive_old_entries(self):
+        seen = {versioned_key('catalog', 'page')}
+        for _ in range(3):
+            bump_namespace('catalog')
+            seen.add(versioned_key('catalog', 'page'))
+
+        get_cache().delete('catalog:version')
+        self.assertNotIn(versioned_key('catalog', 'page'), seen)
+
+    def test_bump_without_version(self):
+        bump_namespace('catalog')
+        self.assertNotIn(versioned_key('catalog'), {'catalog:v1', 'catalog:v2'})
+
+    async def test_async(self):
+        key = await aversioned_key('catalog', 'page')
+        self.assertEqual(versioned_key('catalog', 'page'), key)
+
+
+@page_cache(query_params=('sort',))
+def sorted_page(request):
+    sorted_page.calls += 1
+    return HttpResponse(f'<p>{request.GET.get("sort", "name")} {sorted_page.calls}</p>')
+
+
+@page_cache
+def headed_page(request):
+    response = HttpResponse('<p>page</p>', content_type='text/html; charset=utf-8')
+    response['Vary'] = 'Accept-Language'
+    response['Content-Language'] = 'fr'
+    response['X-Page'] = 'products'
+    return response
+
+
+class PageCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        caches['pages'].clear()
+        sorted_page.calls = 0
+        category = Category.objects.create(name='Books', slug='books')
+        Product.objects.create(category=category, name='Book', slug='book', price=Decimal('1'), stock=1)
+
+    def _get(self, query=''):
+        request = RequestFactory().get(f'/sorted/{query}')
+        request.user = AnonymousUser()
+        return sorted_page(request).content.decode()
+
+    def test_key_on_declared_query_params(self):
+        self.assertEqual(self._get(), '<p>name 1</p>')
+        self.assertEqual(self._get(), '<p>name 1</p>')
+        self.assertEqual(self._get('?sort=price'), '<p>price 2</p>')
+        self.assertEqual(self._get('?sort=price'), '<p>price 2</p>')
+        # Undeclared parameters are never cached
+        self.assertEqual(self._get('?sort=price&x=1'), '<p>price 3</p>')
+        self.assertEqual(self._get('?sort=price&x=1'), '<p>price 4</p>')
+
+    def test_hits_keep_the_view_headers(self):
+        for _ in range(2):
+            request = RequestFactory().get('/headed/')
+            request.user = AnonymousUser()
+            response = headed_page(request)
+            self.assertEqual(response['Content-Type'], 'text/html; charset=utf-8')
+            self.assertEqual(response['Vary'], 'Accept-Language')
+            self.assertEqual(response['Content-Language'], 'fr')
+            self.assertEqual(response['X-Page'], 'products')
+
+    def test_anonymous_page_served_to_a_logged_in_user(self):
+        product = Product.objects.get()
+        self.assertContains(self.client.get(reverse('shop:product_list')), 'Login')
+        self.assertEqual(len([key for key in caches['pages']._cache if ':page:' in key]), 1)
+
+        user = User.objects.create_user('ada', password='secret')
+        self.client.force_login(user)
+        self.client.post(reverse('cart:cart_add', args=[product.id]), {'quantity': 3, 'override': True})
+        with mock.patch('ecommerce_site.page_cache.record_event') as record_event:
+            response = self.client.get(reverse('shop:product_list'))
+        record_event.assert_called_once_with('pages', 'hit')
+        self.assertContains(response, 'Hello, ada')
+        self.assertNotContains(response, 'Login')
+        self.assertInHTML('<span class="absolute -top-1 -right-1 bg-red-500 text-white rounded-full text-xs w-5 h-5 '
+                          'flex items-center justify-center">3</span>', response.content.decode())
+
+    def test_pages_live_in_their_own_cache(self):
+        self.client.get(reverse('shop:product_list'))
+        page_keys = [key for key in caches['pages']._cache if ':page:' in key]
+        self.assertEqual(len(page_keys), 1)
+
+    @override_settings(LOGIN_THROTTLE_RATES={'username': '5/300'})
+    def test_query_strings_cannot_evict_login_buckets(self):
+        for _ in range(5):
+            self.client.post(reverse('accounts:login'), {'username': 'ada', 'password': 'wrong'})
+        for number in range(400):
+            self.client.get(f'/?x={number}')
+
+        response = self.client.post(reverse('accounts:login'), {'username': 'ada', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 429)
+
+
+class StaticAssetTests(SimpleTestCase):
+
+    def setUp(self):
+        self.build_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.build_dir)
+
+    def _build(self):
+        stylesheet = self.build_dir / TAILWIND_OUTPUT
+        stylesheet.parent.mkdir(parents=True)
+        stylesheet.write_text(''.join(f'.p-{i}{{padding:{i}rem}}' for i in range(200)))
+        return stylesheet
+
+    def test_finder_serves_the_last_build_without_building(self):
+        stylesheet = self._build()
+        with self.settings(TAILWIND_BUILD_DIR=self.build_dir), mock.patch('subprocess.run') as run:
+            finder = TailwindFinder()
+            self.assertEqual(finder.find(TAILWIND_OUTPUT), str(stylesheet))
+            self.assertEqual(finder.find('css/other.css', find_all=True), [])
+            self.assertEqual([path for path, storage in finder.list([])], [TAILWIND_OUTPUT])
+        run.assert_not_called()
+
+    def test_missing_build(self):
+        with self.settings(TAILWIND_BUILD_DIR=self.build_dir, TAILWIND_USE_CDN=True):
+            self.assertEqual(list(TailwindFinder().list([])), [])
+        with self.settings(TAILWIND_BUILD_DIR=self.build_dir, TAILWIND_USE_CDN=False):
+            with self.assertRaisesMessage(ImproperlyConfigured, 'build_css'):
+                list(TailwindFinder().list([]))
+
+    def test_build_css_without_the_cli(self):
+        with self.settings(TAILWIND_BUILD_DIR=self.build_dir, TAILWIND_CLI=str(self.build_dir / 'tailwindcss')):
+            with self.assertRaisesMessage(CommandError, 'npm install'):
+                call_command('build_css')
+
+    def test_production_storage(self):
+        settings_backend = subprocess.run(
+            [sys.executable, '-c', 'from django.conf import settings; print(settings.STORAGES["staticfiles"]["BACKEND"])'],
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'ecommerce_site.settings', 'DEBUG': 'False'},
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        self.assertEqual(settings_backend, 'whitenoise.storage.CompressedManifestStaticFilesStorage')
+
+    def test_collectstatic_hashes_and_compresses_the_stylesheet(self):
+        self._build()
+        static_root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, static_root)
+        with self.settings(
+            TAILWIND_BUILD_DIR=self.build_dir, STATIC_ROOT=static_root,
+            STATICFILES_FINDERS=['ecommerce_site.staticfiles.TailwindFinder'],
+            STORAGES={**settings.STORAGES, 'staticfiles': {
+                'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+            }},
+        ):
+            call_command('collectstatic', interactive=False, verbosity=0)
+        hashed = json.loads((static_root / 'staticfiles.json').read_text())['paths'][TAILWIND_OUTPUT]
+        self.assertRegex(hashed, r'^css/tailwind\.min\.[0-9a-f]{12}\.css$')
+        for suffix in ('', '.br', '.gz'):
+            self.assertTrue((static_root / f'{hashed}{suffix}').exists())
+
+
+class EstimatedCountPaginatorTests(TestCase):
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Books', slug='books')
+        for i in range(6):
+            Product.objects.create(
+                category=self.category, name=f'Book {i}', slug=f'book-{i}', price=Decimal('1'), stock=1,
+                available=i % 2 == 0,
+            )
+        # Deleted rows still count towards the highest primary key
+        Product.objects.filter(slug='book-0').delete()
+
+    def test_exact_below_the_threshold(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(EstimatedCountPaginator(Product.objects.order_by('pk'), 2).count, 5)
+        self.assertEqual(len(queries), 1)
+        # A bounded count, not COUNT(*) over the table
+        self.assertIn('LIMIT 10001', queries[0]['sql'])
+
+    @mock.patch.object(EstimatedCountPaginator, 'exact_threshold', 3)
+    def test_estimate_beyond_the_threshold(self):
+        last = Product.objects.order_by('-pk').first().pk
+        self.assertEqual(EstimatedCountPaginator(Product.objects.order_by('pk'), 2).count, last)
+        # Filtered querysets can't be estimated on SQLite: exact count
+        self.assertEqual(EstimatedCountPaginator(Product.objects.filter(available=False).order_by('pk'), 2).count, 3)
@@ -18,12 +18,15 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from perf.views import slow_queries
 
 urlpatterns = [
+    path('admin/perf/slow-queries/', slow_queries, name='slow_queries'),
     path('admin/', admin.site.urls),
     path('accounts/', include('accounts.urls')),
     path('cart/', include('cart.urls')),
     path('orders/', include('orders.urls')),
+    path('metrics', include('perf.urls')),
     path('', include('shop.urls')),
 ]
 
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce_site.settings')
 
 application = get_wsgi_application()
+
+# Load views and URL patterns now: in the gunicorn master when preloading
+from ecommerce_site.startup import warm_up  # noqa: E402
+
+warm_up()
@@ -0,0 +1,53 @@
+"""
+Gunicorn configuration:
+
+    gunicorn -c gunicorn.conf.py ecommerce_site.wsgi:application
+    GUNICORN_WORKER_CLASS=uvicorn_worker.UvicornWorker \
+        gunicorn -c gunicorn.conf.py ecommerce_site.asgi:application
+
+The application is preloaded in the master process, so workers are forked
+with Django, the views and the URL patterns already loaded and share that
+memory copy-on-write; new workers start serving immediately.
+"""
+import gc
+import multiprocessing
+
+from decouple import config as env
+
+
+bind = env('GUNICORN_BIND', default='127.0.0.1:8000')
+# 'uvicorn_worker.UvicornWorker' serves ecommerce_site.asgi:application
+worker_class = env('GUNICORN_WORKER_CLASS', default='sync')
+# A sync worker handles one request at a time, so there are more workers
+# than CPUs to cover database and gateway waits. An ASGI worker keeps many
+# requests in flight on its event loop: one per CPU is enough.
+asgi = 'uvicorn' in worker_class.lower()
+workers = env(
+    'GUNICORN_WORKERS',
+    default=multiprocessing.cpu_count() if asgi else multiprocessing.cpu_count() * 2 + 1,
+    cast=int,
+)
+threads = env('GUNICORN_THREADS', default=1, cast=int)
+# Behind nginx, which buffers slow clients; also uvicorn's keep-alive timeout
+keepalive = env('GUNICORN_KEEPALIVE', default=5, cast=int)
+# Recycle workers now and then, staggered so they don't restart together
+max_requests = env('GUNICORN_MAX_REQUESTS', default=10000, cast=int)
+max_requests_jitter = max_requests // 10
+preload_app = env('GUNICORN_PRELOAD', default=True, cast=bool)
+accesslog = env('GUNICORN_ACCESS_LOG', default='-')
+
+
+def when_ready(server):
+    # Move everything loaded so far into the permanent generation. The
+    # collector then never touches those objects, so their memory pages
+    # stay shared with the workers instead of being copied on first GC.
+    gc.freeze()
+
+
+def pre_fork(server, worker):
+    # Workers must open their own database and cache connections
+    from django.core.cache import caches
+    from django.db import connections
+
+    connections.close_all()
+    caches.close_all()
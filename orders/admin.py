@@ -1,16 +1,161 @@
 from django.contrib import admin
-from .models import Order, OrderItem
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.forms.models import BaseInlineFormSet
+from django.template.response import TemplateResponse
+from ecommerce_site.paginator import EstimatedCountPaginator
+from shop.models import Category, Product
+from .export import export_response
+from .models import ArchivedOrder, Order, OrderItem, Payment, SalesRollup
+from .rollups import monthly_revenue, top_rollups
+
+
+class PaginatedInlineFormSet(BaseInlineFormSet):
+    """Inline formset that only loads one page of related objects"""
+    per_page = 25
+    page_number = 1
+    
+    def get_queryset(self):
+        if not hasattr(self, '_page'):
+            paginator = Paginator(super().get_queryset(), self.per_page)
+            self._page = paginator.get_page(self.page_number)
+        return self._page.object_list
+    
+    @property
+    def page(self):
+        self.get_queryset()
+        return self._page
+    
+    @property
+    def page_links(self):
+        """(page number, URL) pairs that keep the rest of the query string"""
+        links = []
+        for number in self.page.paginator.page_range:
+            query = self.query.copy()
+            query[self.page_param] = number
+            links.append((number, f'?{query.urlencode()}'))
+        return links
 
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     raw_id_fields = ['product']
+    formset = PaginatedInlineFormSet
+    template = 'admin/orders/order/tabular_paginated.html'
+    page_param = 'items_page'
+    
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.page_number = request.GET.get(self.page_param, 1)
+        formset.page_param = self.page_param
+        # e.g. _changelist_filters, so switching pages doesn't lose the changelist state
+        formset.query = request.GET
+        return formset
 
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'first_name', 'last_name', 'email', 'city', 'paid', 'created', 'updated']
-    list_filter = ['paid', 'created', 'updated']
-    search_fields = ['first_name', 'last_name', 'email']
+    list_filter = ['paid']
+    list_select_related = ['user']
+    date_hierarchy = 'created'
+    search_fields = ['email']
+    search_help_text = 'Order number, or email address (exact or starting with)'
     inlines = [OrderItemInline]
     readonly_fields = ['created', 'updated']
+    raw_id_fields = ['user']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ['export_as_csv', 'export_as_ndjson']
+    
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Search by order number or email prefix using index range scans
+        instead of unindexed icontains lookups.
+        """
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if term.lstrip('#').isdigit():
+            return queryset.filter(id=int(term.lstrip('#'))), False
+        query = Q()
+        for prefix in {term, term.lower()}:
+            query |= Q(email__gte=prefix, email__lt=prefix + '\uffff')
+        return queryset.filter(query), False
+    
+    @admin.action(description='Export selected orders as CSV')
+    def export_as_csv(self, request, queryset):
+        return export_response(queryset, 'csv')
+    
+    @admin.action(description='Export selected orders as NDJSON')
+    def export_as_ndjson(self, request, queryset):
+        return export_response(queryset, 'ndjson')
+
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'first_name', 'last_name', 'email', 'paid', 'total_cost', 'created', 'archived_at']
+    list_filter = ['paid', 'period']
+    search_fields = ['=id', '=email']
+    raw_id_fields = ['user']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+
+@admin.register(SalesRollup)
+class SalesRollupAdmin(admin.ModelAdmin):
+    """Sales dashboard; reads only the precomputed daily rollups."""
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+    
+    def changelist_view(self, request, extra_context=None):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        months = monthly_revenue(12)
+        peak = max((revenue for _, revenue, _ in months), default=0) or 1
+        chart = [
+            {'month': month, 'revenue': revenue, 'orders': orders, 'percent': int(revenue * 100 / peak)}
+            for month, revenue, orders in months
+        ]
+        
+        top_products = top_rollups('product')
+        products = Product.objects.in_bulk([int(row['key']) for row in top_products])
+        for row in top_products:
+            row['label'] = products.get(int(row['key']), f'Product #{row["key"]}')
+        
+        top_categories = top_rollups('category')
+        categories = Category.objects.in_bulk([int(row['key']) for row in top_categories])
+        for row in top_categories:
+            row['label'] = categories.get(int(row['key']), f'Category #{row["key"]}')
+        
+        payment_methods = top_rollups('payment_method')
+        method_names = dict(Payment.PAYMENT_METHODS, stripe='Stripe')
+        for row in payment_methods:
+            row['label'] = method_names.get(row['key'], row['key'])
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Sales dashboard',
+            'opts': self.model._meta,
+            'chart': chart,
+            'total_revenue': sum(row['revenue'] for row in chart),
+            'top_products': top_products,
+            'top_categories': top_categories,
+            'payment_methods': payment_methods,
+            **(extra_context or {}),
+        }
+        return TemplateResponse(request, 'admin/orders/salesrollup/dashboard.html', context)
@@ -0,0 +1,118 @@
+"""
+Order Archive
+Moves old orders out of the live Order/OrderItem/Payment tables into
+ArchivedOrder, and reads them back transparently for the order views.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from ecommerce_site.async_views import alist
+from ecommerce_site.cache import aget_or_compute, get_or_compute
+from .models import ArchivedOrder, Order
+
+
+def archive_cutoff(days=None):
+    """Return the creation time before which orders are archived"""
+    if days is None:
+        days = settings.ORDER_ARCHIVE_AFTER_DAYS
+    return timezone.now() - timedelta(days=days)
+
+
+def archive_chunk(cutoff, chunk_size=500):
+    """
+    Archive the oldest chunk of orders created before ``cutoff``.
+
+    Each chunk is copied and deleted in a single transaction, so an
+    interrupted run leaves no half-archived orders and the next run simply
+    picks up where it stopped.
+
+    Returns:
+        int: Number of orders archived (0 when nothing is left)
+    """
+    with transaction.atomic():
+        order_ids = list(
+            Order.objects.filter(created__lt=cutoff)
+            .order_by('created', 'id')
+            .values_list('id', flat=True)[:chunk_size]
+        )
+        if not order_ids:
+            return 0
+
+        orders = (
+            Order.objects.filter(id__in=order_ids)
+            .select_related('payment')
+            .prefetch_related('items__product')
+        )
+        # An order already in the archive raises IntegrityError and rolls the
+        # chunk back rather than being deleted without a copy
+        ArchivedOrder.objects.bulk_create([ArchivedOrder.from_order(order) for order in orders])
+        Order.objects.filter(id__in=order_ids).delete()
+    return len(order_ids)
+
+
+def get_order_or_archived(order_id):
+    """
+    Return the live order with this id, or its rehydrated archived copy.
+
+    Returns:
+        Order or None
+    """
+    order = (
+        Order.objects.filter(id=order_id)
+        .select_related('payment')
+        .prefetch_related('items__product')
+        .first()
+    )
+    if order is not None:
+        return order
+    archived = ArchivedOrder.objects.filter(id=order_id).first()
+    return archived.to_order() if archived is not None else None
+
+
+def _archived_history(user):
+    return ArchivedOrder.objects.filter(user=user).order_by('-created')[:settings.ORDER_HISTORY_ARCHIVED_LIMIT]
+
+
+def user_order_history(user):
+    """
+    Return the user's live orders followed by their newest archived ones
+    (at most ORDER_HISTORY_ARCHIVED_LIMIT), newest first.
+    """
+    orders = list(Order.objects.filter(user=user).prefetch_related('items'))
+    orders.extend(archived.to_order() for archived in _archived_history(user))
+    return orders
+
+
+async def auser_order_history(user):
+    """user_order_history() for async views"""
+    orders = await alist(Order.objects.filter(user=user).prefetch_related('items'))
+    orders.extend(archived.to_order() for archived in await alist(_archived_history(user)))
+    return orders
+
+
+def order_history_key(user_id):
+    return f'orders:history:{user_id}'
+
+
+def cached_order_history(user):
+    """
+    user_order_history() through the cache; invalidated by the order signals
+    whenever one of the user's orders changes.
+    """
+    return get_or_compute(
+        order_history_key(user.pk),
+        lambda: user_order_history(user),
+        ttl=settings.ORDER_HISTORY_CACHE_TTL,
+    )
+
+
+async def acached_order_history(user):
+    """cached_order_history() for async views"""
+    return await aget_or_compute(
+        order_history_key(user.pk),
+        lambda: auser_order_history(user),
+        ttl=settings.ORDER_HISTORY_CACHE_TTL,
+    )
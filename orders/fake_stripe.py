@@ -0,0 +1,234 @@
+"""
+Fake Stripe Server
+A local stand-in for the Stripe API used for load testing checkout.
+
+Implements the small part of the API the shop uses (Payment Intent
+create/retrieve) plus a test-only confirm endpoint that delivers signed
+webhooks using the same scheme ``stripe.Webhook.construct_event`` verifies.
+Point the shop at it with ``STRIPE_API_BASE=http://127.0.0.1:12111``.
+"""
+import hashlib
+import hmac
+import json
+import random
+import re
+import secrets
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+
+def generate_signature_header(payload, secret, timestamp=None):
+    """
+    Build a ``Stripe-Signature`` header for a webhook payload
+
+    Args:
+        payload (str): Raw JSON body of the event
+        secret (str): Webhook endpoint secret (``whsec_...``)
+        timestamp (int): Signing time (default: now)
+
+    Returns:
+        str: Header value in the ``t=...,v1=...`` format
+    """
+    timestamp = int(timestamp or time.time())
+    signed_payload = f'{timestamp}.{payload}'
+    signature = hmac.new(
+        secret.encode('utf-8'),
+        signed_payload.encode('utf-8'),
+        hashlib.sha256
+    ).hexdigest()
+    return f't={timestamp},v1={signature}'
+
+
+def _parse_form(body):
+    """Decode a Stripe-style form body (``metadata[key]=value``) into a dict"""
+    data = {}
+    for key, value in parse_qsl(body, keep_blank_values=True):
+        match = re.match(r'^(\w+)\[(\w+)\]$', key)
+        if match:
+            data.setdefault(match.group(1), {})[match.group(2)] = value
+        else:
+            data[key] = value
+    return data
+
+
+class FakeStripeHandler(BaseHTTPRequestHandler):
+    """Request handler for the fake Stripe API"""
+
+    server_version = 'FakeStripe/1.0'
+    intent_path = re.compile(r'^/v1/payment_intents/(?P<id>pi_\w+?)(?P<confirm>/confirm)?/?$')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8')
+
+        if not self.server.simulate_gateway():
+            return self._send_error(500, 'api_error', 'Simulated gateway failure')
+
+        if self.path.rstrip('/') == '/v1/payment_intents':
+            intent = self.server.create_intent(_parse_form(body))
+            return self._send_json(200, intent)
+
+        match = self.intent_path.match(self.path)
+        if match and match.group('confirm'):
+            intent, webhook_status = self.server.confirm_intent(match.group('id'))
+            if intent is None:
+                return self._send_missing(match.group('id'))
+            return self._send_json(200, intent, {'Fake-Stripe-Webhook-Status': webhook_status})
+
+        return self._send_error(404, 'invalid_request_error', f'Unrecognized request URL (POST: {self.path})')
+
+    def do_GET(self):
+        if not self.server.simulate_gateway():
+            return self._send_error(500, 'api_error', 'Simulated gateway failure')
+
+        match = self.intent_path.match(self.path)
+        if match and not match.group('confirm'):
+            intent = self.server.get_intent(match.group('id'))
+            if intent is None:
+                return self._send_missing(match.group('id'))
+            return self._send_json(200, intent)
+
+        return self._send_error(404, 'invalid_request_error', f'Unrecognized request URL (GET: {self.path})')
+
+    def _send_missing(self, intent_id):
+        return self._send_error(404, 'invalid_request_error', f"No such payment_intent: '{intent_id}'")
+
+    def _send_error(self, status, error_type, message):
+        return self._send_json(status, {'error': {'type': error_type, 'message': message}})
+
+    def _send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, str(value))
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Request-Id', f'req_{secrets.token_hex(7)}')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class FakeStripeServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server holding Payment Intents in memory
+
+    Args:
+        address (tuple): ``(host, port)`` to bind
+        webhook_url (str): Shop webhook endpoint to deliver events to
+        webhook_secret (str): Secret used to sign webhook payloads
+        latency (float): Mean simulated gateway latency in seconds
+        failure_rate (float): Share of API calls answered with a 500 error
+        decline_rate (float): Share of confirmations that fail as declined
+        seed (int): Random seed for reproducible runs
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, webhook_url=None, webhook_secret='', latency=0.0,
+                 failure_rate=0.0, decline_rate=0.0, seed=None, verbose=False):
+        super().__init__(address, FakeStripeHandler)
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.decline_rate = decline_rate
+        self.verbose = verbose
+        self.intents = {}
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def simulate_gateway(self):
+        """Sleep for the configured latency; return False if the call should fail"""
+        with self._lock:
+            delay = self._random.expovariate(1 / self.latency) if self.latency else 0
+            failed = self._random.random() < self.failure_rate
+        if delay:
+            time.sleep(delay)
+        return not failed
+
+    def create_intent(self, params):
+        intent_id = f'pi_{secrets.token_hex(12)}'
+        intent = {
+            'id': intent_id,
+            'object': 'payment_intent',
+            'amount': int(params.get('amount', 0)),
+            'currency': params.get('currency', 'usd'),
+            'client_secret': f'{intent_id}_secret_{secrets.token_hex(12)}',
+            'created': int(time.time()),
+            'livemode': False,
+            'metadata': params.get('metadata', {}),
+            'status': 'requires_payment_method',
+        }
+        with self._lock:
+            self.intents[intent_id] = intent
+        return intent
+
+    def get_intent(self, intent_id):
+        with self._lock:
+            return self.intents.get(intent_id)
+
+    def confirm_intent(self, intent_id):
+        """
+        Settle an intent and deliver the matching webhook event
+
+        Returns:
+            tuple: (intent, webhook HTTP status or None)
+        """
+        with self._lock:
+            intent = self.intents.get(intent_id)
+            if intent is None:
+                return None, None
+            declined = self._random.random() < self.decline_rate
+            intent['status'] = 'requires_payment_method' if declined else 'succeeded'
+            intent = dict(intent)
+
+        event_type = 'payment_intent.payment_failed' if declined else 'payment_intent.succeeded'
+        return intent, self.deliver_webhook(event_type, intent)
+
+    def deliver_webhook(self, event_type, data_object):
+        """POST a signed event to the shop's webhook endpoint"""
+        if not self.webhook_url:
+            return None
+        payload = json.dumps({
+            'id': f'evt_{secrets.token_hex(12)}',
+            'object': 'event',
+            'api_version': '2024-06-20',
+            'created': int(time.time()),
+            'type': event_type,
+            'data': {'object': data_object},
+        })
+        request = urllib.request.Request(
+            self.webhook_url,
+            data=payload.encode('utf-8'),
+            headers={
+                'Content-Type': 'application/json',
+                'Stripe-Signature': generate_signature_header(payload, self.webhook_secret),
+            },
+            method='POST'
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+def start_fake_stripe(host='127.0.0.1', port=0, **options):
+    """Start a FakeStripeServer in a background thread and return it"""
+    server = FakeStripeServer((host, port), **options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
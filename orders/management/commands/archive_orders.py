@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from orders.archive import archive_chunk, archive_cutoff
+from orders.models import Order
+
+
+class Command(BaseCommand):
+    help = (
+        'Move orders older than the archive horizon into the compact ArchivedOrder table. '
+        'Works in chunks and can be interrupted and re-run safely.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.ORDER_ARCHIVE_AFTER_DAYS,
+            help='Archive orders created more than this many days ago.'
+        )
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--max-chunks', type=int, default=None, help='Stop after this many chunks.')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many orders would move.')
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(options['days'])
+
+        if options['dry_run']:
+            count = Order.objects.filter(created__lt=cutoff).count()
+            self.stdout.write(f'{count} orders created before {cutoff:%Y-%m-%d} would be archived.')
+            return
+
+        total = 0
+        chunks = 0
+        while options['max_chunks'] is None or chunks < options['max_chunks']:
+            archived = archive_chunk(cutoff, options['chunk_size'])
+            if not archived:
+                break
+            total += archived
+            chunks += 1
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Archived chunk {chunks} ({archived} orders)')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {total} orders created before {cutoff:%Y-%m-%d} in {chunks} chunks.'
+        ))
@@ -0,0 +1,53 @@
+from datetime import date, datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from orders.export import EXPORT_FORMATS
+from orders.models import ArchivedOrder, Order
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream orders with their items and payment to CSV or NDJSON. '
+        'Orders moved to the archive are included, before the live ones.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--since', help='First order day to export (YYYY-MM-DD).')
+        parser.add_argument('--until', help='Last order day to export (YYYY-MM-DD).')
+        parser.add_argument('--paid', action='store_true', help='Only export paid orders.')
+        parser.add_argument('--no-archived', action='store_true', help='Skip archived orders.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--output', '-o', help='Write to this file instead of stdout.')
+
+    def _day_bound(self, value, end=False):
+        try:
+            day = date.fromisoformat(value)
+        except ValueError as e:
+            raise CommandError(f'Invalid date: {e}')
+        return timezone.make_aware(datetime.combine(day, time.max if end else time.min))
+
+    def handle(self, *args, **options):
+        filters = {}
+        if options['since']:
+            filters['created__gte'] = self._day_bound(options['since'])
+        if options['until']:
+            filters['created__lte'] = self._day_bound(options['until'], end=True)
+        if options['paid']:
+            filters['paid'] = True
+        orders = Order.objects.filter(**filters).order_by('created', 'id')
+        archived = None
+        if not options['no_archived']:
+            archived = ArchivedOrder.objects.filter(**filters).order_by('created', 'id')
+
+        stream, _ = EXPORT_FORMATS[options['format']]
+        chunks = stream(orders, options['chunk_size'], archived)
+        if options['output']:
+            with open(options['output'], 'w', newline='') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
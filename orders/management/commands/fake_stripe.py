@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from orders.fake_stripe import FakeStripeServer
+
+
+class Command(BaseCommand):
+    help = 'Run a local fake Stripe API server that delivers signed webhooks to the shop.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=12111)
+        parser.add_argument(
+            '--webhook-url', default='http://127.0.0.1:8000/orders/stripe/webhook/',
+            help='Shop endpoint that receives payment_intent.* events.'
+        )
+        parser.add_argument('--latency', type=float, default=0.0, help='Mean gateway latency in seconds.')
+        parser.add_argument('--failure-rate', type=float, default=0.0, help='Share of API calls that return HTTP 500.')
+        parser.add_argument('--decline-rate', type=float, default=0.0, help='Share of confirmations that are declined.')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        server = FakeStripeServer(
+            (options['host'], options['port']),
+            webhook_url=options['webhook_url'],
+            webhook_secret=settings.STRIPE_WEBHOOK_SECRET,
+            latency=options['latency'],
+            failure_rate=options['failure_rate'],
+            decline_rate=options['decline_rate'],
+            seed=options['seed'],
+            verbose=options['verbosity'] > 1,
+        )
+        self.stdout.write(f'Fake Stripe listening on {server.url} (webhooks -> {options["webhook_url"]})')
+        self.stdout.write(f'Start the shop with STRIPE_API_BASE={server.url} to use it.')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,30 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from orders.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily sales rollups from paid orders (live and archived).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day to rebuild (YYYY-MM-DD). Default: --days ago.')
+        parser.add_argument('--end', help='Last day to rebuild (YYYY-MM-DD). Default: today.')
+        parser.add_argument('--days', type=int, default=400)
+
+    def handle(self, *args, **options):
+        try:
+            end = date.fromisoformat(options['end']) if options['end'] else timezone.localdate()
+            start = (
+                date.fromisoformat(options['start']) if options['start']
+                else end - timedelta(days=options['days'])
+            )
+        except ValueError as e:
+            raise CommandError(f'Invalid date: {e}')
+        if start > end:
+            raise CommandError('--start must not be after --end.')
+
+        rows = rebuild_rollups(start, end)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} rollup rows for {start} to {end}.'))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.notifications import drain_outbox
+
+
+class Command(BaseCommand):
+    help = 'Send queued order and payment notifications from the outbox.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new messages.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between polls with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = drain_outbox(batch_size=options['batch_size'])
+            if sent or failed or options['verbosity'] > 1:
+                self.stdout.write(f'Sent {sent} messages, {failed} failed.')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_order_payment_method_payment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='client_secret',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='intent_amount',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='intent_status',
+            field=models.CharField(blank=True, max_length=40),
+        ),
+    ]
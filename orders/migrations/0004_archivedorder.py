@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_payment_intent_cache'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('first_name', models.CharField(max_length=50)),
+                ('last_name', models.CharField(max_length=50)),
+                ('email', models.EmailField(max_length=254)),
+                ('address', models.CharField(max_length=250)),
+                ('postal_code', models.CharField(max_length=20)),
+                ('city', models.CharField(max_length=100)),
+                ('created', models.DateTimeField()),
+                ('updated', models.DateTimeField()),
+                ('paid', models.BooleanField(default=False)),
+                ('payment_method', models.CharField(default='credit_card', max_length=20)),
+                ('total_cost', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('period', models.PositiveIntegerField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('items', models.JSONField(default=list)),
+                ('payment', models.JSONField(blank=True, default=dict)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created'],
+                'indexes': [models.Index(fields=['user', '-created'], name='orders_arch_user_id_4fcc02_idx'), models.Index(fields=['period'], name='orders_arch_period_3f41b1_idx')],
+            },
+        ),
+    ]
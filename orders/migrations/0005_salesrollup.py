@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_archivedorder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('dimension', models.CharField(choices=[('product', 'Product'), ('category', 'Category'), ('payment_method', 'Payment method')], max_length=20)),
+                ('key', models.CharField(max_length=50)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('units', models.PositiveBigIntegerField(default=0)),
+                ('orders', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['dimension', 'date'], name='orders_sale_dimensi_0e99ef_idx')],
+                'constraints': [models.UniqueConstraint(fields=('date', 'dimension', 'key'), name='unique_sales_rollup')],
+            },
+        ),
+    ]
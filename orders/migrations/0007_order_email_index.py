@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_outboxmessage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['email'], name='orders_orde_email_88c705_idx'),
+        ),
+    ]
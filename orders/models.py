@@ -1,9 +1,15 @@
-from django.db import models
+from decimal import Decimal
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.utils import timezone
 from shop.models import Product
 
 
 class Order(models.Model):
+    # Archived orders are rehydrated as unsaved Order instances with these set
+    archived = False
+    archived_items = ()
+    
     # Customer information
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     first_name = models.CharField(max_length=50)
@@ -25,14 +31,19 @@ class Order(models.Model):
         ordering = ['-created']
         indexes = [
             models.Index(fields=['-created']),
+            models.Index(fields=['email']),
         ]
 
     def __str__(self):
         return f'Order {self.id}'
 
+    def get_items(self):
+        """The order's items: the live rows, or the copies kept with an archived order"""
+        return self.archived_items if self.archived else self.items.all()
+
     def get_total_cost(self):
         """Calculate the total cost of the order"""
-        return sum(item.get_cost() for item in self.items.all())
+        return sum(item.get_cost() for item in self.get_items())
 
 
 class OrderItem(models.Model):
@@ -85,19 +96,264 @@ class Payment(models.Model):
     # Additional payment info (stored as JSON for flexibility)
     payment_details = models.JSONField(default=dict, blank=True)
     
+    # Cached Stripe Payment Intent state (avoids gateway round trips on retries)
+    intent_amount = models.PositiveIntegerField(blank=True, null=True)
+    intent_status = models.CharField(max_length=40, blank=True)
+    client_secret = models.CharField(max_length=255, blank=True)
+    
+    # Payment Intent statuses after which the intent can no longer be used
+    TERMINAL_INTENT_STATUSES = ('succeeded', 'canceled')
+    
     class Meta:
         ordering = ['-created']
     
     def __str__(self):
-        return f'Payment {self.id} for Order {self.order.id}'
+        return f'Payment {self.id} for Order {self.order_id}'
+    
+    def can_reuse_intent(self, amount_cents):
+        """Check whether the cached Payment Intent can be reused for this amount"""
+        return (
+            bool(self.transaction_id and self.client_secret)
+            and self.intent_amount == amount_cents
+            and self.intent_status not in self.TERMINAL_INTENT_STATUSES
+            and self.status != 'completed'
+        )
+    
+    def cache_intent(self, payment_intent, amount_cents):
+        """Store the Payment Intent details locally"""
+        self.transaction_id = payment_intent['id']
+        self.client_secret = payment_intent['client_secret']
+        self.intent_amount = amount_cents
+        self.intent_status = payment_intent['status']
     
     def mark_as_completed(self):
         """Mark payment as completed and update order"""
-        from django.utils import timezone
-        self.status = 'completed'
-        self.processed_at = timezone.now()
-        self.save()
+        from .rollups import record_paid_order
+        
+        with transaction.atomic():
+            self.status = 'completed'
+            self.processed_at = timezone.now()
+            if self.payment_method == 'stripe':
+                self.intent_status = 'succeeded'
+            self.save()
+            
+            # Mark order as paid. The conditional UPDATE claims the transition,
+            # so when the webhook and the success page both complete the
+            # payment it is counted in the rollups and announced once.
+            newly_paid = Order.objects.filter(pk=self.order_id, paid=False).update(
+                paid=True, updated=timezone.now()
+            ) == 1
+            self.order.paid = True
+            if newly_paid:
+                record_paid_order(self.order)
+                OutboxMessage.enqueue('payment_received', self.order)
+
+
+class OutboxMessage(models.Model):
+    """
+    Notification written in the same transaction as the order or payment
+    change that triggers it, and sent later by `manage.py send_outbox` so
+    email delivery never runs on the checkout path.
+    """
+    KINDS = [
+        ('order_created', 'Order confirmation'),
+        ('payment_received', 'Payment receipt'),
+    ]
+    
+    STATUSES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    
+    kind = models.CharField(max_length=30, choices=KINDS)
+    # No database constraint so the message survives the order being archived
+    order = models.ForeignKey(Order, on_delete=models.DO_NOTHING, db_constraint=False,
+                              related_name='+')
+    recipient = models.EmailField()
+    status = models.CharField(max_length=20, choices=STATUSES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        return f'{self.get_kind_display()} for Order {self.order_id}'
+    
+    @classmethod
+    def enqueue(cls, kind, order):
+        """Queue a notification; call inside the transaction that changed the order"""
+        return cls.objects.create(kind=kind, order_id=order.id, recipient=order.email)
+
+
+class SalesRollup(models.Model):
+    """
+    Daily sales totals for paid orders, one row per day and dimension value
+    (a product, a category or a payment method). Maintained incrementally as
+    orders are paid and rebuilt in bulk by `manage.py rebuild_sales_rollups`.
+    """
+    DIMENSIONS = [
+        ('product', 'Product'),
+        ('category', 'Category'),
+        ('payment_method', 'Payment method'),
+    ]
+    
+    date = models.DateField()
+    dimension = models.CharField(max_length=20, choices=DIMENSIONS)
+    key = models.CharField(max_length=50)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.PositiveBigIntegerField(default=0)
+    orders = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'dimension', 'key'], name='unique_sales_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['dimension', 'date']),
+        ]
+    
+    def __str__(self):
+        return f'{self.date} {self.dimension}={self.key}'
+
+
+class ArchivedOrder(models.Model):
+    """
+    Compact copy of an order moved out of the live tables by the
+    archive_orders command. Items and payment are stored as JSON, so one
+    row replaces an Order plus its OrderItem and Payment rows.
+    """
+    # Same primary key as the original order so existing links keep working
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True,
+                             related_name='archived_orders')
+    first_name = models.CharField(max_length=50)
+    last_name = models.CharField(max_length=50)
+    email = models.EmailField()
+    address = models.CharField(max_length=250)
+    postal_code = models.CharField(max_length=20)
+    city = models.CharField(max_length=100)
+    created = models.DateTimeField()
+    updated = models.DateTimeField()
+    paid = models.BooleanField(default=False)
+    payment_method = models.CharField(max_length=20, default='credit_card')
+    total_cost = models.DecimalField(max_digits=12, decimal_places=2)
+    
+    # Partition key (YYYYMM of the order creation date)
+    period = models.PositiveIntegerField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    items = models.JSONField(default=list)
+    payment = models.JSONField(default=dict, blank=True)
+    
+    class Meta:
+        ordering = ['-created']
+        indexes = [
+            models.Index(fields=['user', '-created']),
+            models.Index(fields=['period']),
+        ]
+    
+    def __str__(self):
+        return f'Archived order {self.id}'
+    
+    @classmethod
+    def from_order(cls, order):
+        """Build an archive row from an order with items and payment loaded"""
+        items = [
+            {
+                'product_id': item.product_id,
+                'product_name': item.product.name,
+                'price': str(item.price),
+                'quantity': item.quantity,
+            }
+            for item in order.items.all()
+        ]
+        payment = {}
+        if hasattr(order, 'payment'):
+            p = order.payment
+            payment = {
+                'payment_method': p.payment_method,
+                'status': p.status,
+                'transaction_id': p.transaction_id,
+                'amount': str(p.amount),
+                'created': p.created.isoformat(),
+                'processed_at': p.processed_at.isoformat() if p.processed_at else None,
+                'payment_details': p.payment_details,
+            }
+        return cls(
+            id=order.id,
+            user_id=order.user_id,
+            first_name=order.first_name,
+            last_name=order.last_name,
+            email=order.email,
+            address=order.address,
+            postal_code=order.postal_code,
+            city=order.city,
+            created=order.created,
+            updated=order.updated,
+            paid=order.paid,
+            payment_method=order.payment_method,
+            total_cost=sum((item.get_cost() for item in order.items.all()), Decimal('0')),
+            period=order.created.year * 100 + order.created.month,
+            items=items,
+            payment=payment,
+        )
+    
+    def to_order(self):
+        """
+        Rehydrate as an unsaved Order (items in archived_items, payment
+        cached) so the order templates can render it without touching the
+        live tables.
+        """
+        from django.utils.dateparse import parse_datetime
+        
+        order = Order(
+            id=self.id,
+            user_id=self.user_id,
+            first_name=self.first_name,
+            last_name=self.last_name,
+            email=self.email,
+            address=self.address,
+            postal_code=self.postal_code,
+            city=self.city,
+            created=self.created,
+            updated=self.updated,
+            paid=self.paid,
+            payment_method=self.payment_method,
+        )
+        order.archived = True
+        
+        items = []
+        for data in self.items:
+            item = OrderItem(
+                order=order,
+                product_id=data['product_id'],
+                price=Decimal(data['price']),
+                quantity=data['quantity'],
+            )
+            item.product = Product(id=data['product_id'], name=data['product_name'])
+            items.append(item)
+        order.archived_items = items
         
-        # Mark order as paid
-        self.order.paid = True
-        self.order.save()
+        if self.payment:
+            data = self.payment
+            payment = Payment(
+                order=order,
+                payment_method=data['payment_method'],
+                status=data['status'],
+                transaction_id=data['transaction_id'],
+                amount=Decimal(data['amount']),
+                created=parse_datetime(data['created']),
+                processed_at=parse_datetime(data['processed_at']) if data['processed_at'] else None,
+                payment_details=data['payment_details'],
+            )
+            Order.payment.related.set_cached_value(order, payment)
+        return order
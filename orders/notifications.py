@@ -0,0 +1,118 @@
+"""
+Order Notifications
+Drains the OutboxMessage table: claims due messages, renders them and sends
+them over a single mail connection, retrying failures with backoff.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .archive import get_order_or_archived
+from .models import OutboxMessage
+
+
+SUBJECTS = {
+    'order_created': 'Order #{order_id} confirmation',
+    'payment_received': 'Payment received for order #{order_id}',
+}
+
+
+def retry_delay(attempts):
+    """Exponential backoff for the given attempt number, capped"""
+    delay = settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(delay, settings.OUTBOX_RETRY_MAX_SECONDS))
+
+
+def claim_batch(batch_size=100, lease_seconds=300):
+    """
+    Claim up to ``batch_size`` due messages for this worker.
+
+    Claimed messages get their next attempt pushed past the lease, so other
+    workers skip them; if this worker dies they become due again.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            OutboxMessage.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        OutboxMessage.objects.filter(id__in=ids).update(
+            attempts=F('attempts') + 1,
+            next_attempt_at=now + timedelta(seconds=lease_seconds),
+        )
+    return list(OutboxMessage.objects.filter(id__in=ids))
+
+
+def build_email(message, connection=None):
+    """Render an outbox message into an EmailMessage"""
+    order = get_order_or_archived(message.order_id)
+    if order is None:
+        raise LookupError(f'Order {message.order_id} no longer exists')
+    body = render_to_string(f'orders/email/{message.kind}.txt', {'order': order})
+    return EmailMessage(
+        subject=SUBJECTS[message.kind].format(order_id=message.order_id),
+        body=body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[message.recipient],
+        connection=connection,
+    )
+
+
+def send_batch(messages, connection=None, max_attempts=None):
+    """
+    Send claimed messages over one mail connection.
+
+    Returns:
+        tuple: (sent, failed) counts
+    """
+    if max_attempts is None:
+        max_attempts = settings.OUTBOX_MAX_ATTEMPTS
+    sent = failed = 0
+    for message in messages:
+        try:
+            build_email(message, connection).send()
+        except Exception as e:
+            failed += 1
+            message.last_error = f'{type(e).__name__}: {e}'
+            if message.attempts >= max_attempts:
+                message.status = 'failed'
+            else:
+                message.next_attempt_at = timezone.now() + retry_delay(message.attempts)
+            message.save(update_fields=['status', 'next_attempt_at', 'last_error'])
+        else:
+            sent += 1
+            message.status = 'sent'
+            message.sent_at = timezone.now()
+            message.last_error = ''
+            message.save(update_fields=['status', 'sent_at', 'last_error'])
+    return sent, failed
+
+
+def drain_outbox(batch_size=100, max_batches=None, connection=None):
+    """
+    Send due messages batch by batch until none are left, keeping a single
+    mail connection open for the whole run.
+
+    Returns:
+        tuple: (sent, failed) counts
+    """
+    connection = connection or get_connection()
+    total_sent = total_failed = batches = 0
+    with connection:
+        while max_batches is None or batches < max_batches:
+            messages = claim_batch(batch_size)
+            if not messages:
+                break
+            sent, failed = send_batch(messages, connection)
+            total_sent += sent
+            total_failed += failed
+            batches += 1
+    return total_sent, total_failed
@@ -0,0 +1,184 @@
+"""
+Sales Rollups
+Daily revenue, units and order counts per product, category and payment
+method, kept in SalesRollup so reporting never aggregates raw order items.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from shop.models import Product
+from .models import ArchivedOrder, OrderItem, SalesRollup
+
+
+def _empty_totals():
+    return {'revenue': Decimal('0'), 'units': 0, 'orders': 0}
+
+
+def _add_to_rollup(day, dimension, key, revenue, units, orders):
+    """Atomically add deltas to one rollup row, creating it if needed"""
+    lookup = {'date': day, 'dimension': dimension, 'key': str(key)}
+    deltas = {
+        'revenue': F('revenue') + revenue,
+        'units': F('units') + units,
+        'orders': F('orders') + orders,
+    }
+    if SalesRollup.objects.filter(**lookup).update(**deltas):
+        return
+    try:
+        with transaction.atomic():
+            SalesRollup.objects.create(revenue=revenue, units=units, orders=orders, **lookup)
+    except IntegrityError:
+        # Another worker created the row first
+        SalesRollup.objects.filter(**lookup).update(**deltas)
+
+
+def record_paid_order(order):
+    """Add a newly paid order to the daily rollups"""
+    day = timezone.localdate(order.created)
+    totals = {
+        'product': defaultdict(_empty_totals),
+        'category': defaultdict(_empty_totals),
+    }
+    items = order.items.values_list('product_id', 'product__category_id', 'price', 'quantity')
+    for product_id, category_id, price, quantity in items:
+        for dimension, key in (('product', product_id), ('category', category_id)):
+            row = totals[dimension][key]
+            row['revenue'] += price * quantity
+            row['units'] += quantity
+            row['orders'] = 1
+
+    order_revenue = sum((row['revenue'] for row in totals['product'].values()), Decimal('0'))
+    order_units = sum(row['units'] for row in totals['product'].values())
+    totals['payment_method'] = {
+        order.payment_method: {'revenue': order_revenue, 'units': order_units, 'orders': 1}
+    }
+
+    for dimension, rows in totals.items():
+        for key, row in rows.items():
+            _add_to_rollup(day, dimension, key, **row)
+
+
+def _aggregate_live(start, end):
+    """Group paid live order items by day for each dimension in the database"""
+    items = (
+        OrderItem.objects
+        .filter(order__paid=True, order__created__date__gte=start, order__created__date__lte=end)
+        .annotate(day=TruncDate('order__created'))
+    )
+    dimensions = {
+        'product': 'product_id',
+        'category': 'product__category_id',
+        'payment_method': 'order__payment_method',
+    }
+    for dimension, field in dimensions.items():
+        rows = (
+            items.values('day', field)
+            .annotate(
+                revenue=Sum(F('price') * F('quantity')),
+                units=Sum('quantity'),
+                orders=Count('order_id', distinct=True),
+            )
+            .order_by()
+        )
+        for row in rows:
+            yield SalesRollup(
+                date=row['day'],
+                dimension=dimension,
+                key=str(row[field]),
+                revenue=row['revenue'],
+                units=row['units'],
+                orders=row['orders'],
+            )
+
+
+def _aggregate_archived(start, end, chunk_size=2000):
+    """Group paid archived orders by day, streaming the archive in chunks"""
+    totals = defaultdict(_empty_totals)
+    categories = {}
+    archived = (
+        ArchivedOrder.objects
+        .filter(paid=True, created__date__gte=start, created__date__lte=end)
+        .values_list('created', 'payment_method', 'items')
+        .iterator(chunk_size=chunk_size)
+    )
+    for created, payment_method, items in archived:
+        day = timezone.localdate(created)
+        missing = {item['product_id'] for item in items} - categories.keys()
+        if missing:
+            categories.update(Product.objects.filter(id__in=missing).values_list('id', 'category_id'))
+
+        touched = set()
+        for item in items:
+            keys = [('product', item['product_id']), ('payment_method', payment_method)]
+            if categories.get(item['product_id']) is not None:
+                keys.append(('category', categories[item['product_id']]))
+            for dimension, key in keys:
+                row = totals[(day, dimension, str(key))]
+                row['revenue'] += Decimal(item['price']) * item['quantity']
+                row['units'] += item['quantity']
+                touched.add((day, dimension, str(key)))
+        for key in touched:
+            totals[key]['orders'] += 1
+
+    for (day, dimension, key), row in totals.items():
+        yield SalesRollup(date=day, dimension=dimension, key=key, **row)
+
+
+def rebuild_rollups(start, end, batch_size=1000):
+    """
+    Recompute all rollups between ``start`` and ``end`` (inclusive) from
+    paid orders, live and archived, replacing the existing rows.
+
+    Returns:
+        int: Number of rollup rows written
+    """
+    merged = {}
+    for rollup in list(_aggregate_live(start, end)) + list(_aggregate_archived(start, end)):
+        key = (rollup.date, rollup.dimension, rollup.key)
+        if key in merged:
+            existing = merged[key]
+            existing.revenue += rollup.revenue
+            existing.units += rollup.units
+            existing.orders += rollup.orders
+        else:
+            merged[key] = rollup
+
+    with transaction.atomic():
+        SalesRollup.objects.filter(date__gte=start, date__lte=end).delete()
+        SalesRollup.objects.bulk_create(merged.values(), batch_size=batch_size)
+    return len(merged)
+
+
+def monthly_revenue(months=12):
+    """Return [(month, revenue, orders)] for the last ``months`` months"""
+    today = timezone.localdate()
+    first = date(today.year, today.month, 1)
+    for _ in range(months - 1):
+        first = (first - timedelta(days=1)).replace(day=1)
+    rows = (
+        SalesRollup.objects
+        .filter(dimension='payment_method', date__gte=first)
+        .annotate(month=TruncMonth('date'))
+        .values('month')
+        .annotate(revenue=Sum('revenue'), orders=Sum('orders'))
+        .order_by('month')
+    )
+    return [(row['month'], row['revenue'], row['orders']) for row in rows]
+
+
+def top_rollups(dimension, days=30, limit=10):
+    """Return the best selling keys of a dimension over the last ``days`` days"""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    return list(
+        SalesRollup.objects
+        .filter(dimension=dimension, date__gte=since)
+        .values('key')
+        .annotate(revenue=Sum('revenue'), units=Sum('units'), orders=Sum('orders'))
+        .order_by('-revenue')[:limit]
+    )
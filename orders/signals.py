@@ -0,0 +1,23 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from ecommerce_site.cache import invalidate
+from .archive import order_history_key
+from .models import Order
+
+
+def invalidate_order_history(user_id):
+    """Drop the user's cached order history once the change is committed"""
+    if user_id is not None:
+        transaction.on_commit(lambda: invalidate(order_history_key(user_id)))
+
+
+def order_changed(sender, instance, **kwargs):
+    # Item changes (checkout, admin inlines) are saved together with their
+    # order, in the same transaction
+    invalidate_order_history(instance.user_id)
+
+
+def connect_order_history_invalidation():
+    post_save.connect(order_changed, sender=Order, dispatch_uid='order-history-save')
+    post_delete.connect(order_changed, sender=Order, dispatch_uid='order-history-delete')
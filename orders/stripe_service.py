@@ -1,20 +1,52 @@
 """
 Stripe Payment Service
 Handles Stripe payment processing for the e-commerce site
+
+The Stripe SDK is imported on first use, not when this module (or the URL
+configuration) is imported, so workers that never take a payment don't pay
+for loading it.
 """
-import stripe
 from django.conf import settings
 from decimal import Decimal
 
-# Configure Stripe
-stripe.api_key = settings.STRIPE_SECRET_KEY
+
+def get_stripe():
+    """
+    Return the configured ``stripe`` module, importing it on first call.
+    Settings are applied on every call so overrides take effect.
+    """
+    import stripe
+    
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    if settings.STRIPE_API_BASE:
+        stripe.api_base = settings.STRIPE_API_BASE
+    return stripe
+
+
+class WebhookSignatureError(Exception):
+    """Raised when a webhook payload doesn't match its Stripe-Signature header"""
+
+
+def construct_webhook_event(payload, sig_header, secret):
+    """
+    Verify and parse a Stripe webhook.
+    
+    Raises:
+        ValueError: If the payload is not valid JSON
+        WebhookSignatureError: If the signature doesn't match
+    """
+    stripe = get_stripe()
+    try:
+        return stripe.Webhook.construct_event(payload, sig_header, secret)
+    except stripe.error.SignatureVerificationError as e:
+        raise WebhookSignatureError(str(e)) from e
 
 
 class StripePaymentService:
     """Service class for handling Stripe payments"""
     
     def __init__(self):
-        self.stripe = stripe
+        self.stripe = get_stripe()
     
     def create_payment_intent(self, amount_cents, currency='usd', customer_email=None):
         """
@@ -29,7 +61,7 @@ class StripePaymentService:
             dict: Payment Intent object or error
         """
         try:
-            intent = stripe.PaymentIntent.create(
+            intent = self.stripe.PaymentIntent.create(
                 amount=amount_cents,
                 currency=currency,
                 metadata={
@@ -44,7 +76,7 @@ class StripePaymentService:
                 'payment_intent': intent,
                 'client_secret': intent.client_secret
             }
-        except stripe.error.StripeError as e:
+        except self.stripe.error.StripeError as e:
             return {
                 'success': False,
                 'error': str(e)
@@ -61,13 +93,13 @@ class StripePaymentService:
             dict: Confirmation result
         """
         try:
-            intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+            intent = self.stripe.PaymentIntent.retrieve(payment_intent_id)
             return {
                 'success': True,
                 'status': intent.status,
                 'payment_intent': intent
             }
-        except stripe.error.StripeError as e:
+        except self.stripe.error.StripeError as e:
             return {
                 'success': False,
                 'error': str(e)
@@ -84,7 +116,7 @@ class StripePaymentService:
             dict: Token creation result
         """
         try:
-            token = stripe.Token.create(
+            token = self.stripe.Token.create(
                 card={
                     'number': card_number,
                     'exp_month': 12,
@@ -96,7 +128,7 @@ class StripePaymentService:
                 'success': True,
                 'token': token
             }
-        except stripe.error.StripeError as e:
+        except self.stripe.error.StripeError as e:
             return {
                 'success': False,
                 'error': str(e)
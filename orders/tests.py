@@ -1,3 +1,611 @@
-from django.test import TestCase
+import csv
+import json
+import urllib.error
+import urllib.request
+from datetime import timedelta
+from io import StringIO
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import Permission, User
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from perf.querybudget import QueryBudgetMixin
+from shop.models import Category, Product
+from .archive import archive_chunk, get_order_or_archived, user_order_history
+from .fake_stripe import start_fake_stripe
+from .models import ArchivedOrder, Order, OrderItem, OutboxMessage, Payment, SalesRollup
+from .notifications import drain_outbox
+from .rollups import rebuild_rollups
+from .stripe_service import StripePaymentService, WebhookSignatureError, construct_webhook_event
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class OutboxTests(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name='Books', slug='books')
+        self.product = Product.objects.create(
+            category=category, name='Django Book', slug='django-book',
+            price=Decimal('25.00'), stock=10
+        )
+
+    def _create_order(self):
+        order = Order.objects.create(
+            first_name='Ada', last_name='Lovelace', email='ada@example.com',
+            address='1 Analytical St', postal_code='12345', city='London',
+            payment_method='paypal'
+        )
+        OrderItem.objects.create(order=order, product=self.product, price=self.product.price, quantity=2)
+        return order
+
+    @mock.patch('orders.views._process_payment', return_value=True)
+    def test_checkout_queues_notifications_without_sending(self, process_payment):
+        session = self.client.session
+        session['cart'] = {str(self.product.id): {'quantity': 1, 'price': '25.00'}}
+        session.save()
+
+        response = self.client.post(reverse('orders:order_create'), {
+            'first_name': 'Ada', 'last_name': 'Lovelace', 'email': 'ada@example.com',
+            'address': '1 Analytical St', 'postal_code': '12345', 'city': 'London',
+            'payment_method': 'paypal', 'paypal_email': 'ada@example.com',
+        })
+
+        self.assertEqual(response.status_code, 302)
+        kinds = list(OutboxMessage.objects.values_list('kind', flat=True))
+        self.assertEqual(kinds, ['order_created', 'payment_received'])
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_drain_sends_pending_messages(self):
+        order = self._create_order()
+        payment = Payment.objects.create(order=order, payment_method='paypal', amount=Decimal('50.00'))
+        payment.mark_as_completed()
+        payment.mark_as_completed()
+
+        sent, failed = drain_outbox()
+
+        self.assertEqual((sent, failed), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['ada@example.com'])
+        self.assertIn(f'#{order.id}', mail.outbox[0].subject)
+        self.assertIn('$50.00', mail.outbox[0].body)
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.status, 'sent')
+        self.assertEqual(drain_outbox(), (0, 0))
+
+    def test_payment_received_once_when_completed_twice(self):
+        order = self._create_order()
+        payment = Payment.objects.create(order=order, payment_method='paypal', amount=Decimal('50.00'))
+        payment.mark_as_completed()
+        # The webhook completes its own copy of the same payment
+        Payment.objects.get(pk=payment.pk).mark_as_completed()
+
+        self.assertEqual(OutboxMessage.objects.filter(kind='payment_received').count(), 1)
+
+    def test_emails_are_not_html_escaped(self):
+        order = self._create_order()
+        Order.objects.filter(pk=order.pk).update(last_name="O'Brien")
+        Product.objects.filter(pk=self.product.pk).update(name='Salt & Pepper')
+        OutboxMessage.enqueue('order_created', order)
+
+        drain_outbox()
+
+        body = mail.outbox[0].body
+        self.assertIn("Ada O'Brien", body)
+        self.assertIn('2 x Salt & Pepper', body)
+        self.assertNotIn('&amp;', body)
+        self.assertTrue(body.startswith('Hi Ada,'))
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2)
+    def test_failed_sends_are_retried_with_backoff(self):
+        order = self._create_order()
+        OutboxMessage.enqueue('order_created', order)
+
+        with mock.patch('orders.notifications.build_email', side_effect=ConnectionError('down')):
+            self.assertEqual(drain_outbox(), (0, 1))
+            message = OutboxMessage.objects.get()
+            self.assertEqual(message.status, 'pending')
+            self.assertEqual(message.attempts, 1)
+            self.assertGreater(message.next_attempt_at, timezone.now())
+            self.assertIn('down', message.last_error)
+
+            # Not due yet
+            self.assertEqual(drain_outbox(), (0, 0))
+
+            OutboxMessage.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+            self.assertEqual(drain_outbox(), (0, 1))
+            self.assertEqual(OutboxMessage.objects.get().status, 'failed')
+
+        self.assertEqual(len(mail.outbox), 0)
+
+
+class OrdersQueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('ada', 'ada@example.com', 'analytical-engine')
+        category = Category.objects.create(name='Books', slug='books')
+        self.products = [
+            Product.objects.create(
+                category=category, name=f'Book {i}', slug=f'book-{i}',
+                price=Decimal('10.00'), stock=5
+            )
+            for i in range(3)
+        ]
+        self.order = Order.objects.create(
+            user=self.user, first_name='Ada', last_name='Lovelace', email='ada@example.com',
+            address='1 Analytical St', postal_code='12345', city='London',
+            payment_method='paypal'
+        )
+        for product in self.products:
+            OrderItem.objects.create(order=self.order, product=product, price=product.price, quantity=1)
+        Payment.objects.create(order=self.order, payment_method='paypal', amount=Decimal('30.00'))
+        self.client.force_login(self.user)
+
+    def _fill_cart(self):
+        session = self.client.session
+        session['cart'] = {
+            str(product.id): {'quantity': 1, 'price': str(product.price)}
+            for product in self.products
+        }
+        session.save()
+
+    def test_order_create(self):
+        self._fill_cart()
+        with self.assertQueryBudget(3):
+            self.client.get(reverse('orders:order_create'))
+
+        # Rollups are upserted once per product and category by design
+        with mock.patch('orders.views._process_payment', return_value=True):
+            with self.assertQueryBudget(40, max_repeats=None):
+                response = self.client.post(reverse('orders:order_create'), {
+                    'first_name': 'Ada', 'last_name': 'Lovelace', 'email': 'ada@example.com',
+                    'address': '1 Analytical St', 'postal_code': '12345', 'city': 'London',
+                    'payment_method': 'paypal', 'paypal_email': 'ada@example.com',
+                })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_order_detail(self):
+        with self.assertQueryBudget(5, max_repeats=1):
+            self.client.get(reverse('orders:order_detail', args=[self.order.id]))
+
+    def test_order_history(self):
+        with self.assertQueryBudget(4, max_repeats=1):
+            self.client.get(reverse('orders:order_history'))
+
+    def test_payment_retry(self):
+        with self.assertQueryBudget(5, max_repeats=1):
+            self.client.get(reverse('orders:payment_retry', args=[self.order.id]))
+
+    def test_stripe_payment_cancel(self):
+        with self.assertQueryBudget(3):
+            self.client.get(reverse('orders:stripe_payment_cancel', args=[self.order.id]))
+
+    def test_stripe_payment_success(self):
+        with self.assertQueryBudget(3):
+            self.client.get(reverse('orders:stripe_payment_success', args=[self.order.id]))
+
+    @override_settings(STRIPE_WEBHOOK_SECRET='whsec_test')
+    def test_stripe_webhook(self):
+        with self.assertQueryBudget(0):
+            response = self.client.post(
+                reverse('orders:stripe_webhook'), '{}', content_type='application/json',
+                HTTP_STRIPE_SIGNATURE='t=0,v1=invalid'
+            )
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(ASYNC_VIEWS=True)
+class AsyncOrderHistoryTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('ada', 'ada@example.com', 'analytical-engine')
+        category = Category.objects.create(name='Books', slug='books')
+        product = Product.objects.create(
+            category=category, name='Book', slug='book', price=Decimal('10.00'), stock=5
+        )
+        self.order = Order.objects.create(
+            user=self.user, first_name='Ada', last_name='Lovelace', email='ada@example.com',
+            address='1 Analytical St', postal_code='12345', city='London',
+            payment_method='paypal'
+        )
+        OrderItem.objects.create(order=self.order, product=product, price=product.price, quantity=2)
+
+    async def test_login_required(self):
+        response = await self.async_client.get(reverse('orders:order_history'))
+        self.assertEqual(response.status_code, 302)
+
+    async def test_order_history(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('orders:order_history'))
+        self.assertContains(response, f'#{self.order.id}')
+        self.assertContains(response, '$20.00')
+
+
+class StripeIntentReuseTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('ada', 'ada@example.com', 'analytical-engine')
+        category = Category.objects.create(name='Books', slug='books')
+        product = Product.objects.create(
+            category=category, name='Book', slug='book', price=Decimal('10.00'), stock=5
+        )
+        self.order = Order.objects.create(
+            user=self.user, first_name='Ada', last_name='Lovelace', email='ada@example.com',
+            address='1 Analytical St', postal_code='12345', city='London',
+            payment_method='stripe'
+        )
+        OrderItem.objects.create(order=self.order, product=product, price=product.price, quantity=2)
+        self.payment = Payment(order=self.order, payment_method='stripe', amount=Decimal('20.00'), status='failed')
+        self.payment.cache_intent(
+            {'id': 'pi_1', 'client_secret': 'pi_1_secret', 'status': 'requires_payment_method'}, 2000
+        )
+        self.payment.save()
+        self.client.force_login(self.user)
+
+    def _retry(self, create_payment_intent):
+        with mock.patch('orders.views.StripePaymentService') as service:
+            service.return_value.dollars_to_cents.side_effect = lambda amount: int(amount * 100)
+            service.return_value.create_payment_intent.side_effect = create_payment_intent
+            response = self.client.post(
+                reverse('orders:payment_retry', args=[self.order.id]), {'payment_method': 'stripe'}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.payment.refresh_from_db()
+        return service.return_value.create_payment_intent
+
+    def test_reuses_intent_and_resets_failed_status(self):
+        create_payment_intent = self._retry(AssertionError('should reuse the cached intent'))
+
+        create_payment_intent.assert_not_called()
+        self.assertEqual(self.payment.transaction_id, 'pi_1')
+        self.assertEqual(self.payment.status, 'pending')
+
+    def test_recreates_intent_when_amount_changed(self):
+        Payment.objects.filter(pk=self.payment.pk).update(intent_amount=1500)
+        create_payment_intent = self._retry(lambda **kwargs: {
+            'success': True,
+            'payment_intent': {'id': 'pi_2', 'client_secret': 'pi_2_secret', 'status': 'requires_payment_method'},
+        })
+
+        create_payment_intent.assert_called_once_with(amount_cents=2000, customer_email='ada@example.com')
+        self.assertEqual(
+            (self.payment.transaction_id, self.payment.intent_amount, self.payment.status), ('pi_2', 2000, 'pending')
+        )
+
+    def test_can_reuse_intent(self):
+        self.assertTrue(self.payment.can_reuse_intent(2000))
+        self.assertFalse(self.payment.can_reuse_intent(1500))
+        self.payment.intent_status = 'canceled'
+        self.assertFalse(self.payment.can_reuse_intent(2000))
+        self.payment.intent_status = 'requires_payment_method'
+        self.payment.status = 'completed'
+        self.assertFalse(self.payment.can_reuse_intent(2000))
+
+
+class FakeStripeTests(TestCase):
+
+    def setUp(self):
+        self.server = start_fake_stripe(webhook_secret='whsec_fake')
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def _post(self, path, data=b''):
+        request = urllib.request.Request(self.server.url + path, data=data, method='POST')
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status, json.load(response)
+        except urllib.error.HTTPError as e:
+            return e.code, json.load(e)
+
+    def test_sdk_creates_and_retrieves_intents(self):
+        with self.settings(STRIPE_API_BASE=self.server.url):
+            service = StripePaymentService()
+            created = service.create_payment_intent(2000, customer_email='ada@example.com')
+            self.assertTrue(created['success'], created)
+            intent = created['payment_intent']
+            self.assertEqual((intent.amount, intent.status), (2000, 'requires_payment_method'))
+            self.assertEqual(intent.metadata['customer_email'], 'ada@example.com')
+
+            confirmed = service.confirm_payment(intent.id)
+            self.assertEqual(confirmed['status'], 'requires_payment_method')
+            missing = service.confirm_payment('pi_missing')
+            self.assertFalse(missing['success'])
+            self.assertIn('pi_missing', missing['error'])
+
+    def test_endpoints(self):
+        status, intent = self._post('/v1/payment_intents', b'amount=500&metadata[order]=7')
+        self.assertEqual((status, intent['amount'], intent['metadata']), (200, 500, {'order': '7'}))
+
+        status, confirmed = self._post(f'/v1/payment_intents/{intent["id"]}/confirm')
+        self.assertEqual((status, confirmed['status']), (200, 'succeeded'))
+        self.assertEqual(self.server.get_intent(intent['id'])['status'], 'succeeded')
+
+        status, error = self._post('/v1/payment_intents/pi_missing/confirm')
+        self.assertEqual((status, error['error']['type']), (404, 'invalid_request_error'))
+        status, error = self._post('/v1/charges')
+        self.assertEqual(status, 404)
+
+        self.server.failure_rate = 1
+        status, error = self._post('/v1/payment_intents', b'amount=500')
+        self.assertEqual((status, error['error']['type']), (500, 'api_error'))
+
+    @override_settings(STRIPE_WEBHOOK_SECRET='whsec_fake')
+    def test_webhooks_are_accepted_by_the_shop(self):
+        order = Order.objects.create(
+            first_name='Ada', last_name='Lovelace', email='ada@example.com',
+            address='1 Analytical St', postal_code='12345', city='London', payment_method='stripe'
+        )
+        payment = Payment.objects.create(order=order, payment_method='stripe', amount=Decimal('5.00'))
+        intent = self.server.create_intent({'amount': '500'})
+        payment.transaction_id = intent['id']
+        payment.save()
+
+        self.server.webhook_url = 'http://shop.test/webhook/'
+        with mock.patch('urllib.request.urlopen') as urlopen:
+            urlopen.return_value.__enter__.return_value.status = 200
+            self.server.confirm_intent(intent['id'])
+        request = urlopen.call_args.args[0]
+        signature = request.get_header('Stripe-signature')
+
+        event = construct_webhook_event(request.data, signature, 'whsec_fake')
+        self.assertEqual(event['type'], 'payment_intent.succeeded')
+        with self.assertRaises(WebhookSignatureError):
+            construct_webhook_event(request.data, signature, 'whsec_other')
+
+        response = self.client.post(
+            reverse('orders:stripe_webhook'), request.data, content_type='application/json',
+            HTTP_STRIPE_SIGNATURE=signature
+        )
+        self.assertEqual(response.status_code, 200)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'completed')
+
+
+class ArchiveTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('ada', 'ada@example.com', 'analytical-engine')
+        category = Category.objects.create(name='Books', slug='books')
+        self.product = Product.objects.create(
+            category=category, name='Book', slug='book', price=Decimal('10.00'), stock=5
+        )
+
+    def _create_order(self, days_ago):
+        order = Order.objects.create(
+            user=self.user, first_name='Ada', last_name='Lovelace', email='ada@example.com',
+            address='1 Analytical St', postal_code='12345', city='London',
+            payment_method='paypal'
+        )
+        OrderItem.objects.create(order=order, product=self.product, price=self.product.price, quantity=2)
+        Payment.objects.create(
+            order=order, payment_method='paypal', amount=Decimal('20.00'), status='completed',
+            transaction_id=f'PP_{order.id}'
+        )
+        Order.objects.filter(pk=order.pk).update(created=timezone.now() - timedelta(days=days_ago), paid=True)
+        return order
+
+    def test_round_trip(self):
+        order = self._create_order(days_ago=400)
+        self._create_order(days_ago=1)
+
+        self.assertEqual(archive_chunk(timezone.now() - timedelta(days=365)), 1)
+        self.assertFalse(Order.objects.filter(pk=order.pk).exists())
+        self.assertFalse(OrderItem.objects.filter(order_id=order.pk).exists())
+
+        # The live tables, then the archive
+        with self.assertNumQueries(2):
+            archived = get_order_or_archived(order.pk)
+        self.assertIsNone(get_order_or_archived(0))
+        with self.assertNumQueries(0):
+            self.assertTrue(archived.archived)
+            self.assertTrue(archived.paid)
+            self.assertEqual(len(archived.get_items()), 1)
+            item = archived.get_items()[0]
+            self.assertEqual((item.product.name, item.quantity, item.get_cost()), ('Book', 2, Decimal('20.00')))
+            self.assertEqual(archived.get_total_cost(), Decimal('20.00'))
+            self.assertEqual(archived.payment.transaction_id, f'PP_{order.pk}')
+
+    def test_conflicting_archive_copy_keeps_the_live_order(self):
+        order = self._create_order(days_ago=400)
+        ArchivedOrder.from_order(Order.objects.get(pk=order.pk)).save()
+
+        with self.assertRaises(IntegrityError):
+            archive_chunk(timezone.now() - timedelta(days=365))
+        self.assertTrue(Order.objects.filter(pk=order.pk).exists())
+        self.assertTrue(OrderItem.objects.filter(order_id=order.pk).exists())
+
+    def test_archived_order_pages(self):
+        order = self._create_order(days_ago=400)
+        archive_chunk(timezone.now() - timedelta(days=365))
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('orders:order_history'))
+        self.assertContains(response, '1 item')
+        self.assertContains(response, '20.00')
+        response = self.client.get(reverse('orders:order_detail', args=[order.pk]))
+        self.assertContains(response, 'Book')
+        self.assertContains(response, '20.00')
+
+    def test_history_limits_archived_orders(self):
+        for days_ago in (400, 500, 600):
+            self._create_order(days_ago)
+        live = self._create_order(days_ago=1)
+        archive_chunk(timezone.now() - timedelta(days=365))
+        self.assertEqual(ArchivedOrder.objects.count(), 3)
+
+        with override_settings(ORDER_HISTORY_ARCHIVED_LIMIT=2):
+            orders = user_order_history(self.user)
+
+        self.assertEqual([order.archived for order in orders], [False, True, True])
+        self.assertEqual(orders[0].pk, live.pk)
+        self.assertGreater(orders[1].created, orders[2].created)
+
+
+class SalesRollupTests(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name='Books', slug='books')
+        self.products = [
+            Product.objects.create(
+                category=category, name=f'Book {i}', slug=f'book-{i}', price=Decimal('10.00'), stock=5
+            )
+            for i in range(2)
+        ]
+
+    def _paid_order(self):
+        order = Order.objects.create(
+            first_name='Ada', last_name='Lovelace', email='ada@example.com',
+            address='1 Analytical St', postal_code='12345', city='London',
+            payment_method='paypal'
+        )
+        for quantity, product in enumerate(self.products, 1):
+            OrderItem.objects.create(order=order, product=product, price=product.price, quantity=quantity)
+        payment = Payment.objects.create(order=order, payment_method='paypal', amount=Decimal('30.00'))
+        payment.mark_as_completed()
+        return order, payment
+
+    def _rollups(self):
+        return {
+            (rollup.dimension, rollup.key): (rollup.revenue, rollup.units, rollup.orders)
+            for rollup in SalesRollup.objects.all()
+        }
+
+    def test_paid_orders_are_counted_once(self):
+        order, payment = self._paid_order()
+        # The webhook and the success page both complete the payment
+        Payment.objects.get(pk=payment.pk).mark_as_completed()
+        self._paid_order()
+
+        rollups = self._rollups()
+        self.assertEqual(rollups[('payment_method', 'paypal')], (Decimal('60.00'), 6, 2))
+        self.assertEqual(rollups[('product', str(self.products[1].id))], (Decimal('40.00'), 4, 2))
+        self.assertEqual(rollups[('category', str(self.products[0].category_id))], (Decimal('60.00'), 6, 2))
+        self.assertEqual(OutboxMessage.objects.filter(kind='payment_received').count(), 2)
+        self.assertTrue(Order.objects.get(pk=order.pk).paid)
+
+    def test_rebuild_matches_incremental_rollups(self):
+        self._paid_order()
+        self._paid_order()
+        incremental = self._rollups()
+
+        today = timezone.localdate()
+        self.assertEqual(rebuild_rollups(today - timedelta(days=1), today), len(incremental))
+        self.assertEqual(self._rollups(), incremental)
+
+    def test_dashboard_requires_view_permission(self):
+        self._paid_order()
+        user = User.objects.create_user('staff', password='secret', is_staff=True)
+        self.client.force_login(user)
+        url = reverse('admin:orders_salesrollup_changelist')
+
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        user.user_permissions.add(Permission.objects.get(codename='view_salesrollup'))
+        response = self.client.get(url)
+        self.assertContains(response, 'Sales dashboard')
+        self.assertEqual(response.context['total_revenue'], Decimal('30.00'))
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name='Books', slug='books')
+        self.product = Product.objects.create(
+            category=category, name='Book', slug='book', price=Decimal('10.00'), stock=5
+        )
+        self.orders = []
+        for days_ago in (400, 10, 1):
+            order = Order.objects.create(
+                first_name='Ada', last_name="O'Brien", email='ada@example.com',
+                address='1 Analytical St', postal_code='12345', city='London',
+                payment_method='paypal'
+            )
+            OrderItem.objects.create(order=order, product=self.product, price=self.product.price, quantity=2)
+            Payment.objects.create(order=order, payment_method='paypal', amount=Decimal('20.00'))
+            Order.objects.filter(pk=order.pk).update(created=timezone.now() - timedelta(days=days_ago))
+            self.orders.append(order)
+        archive_chunk(timezone.now() - timedelta(days=365))
+
+    def _export(self, *args):
+        out = StringIO()
+        call_command('export_orders', *args, stdout=out)
+        return out.getvalue()
+
+    def test_ndjson_includes_archived_orders(self):
+        lines = [json.loads(line) for line in self._export('--format', 'ndjson').splitlines()]
+
+        self.assertEqual([line['id'] for line in lines], [order.id for order in self.orders])
+        self.assertEqual(lines[0]['items'], [
+            {'product_id': self.product.id, 'product_name': 'Book', 'price': '10.00', 'quantity': 2}
+        ])
+        self.assertEqual(lines[0]['payment']['amount'], '20.00')
+
+        lines = self._export('--format', 'ndjson', '--no-archived').splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [order.id for order in self.orders[1:]])
+
+    def test_csv_date_range(self):
+        since = (timezone.localdate() - timedelta(days=500)).isoformat()
+        until = (timezone.localdate() - timedelta(days=5)).isoformat()
+        rows = list(csv.DictReader(StringIO(self._export('--since', since, '--until', until))))
+
+        self.assertEqual([int(row['order_id']) for row in rows], [order.id for order in self.orders[:2]])
+        self.assertEqual(rows[0]['last_name'], "O'Brien")
+        self.assertEqual(rows[0]['item_quantity'], '2')
+
+
+class OrderAdminTests(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name='Books', slug='books')
+        self.product = Product.objects.create(
+            category=category, name='Book', slug='book', price=Decimal('10.00'), stock=5
+        )
+        self.orders = [
+            Order.objects.create(
+                first_name='Ada', last_name='Lovelace', email=email,
+                address='1 Analytical St', postal_code='12345', city='London'
+            )
+            for email in ('ada@example.com', 'ada.l@example.org', 'charles@example.com')
+        ]
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'secret'))
+
+    def _search(self, term):
+        response = self.client.get(reverse('admin:orders_order_changelist'), {'q': term})
+        return sorted(order.pk for order in response.context['cl'].result_list)
+
+    def test_search_by_number_or_email_prefix(self):
+        first, second, third = (order.pk for order in self.orders)
+        self.assertEqual(self._search(str(first)), [first])
+        self.assertEqual(self._search(f'#{third}'), [third])
+        self.assertEqual(self._search('ada'), [first, second])
+        self.assertEqual(self._search('ADA@example.com'), [first])
+        self.assertEqual(self._search('example.com'), [])
+
+    def test_search_uses_range_lookups(self):
+        with CaptureQueriesContext(connection) as queries:
+            self._search('ada')
+        searches = [query['sql'] for query in queries if '"orders_order"."email" >=' in query['sql']]
+        self.assertTrue(searches)
+        self.assertFalse(any('LIKE' in sql for sql in searches))
+
+    def test_items_inline_is_paginated_and_keeps_the_query_string(self):
+        order = self.orders[0]
+        for quantity in range(1, 31):
+            OrderItem.objects.create(order=order, product=self.product, price=self.product.price, quantity=quantity)
+        url = reverse('admin:orders_order_change', args=[order.pk])
+
+        response = self.client.get(url, {'_changelist_filters': 'paid__exact=1', 'items_page': 2})
+        formset = response.context['inline_admin_formsets'][0].formset
+        self.assertEqual([form.instance.quantity for form in formset.initial_forms], list(range(26, 31)))
+        self.assertContains(response, 'href="?_changelist_filters=paid__exact%3D1&amp;items_page=1"')
+        self.assertContains(response, '<span class="this-page">2</span>', html=True)
@@ -1,4 +1,5 @@
 from django.urls import path
+from ecommerce_site.async_views import async_path
 from . import views
 
 app_name = 'orders'
@@ -6,7 +7,7 @@ app_name = 'orders'
 urlpatterns = [
     path('create/', views.order_create, name='order_create'),
     path('<int:order_id>/', views.order_detail, name='order_detail'),
-    path('history/', views.order_history, name='order_history'),
+    async_path('history/', views.order_history, views.aorder_history, name='order_history'),
     path('<int:order_id>/retry/', views.payment_retry, name='payment_retry'),
     
     # Stripe payment URLs
@@ -2,16 +2,19 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
+from django.db import transaction
 import json
-import stripe
 from cart.cart import Cart
-from .models import Order, OrderItem, Payment
+from ecommerce_site.async_views import aload_request
+from ecommerce_site.db_router import use_primary
+from .archive import acached_order_history, cached_order_history, get_order_or_archived
+from .models import Order, OrderItem, OutboxMessage, Payment
 from .forms import OrderCreateForm
 from .payment_forms import PaymentForm
-from .stripe_service import StripePaymentService
+from .stripe_service import StripePaymentService, WebhookSignatureError, construct_webhook_event
 
 
 def order_create(request):
@@ -28,23 +31,28 @@ def order_create(request):
         payment_form = PaymentForm(request.POST)
         
         if form.is_valid() and payment_form.is_valid():
-            # Create the order
-            order = form.save(commit=False)
-            if request.user.is_authenticated:
-                order.user = request.user
-            order.payment_method = payment_form.cleaned_data['payment_method']
-            order.save()
-            
-            # Create order items from cart
-            total_cost = 0
-            for item in cart:
-                order_item = OrderItem.objects.create(
-                    order=order,
-                    product=item['product'],
-                    price=item['price'],
-                    quantity=item['quantity']
-                )
-                total_cost += order_item.get_cost()
+            with transaction.atomic():
+                # Create the order
+                order = form.save(commit=False)
+                if request.user.is_authenticated:
+                    order.user = request.user
+                order.payment_method = payment_form.cleaned_data['payment_method']
+                order.save()
+                
+                # Create order items from cart in a single INSERT
+                order_items = OrderItem.objects.bulk_create([
+                    OrderItem(
+                        order=order,
+                        product=item['product'],
+                        price=item['price'],
+                        quantity=item['quantity']
+                    )
+                    for item in cart
+                ])
+                total_cost = sum(order_item.get_cost() for order_item in order_items)
+                
+                # Confirmation email is sent by the outbox worker
+                OutboxMessage.enqueue('order_created', order)
             
             # Handle Stripe payments differently
             if payment_form.cleaned_data['payment_method'] == 'stripe':
@@ -111,38 +119,48 @@ def _get_payment_details(payment_data):
 
 
 def _handle_stripe_payment(request, order, payment_form):
-    """Handle Stripe payment processing"""
+    """
+    Handle Stripe payment processing.
+    Reuses the order's cached Payment Intent when the amount is unchanged.
+    """
     stripe_service = StripePaymentService()
     
     # Get payment amount in cents
-    amount_cents = stripe_service.dollars_to_cents(order.get_total_cost())
+    total_cost = order.get_total_cost()
+    amount_cents = stripe_service.dollars_to_cents(total_cost)
     
-    # Create Payment Intent
-    result = stripe_service.create_payment_intent(
-        amount_cents=amount_cents,
-        customer_email=order.email
-    )
+    payment = Payment.objects.filter(order=order).first()
     
-    if result['success']:
-        # Create payment record
-        payment = Payment.objects.create(
-            order=order,
-            payment_method='stripe',
-            amount=order.get_total_cost(),
-            transaction_id=result['payment_intent']['id'],
-            status='pending'
+    if payment is None or not payment.can_reuse_intent(amount_cents):
+        # Create Payment Intent
+        result = stripe_service.create_payment_intent(
+            amount_cents=amount_cents,
+            customer_email=order.email
         )
         
-        # Redirect to Stripe payment page
-        return render(request, 'orders/order/stripe_payment.html', {
-            'order': order,
-            'client_secret': result['client_secret'],
-            'stripe_publishable_key': settings.STRIPE_PUBLISHABLE_KEY,
-            'payment': payment
-        })
-    else:
-        messages.error(request, f'Payment initialization failed: {result["error"]}')
-        return redirect('orders:payment_retry', order_id=order.id)
+        if not result['success']:
+            messages.error(request, f'Payment initialization failed: {result["error"]}')
+            return redirect('orders:payment_retry', order_id=order.id)
+        
+        if payment is None:
+            payment = Payment(order=order)
+        payment.payment_method = 'stripe'
+        payment.amount = total_cost
+        payment.status = 'pending'
+        payment.cache_intent(result['payment_intent'], amount_cents)
+        payment.save()
+    elif payment.status == 'failed':
+        # Retrying with the same intent
+        payment.status = 'pending'
+        payment.save(update_fields=['status', 'updated'])
+    
+    # Redirect to Stripe payment page
+    return render(request, 'orders/order/stripe_payment.html', {
+        'order': order,
+        'client_secret': payment.client_secret,
+        'stripe_publishable_key': settings.STRIPE_PUBLISHABLE_KEY,
+        'payment': payment
+    })
 
 
 def _process_payment(payment, payment_data):
@@ -154,7 +172,7 @@ def _process_payment(payment, payment_data):
     import time
     
     # Simulate payment processing
-    time.sleep(1)  # Simulate network delay
+    time.sleep(settings.PAYMENT_SIMULATED_DELAY)  # Simulate network delay
     
     # For demo purposes, randomly succeed/fail payments
     # In production, integrate with Stripe, PayPal, etc.
@@ -189,13 +207,15 @@ def _process_payment(payment, payment_data):
 
 def order_detail(request, order_id):
     """
-    Display order details.
+    Display order details (including archived orders).
     """
-    order = get_object_or_404(Order, id=order_id)
+    order = get_order_or_archived(order_id)
+    if order is None:
+        raise Http404('No Order matches the given query.')
     
     # Only allow order owner or staff to view the order
     if request.user.is_authenticated:
-        if order.user != request.user and not request.user.is_staff:
+        if order.user_id != request.user.id and not request.user.is_staff:
             messages.error(request, 'You do not have permission to view this order.')
             return redirect('shop:product_list')
     else:
@@ -212,19 +232,30 @@ def order_history(request):
     """
     Display order history for the logged-in user.
     """
-    orders = Order.objects.filter(user=request.user)
+    orders = cached_order_history(request.user)
+    return render(request, 'orders/order/history.html', {'orders': orders})
+
+
+@login_required
+async def aorder_history(request):
+    """
+    order_history() for ASGI.
+    """
+    await aload_request(request)
+    orders = await acached_order_history(request.user)
     return render(request, 'orders/order/history.html', {'orders': orders})
 
 
+@use_primary()
 def payment_retry(request, order_id):
     """
     Allow users to retry payment for a failed order.
     """
-    order = get_object_or_404(Order, id=order_id)
+    order = get_object_or_404(Order.objects.prefetch_related('items__product'), id=order_id)
     
     # Check permissions
     if request.user.is_authenticated:
-        if order.user != request.user and not request.user.is_staff:
+        if order.user_id != request.user.id and not request.user.is_staff:
             messages.error(request, 'You do not have permission to access this order.')
             return redirect('shop:product_list')
     else:
@@ -239,6 +270,9 @@ def payment_retry(request, order_id):
     if request.method == 'POST':
         payment_form = PaymentForm(request.POST)
         if payment_form.is_valid():
+            if payment_form.cleaned_data['payment_method'] == 'stripe':
+                return _handle_stripe_payment(request, order, payment_form)
+            
             # Update or create payment record
             payment, created = Payment.objects.get_or_create(
                 order=order,
@@ -284,13 +318,13 @@ def stripe_webhook(request):
     endpoint_secret = settings.STRIPE_WEBHOOK_SECRET
 
     try:
-        event = stripe.Webhook.construct_event(
+        event = construct_webhook_event(
             payload, sig_header, endpoint_secret
         )
     except ValueError:
         # Invalid payload
         return JsonResponse({'error': 'Invalid payload'}, status=400)
-    except stripe.error.SignatureVerificationError:
+    except WebhookSignatureError:
         # Invalid signature
         return JsonResponse({'error': 'Invalid signature'}, status=400)
 
@@ -315,6 +349,7 @@ def stripe_webhook(request):
         try:
             payment = Payment.objects.get(transaction_id=payment_intent['id'])
             payment.status = 'failed'
+            payment.intent_status = payment_intent['status']
             payment.save()
         except Payment.DoesNotExist:
             pass
@@ -322,6 +357,7 @@ def stripe_webhook(request):
     return JsonResponse({'status': 'success'})
 
 
+@use_primary()
 def stripe_payment_success(request, order_id):
     """Handle successful Stripe payment confirmation"""
     order = get_object_or_404(Order, id=order_id)
@@ -329,13 +365,21 @@ def stripe_payment_success(request, order_id):
     # Verify payment status with Stripe
     try:
         payment = Payment.objects.get(order=order, payment_method='stripe')
-        stripe_service = StripePaymentService()
         
-        result = stripe_service.confirm_payment(payment.transaction_id)
+        if payment.status == 'completed':
+            # Already confirmed (e.g. by the webhook), no need to ask Stripe again
+            succeeded = True
+        else:
+            stripe_service = StripePaymentService()
+            result = stripe_service.confirm_payment(payment.transaction_id)
+            succeeded = result['success'] and result['status'] == 'succeeded'
+            if result['success'] and not succeeded:
+                payment.intent_status = result['status']
+                payment.save(update_fields=['intent_status', 'updated'])
+            elif succeeded:
+                payment.mark_as_completed()
         
-        if result['success'] and result['status'] == 'succeeded':
-            payment.mark_as_completed()
-            
+        if succeeded:
             # Clear cart
             cart = Cart(request)
             cart.clear()
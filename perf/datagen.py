@@ -0,0 +1,439 @@
+"""
+Benchmark Data Generator
+Bulk-creates categories, products, users and orders (with items and
+payments) using realistic distributions:
+
+- product popularity and repeat customers follow Zipf's law
+- order timestamps follow a seasonal curve (yearly peak around late
+  November/December, busier weekends and evenings, slow growth) and rise
+  with the order id, like real data
+- payment methods are mixed, with per-method success rates
+
+Rows are generated in fixed-size chunks; each chunk has its own seed derived
+from the global seed and the chunk index, and takes its product, user and
+order ids from fixed ranges. The same seed, volumes and chunk size therefore
+produce the same data whatever the number of worker processes, and chunks
+can be inserted in parallel.
+
+Model imports happen inside functions, so spawned workers can import this
+module before django.setup().
+"""
+import math
+import multiprocessing
+import random
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, time as datetime_time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from itertools import accumulate
+from statistics import NormalDist
+
+
+CATEGORY_WORDS = [
+    'Books', 'Electronics', 'Garden', 'Kitchen', 'Toys', 'Sports', 'Music', 'Office',
+    'Outdoor', 'Beauty', 'Health', 'Pets', 'Automotive', 'Fashion', 'Games', 'Tools',
+]
+PRODUCT_ADJECTIVES = ['Classic', 'Compact', 'Deluxe', 'Eco', 'Pro', 'Smart', 'Ultra', 'Vintage', 'Wireless', 'Mini']
+PRODUCT_NOUNS = ['Lamp', 'Kettle', 'Backpack', 'Speaker', 'Notebook', 'Chair', 'Camera', 'Watch', 'Mug', 'Drill']
+FIRST_NAMES = ['Ada', 'Alan', 'Grace', 'Linus', 'Margaret', 'Ken', 'Barbara', 'Dennis', 'Frances', 'Guido']
+LAST_NAMES = ['Lovelace', 'Turing', 'Hopper', 'Torvalds', 'Hamilton', 'Thompson', 'Liskov', 'Ritchie', 'Allen', 'Rossum']
+CITIES = ['London', 'Berlin', 'Paris', 'Madrid', 'Rome', 'Vienna', 'Prague', 'Warsaw', 'Dublin', 'Lisbon']
+
+# method: (share of orders, share of payments that succeed)
+PAYMENT_MIX = {
+    'stripe': (55, 0.94),
+    'credit_card': (15, 0.90),
+    'paypal': (20, 0.95),
+    'bank_transfer': (10, 0.80),
+}
+TRANSACTION_PREFIXES = {'stripe': 'pi_', 'credit_card': 'CC_', 'paypal': 'PP_', 'bank_transfer': 'BT_'}
+
+# Relative order volume per hour of day (UTC)
+HOURLY_WEIGHTS = [
+    2, 1, 1, 1, 1, 2, 3, 5, 6, 7, 7, 8,
+    9, 9, 8, 8, 8, 9, 11, 13, 14, 12, 8, 4,
+]
+
+
+def default_plan(**overrides):
+    """Generation settings; every value can be overridden by keyword"""
+    plan = {
+        'seed': 42,
+        'categories': 20,
+        'products': 10_000,
+        'users': 5_000,
+        'orders': 50_000,
+        'items_per_order': 2.5,
+        'days': 730,
+        'end': None,
+        'zipf_s': 1.1,
+        'guest_ratio': 0.3,
+        'chunk_size': 5_000,
+    }
+    plan.update(overrides)
+    return plan
+
+
+def zipf_rank(rng, n, s):
+    """
+    Draw a 0-based rank below n with P(k) roughly proportional to 1/(k+1)^s,
+    by inverting the CDF of the continuous power law: O(1) per draw, no table.
+    """
+    u = rng.random()
+    if abs(s - 1) < 1e-9:
+        x = math.exp(u * math.log(n + 1))
+    else:
+        x = (1 + u * ((n + 1) ** (1 - s) - 1)) ** (1 / (1 - s))
+    return min(int(x) - 1, n - 1)
+
+
+def rank_permutation(n, seed):
+    """
+    Map popularity ranks onto ids with a fixed affine permutation, so the
+    most popular rows aren't simply the oldest ones.
+    """
+    rng = random.Random(f'{seed}:popularity:{n}')
+    step = rng.randrange(n // 2, n) | 1 if n > 2 else 1
+    while math.gcd(step, n) != 1:
+        step += 2
+    offset = rng.randrange(n)
+    return lambda rank: (rank * step + offset) % n
+
+
+def day_weight(day):
+    """Relative order volume of a date: yearly season, weekends and growth"""
+    day_of_year = day.timetuple().tm_yday
+    # Holiday peak centred on December 5th, spring bump in May
+    season = 1 + 0.8 * math.exp(-((day_of_year - 339) / 18) ** 2) + 0.2 * math.exp(-((day_of_year - 135) / 25) ** 2)
+    weekend = 1.25 if day.weekday() >= 5 else 1.0
+    return season * weekend
+
+
+def seasonal_slots(end, days):
+    """
+    Hourly slots covering ``days`` days before ``end`` with the cumulative
+    weight of each, for inverse-CDF sampling of order timestamps.
+    """
+    start = end - timedelta(days=days)
+    slots, cum_weights, total = [], [], 0.0
+    for offset in range(days):
+        day = (start + timedelta(days=offset)).date()
+        # Slow growth: the last day sees twice the orders of the first one
+        weight = day_weight(day) * (1 + offset / days)
+        for hour, hour_weight in enumerate(HOURLY_WEIGHTS):
+            total += weight * hour_weight
+            slots.append(datetime.combine(day, datetime_time(hour), tzinfo=dt_timezone.utc))
+            cum_weights.append(total)
+    return slots, cum_weights
+
+
+def seasonal_timestamp(slots, cum_weights, quantile):
+    """Timestamp at the given quantile (0-1) of the seasonal distribution"""
+    target = quantile * cum_weights[-1]
+    index = min(bisect_left(cum_weights, target), len(slots) - 1)
+    previous = cum_weights[index - 1] if index else 0.0
+    within = (target - previous) / (cum_weights[index] - previous)
+    return slots[index] + timedelta(seconds=within * 3600)
+
+
+_PRICE_DISTRIBUTION = NormalDist(mu=math.log(35), sigma=0.9)
+
+
+def product_price(seed, product_id):
+    """
+    Log-normally distributed price (median ~$35) as a pure function of the
+    product id, so order chunks know prices without querying products.
+    """
+    uniform = ((product_id * 2654435761 + seed * 40503) % 1_000_003 + 0.5) / 1_000_003
+    return Decimal(min(max(math.exp(_PRICE_DISTRIBUTION.inv_cdf(uniform)), 1.0), 5000.0)).quantize(Decimal('0.01'))
+
+
+def person(index):
+    """Deterministic (first name, last name, city) for a user or guest number"""
+    return (
+        FIRST_NAMES[index % len(FIRST_NAMES)],
+        LAST_NAMES[(index // len(FIRST_NAMES)) % len(LAST_NAMES)],
+        CITIES[(index * 7) % len(CITIES)],
+    )
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create() keep the given created/updated values instead of now()"""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def chunk_ranges(first_id, count, chunk_size):
+    """[(chunk index, first id, row count), ...] covering ``count`` ids from first_id"""
+    return [
+        (index, first_id + start, min(chunk_size, count - start))
+        for index, start in enumerate(range(0, count, chunk_size))
+    ]
+
+
+def _rng(plan, kind, index):
+    return random.Random(f"{plan['seed']}:{kind}:{index}")
+
+
+def create_categories(plan, first_id):
+    from shop.models import Category
+
+    categories = []
+    for i in range(plan['categories']):
+        category_id = first_id + i
+        word = CATEGORY_WORDS[i % len(CATEGORY_WORDS)]
+        name = word if i < len(CATEGORY_WORDS) else f'{word} {i // len(CATEGORY_WORDS) + 1}'
+        categories.append(Category(id=category_id, name=name, slug=f'{name.lower().replace(" ", "-")}-{category_id}'))
+    Category.objects.bulk_create(categories)
+    return [category.id for category in categories]
+
+
+def create_products(plan, chunk, category_ids):
+    from django.db import transaction
+    from shop.models import Product
+
+    index, first_id, count = chunk
+    rng = _rng(plan, 'products', index)
+    created = plan['end'] - timedelta(days=plan['days'])
+    products = []
+    for product_id in range(first_id, first_id + count):
+        name = f'{rng.choice(PRODUCT_ADJECTIVES)} {rng.choice(PRODUCT_NOUNS)} {product_id}'
+        timestamp = created + timedelta(seconds=rng.uniform(0, plan['days'] * 86400))
+        products.append(Product(
+            id=product_id,
+            # Category sizes are skewed too: a few big categories, many small ones
+            category_id=category_ids[zipf_rank(rng, len(category_ids), 0.8)],
+            name=name,
+            slug=name.lower().replace(' ', '-'),
+            description=f'{name}: generated benchmark product.',
+            price=product_price(plan['seed'], product_id),
+            stock=rng.choice([0, 3, 10, 25, 50, 100, 250]),
+            available=rng.random() > 0.03,
+            created=timestamp,
+            updated=timestamp,
+        ))
+    with explicit_timestamps(Product), transaction.atomic():
+        Product.objects.bulk_create(products)
+    return count
+
+
+def create_users(plan, chunk, password_hash):
+    from django.contrib.auth.models import User
+    from django.db import transaction
+
+    index, first_id, count = chunk
+    rng = _rng(plan, 'users', index)
+    end = plan['end']
+    users = []
+    for user_id in range(first_id, first_id + count):
+        first_name, last_name, city = person(user_id)
+        users.append(User(
+            id=user_id,
+            username=f'user{user_id}',
+            email=f'user{user_id}@example.com',
+            first_name=first_name,
+            last_name=last_name,
+            password=password_hash,
+            date_joined=end - timedelta(seconds=rng.uniform(0, plan['days'] * 86400)),
+        ))
+    with transaction.atomic():
+        User.objects.bulk_create(users)
+    return count
+
+
+def create_orders(plan, chunk, product_ids, user_ids):
+    """
+    Insert one chunk of orders with their items and payments in a single
+    transaction. ``product_ids``/``user_ids`` are (first id, count) ranges;
+    items and payments aren't referenced, so they keep automatic ids.
+
+    Returns:
+        int: Number of order items created
+    """
+    from django.db import transaction
+    from orders.models import Order, OrderItem, Payment
+
+    index, first_id, count = chunk
+    rng = _rng(plan, 'orders', index)
+    end = plan['end']
+    slots, cum_weights = seasonal_slots(end, plan['days'])
+    product_for_rank = rank_permutation(product_ids[1], plan['seed'])
+    methods = list(PAYMENT_MIX)
+    method_weights = list(accumulate(share for share, success in PAYMENT_MIX.values()))
+    # Items per order: 1 + geometric, with the requested mean
+    extra_item_p = 1 / max(plan['items_per_order'], 1.0)
+    total_orders = plan['orders']
+
+    orders, items, payments = [], [], []
+    for order_id in range(first_id, first_id + count):
+        position = order_id - plan['first_order_id']
+        created = seasonal_timestamp(slots, cum_weights, (position + rng.random()) / total_orders)
+
+        if user_ids[1] and rng.random() >= plan['guest_ratio']:
+            # Repeat customers: a few users place many of the orders
+            user_id = user_ids[0] + zipf_rank(rng, user_ids[1], 0.7)
+            first_name, last_name, city = person(user_id)
+            email = f'user{user_id}@example.com'
+        else:
+            user_id = None
+            guest = rng.randrange(10 ** 6)
+            first_name, last_name, city = person(guest)
+            email = f'guest{guest}@example.com'
+
+        lines = {}
+        while True:
+            product_id = product_ids[0] + product_for_rank(zipf_rank(rng, product_ids[1], plan['zipf_s']))
+            lines[product_id] = lines.get(product_id, 0) + rng.choices([1, 2, 3], [75, 18, 7])[0]
+            if rng.random() < extra_item_p:
+                break
+
+        method = methods[bisect_right(method_weights, rng.random() * method_weights[-1])]
+        succeeded = rng.random() < PAYMENT_MIX[method][1]
+        if succeeded:
+            status = 'processing' if method == 'bank_transfer' and rng.random() < 0.2 else 'completed'
+        else:
+            status = rng.choice(['failed', 'pending'])
+        paid = status == 'completed'
+
+        amount = Decimal('0')
+        for product_id, quantity in lines.items():
+            price = product_price(plan['seed'], product_id)
+            amount += price * quantity
+            items.append(OrderItem(order_id=order_id, product_id=product_id, price=price, quantity=quantity))
+
+        orders.append(Order(
+            id=order_id, user_id=user_id, first_name=first_name, last_name=last_name, email=email,
+            address=f'{rng.randint(1, 999)} Market Street', postal_code=f'{rng.randint(10000, 99999)}', city=city,
+            created=created, updated=created, paid=paid, payment_method=method,
+        ))
+        payments.append(Payment(
+            order_id=order_id, payment_method=method, status=status, amount=amount,
+            transaction_id=f'{TRANSACTION_PREFIXES[method]}{rng.randrange(16 ** 12):012x}' if status != 'pending' else None,
+            created=created, updated=created,
+            processed_at=created + timedelta(seconds=rng.randint(2, 600)) if paid else None,
+            intent_status='succeeded' if method == 'stripe' and paid else '',
+        ))
+
+    with explicit_timestamps(Order, Payment), transaction.atomic():
+        Order.objects.bulk_create(orders)
+        OrderItem.objects.bulk_create(items)
+        Payment.objects.bulk_create(payments)
+    return len(items)
+
+
+def _init_worker():
+    import django
+
+    django.setup()
+
+
+def _run_chunks(function, chunks, workers, plan, *args):
+    """Run function(plan, chunk, *args) for every chunk, in worker processes if workers > 1"""
+    if workers <= 1:
+        for chunk in chunks:
+            yield function(plan, chunk, *args)
+        return
+
+    from django.db import connections
+
+    # Children open their own connections
+    connections.close_all()
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker) as executor:
+        futures = [executor.submit(function, plan, chunk, *args) for chunk in chunks]
+        for future in futures:
+            yield future.result()
+
+
+def next_id(model):
+    from django.db.models import Max
+
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+def reset_sequences(*models):
+    """Move the id sequences past the explicit ids (no-op on SQLite)"""
+    from django.core.management.color import no_style
+    from django.db import connection
+
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def generate(plan, workers=1, progress=None):
+    """
+    Generate the data described by ``plan`` (see default_plan()), appending
+    to whatever is already in the database.
+
+    Args:
+        workers: Processes inserting chunks in parallel
+        progress: Optional callable(phase, rows done, rows total)
+
+    Returns:
+        dict: Rows created per model
+    """
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from orders.models import Order, OrderItem, Payment
+    from shop.models import Category, Product
+
+    progress = progress or (lambda phase, done, total: None)
+    plan = dict(plan)
+    plan['end'] = plan['end'] or datetime.now(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    chunk_size = plan['chunk_size']
+
+    category_ids = create_categories(plan, next_id(Category))
+    progress('categories', len(category_ids), plan['categories'])
+
+    first_product = next_id(Product)
+    done = 0
+    for created in _run_chunks(
+        create_products, chunk_ranges(first_product, plan['products'], chunk_size), workers, plan, category_ids
+    ):
+        done += created
+        progress('products', done, plan['products'])
+
+    first_user = next_id(User)
+    # Hashing is slow by design; every generated user gets the same password
+    password_hash = make_password('generated-password')
+    done = 0
+    for created in _run_chunks(
+        create_users, chunk_ranges(first_user, plan['users'], chunk_size), workers, plan, password_hash
+    ):
+        done += created
+        progress('users', done, plan['users'])
+
+    plan['first_order_id'] = next_id(Order)
+    done = items = 0
+    for created in _run_chunks(
+        create_orders, chunk_ranges(plan['first_order_id'], plan['orders'], chunk_size), workers, plan,
+        (first_product, plan['products']), (first_user, plan['users']),
+    ):
+        items += created
+        done = min(done + chunk_size, plan['orders'])
+        progress('orders', done, plan['orders'])
+
+    reset_sequences(Category, Product, User, Order, OrderItem, Payment)
+    return {
+        'categories': len(category_ids),
+        'products': plan['products'],
+        'users': plan['users'],
+        'orders': plan['orders'],
+        'order_items': items,
+        'payments': plan['orders'],
+    }
@@ -0,0 +1,395 @@
+"""
+Index Advisor
+Finds the queries of a workload whose plans read a whole table (SQLite
+'SCAN', PostgreSQL 'Seq Scan') or sort their result in a temporary B-tree,
+and proposes an index for each: the columns the query compares for
+equality, then its ORDER BY columns, then one range column, with boolean
+flags it filters on moved into a partial index condition.
+
+A workload is either captured by replaying the storefront in-process
+(capture_storefront_workload) or ingested from the slow query log's JSON
+export. Each proposal is measured by creating the index inside a
+transaction, re-running the queries it covers and rolling back, so the
+database is left unchanged; indexes that remove no scan or sort from any
+plan are dropped.
+"""
+import hashlib
+import hmac
+import json
+import re
+import statistics
+import time
+from contextlib import ExitStack
+from random import Random
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections, migrations, models, transaction
+from django.db.migrations.autodetector import MigrationAutodetector
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.writer import MigrationWriter
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from .slowqueries import EXPLAINABLE, explain, fingerprint, normalize_sql
+
+
+# Plan lines: (kind, table or alias)
+SQLITE_SCAN_RE = re.compile(r'^\s*SCAN (\w+)\b(?! USING (?:COVERING )?INDEX)', re.MULTILINE)
+SQLITE_SORT_RE = re.compile(r'USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY')
+POSTGRES_SCAN_RE = re.compile(r'Seq Scan on (\w+)')
+POSTGRES_SORT_RE = re.compile(r'(?:^|->)\s*Sort\b', re.MULTILINE)
+POSTGRES_COST_RE = re.compile(r'cost=[\d.]+\.\.([\d.]+)')
+
+ALIAS_RE = re.compile(r'"(\w+)" (?:AS )?([A-Z]\d+)\b')
+FROM_RE = re.compile(r'\bFROM "(\w+)"')
+CLAUSE_END_RE = re.compile(r' (?:ORDER BY|LIMIT|GROUP BY|HAVING) ')
+
+
+class Workload:
+    """Distinct query shapes with an example statement and an execution count"""
+
+    def __init__(self, source):
+        self.source = source
+        self.shapes = {}
+
+    def add(self, sql, params, alias='default', view='', count=1):
+        if not sql.lstrip().upper().startswith(EXPLAINABLE):
+            return
+        normalized = normalize_sql(sql)
+        key = fingerprint(normalized)
+        shape = self.shapes.get(key)
+        if shape is None:
+            shape = self.shapes[key] = {
+                'fingerprint': key, 'normalized': normalized, 'sql': sql,
+                'params': params, 'alias': alias, 'count': 0, 'views': set(),
+            }
+        shape['count'] += count
+        if view:
+            shape['views'].add(view)
+
+    @property
+    def executions(self):
+        return sum(shape['count'] for shape in self.shapes.values())
+
+
+def load_workload(paths):
+    """
+    Ingest workload files: the slow query log export ({"entries": [...]}) or
+    a JSON list of {"sql", "params", "alias"} objects.
+    """
+    workload = Workload(', '.join(paths))
+    for path in paths:
+        with open(path) as f:
+            data = json.load(f)
+        for entry in data['entries'] if isinstance(data, dict) else data:
+            # Redacted entries have no parameters to EXPLAIN them with
+            if not entry.get('many') and not entry.get('params_redacted'):
+                workload.add(entry['sql'], entry.get('params'), entry.get('alias', 'default'), entry.get('view', ''))
+    return workload
+
+
+def _stripe_signature(payload, secret):
+    timestamp = int(time.time())
+    signature = hmac.new(secret.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={signature}'
+
+
+def capture_storefront_workload(samples=5, seed=1):
+    """
+    Replay the storefront in-process against the current database and record
+    its queries: catalog, category and product pages, the cart, the order
+    history of the customers with the most orders, and the Stripe webhook's
+    payment lookup. Caches and rate limits are off so every read reaches
+    the database; everything runs in a transaction that is rolled back.
+    """
+    from django.contrib.auth.models import User
+    from orders.models import Order
+    from shop.models import Category, Product
+
+    rng = Random(seed)
+    workload = Workload('storefront replay')
+    client = Client()
+    webhook_secret = 'whsec_index_advisor'
+    current_view = ''
+
+    def record(execute, sql, params, many, context):
+        if not many:
+            workload.add(sql, list(params) if params is not None else None, context['connection'].alias, current_view)
+        return execute(sql, params, many, context)
+
+    def visit(view, url, data=None, **extra):
+        nonlocal current_view
+        current_view = view
+        if data is None:
+            client.get(url, **extra)
+        else:
+            client.post(url, data, **extra)
+
+    with ExitStack() as stack:
+        stack.enter_context(override_settings(
+            CACHES={alias: {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'} for alias in settings.CACHES},
+            RATE_LIMIT_ENABLED=False, RATE_LIMITS={}, ALLOWED_HOSTS=['testserver'],
+            STRIPE_WEBHOOK_SECRET=webhook_secret,
+        ))
+        stack.enter_context(transaction.atomic())
+        categories = list(Category.objects.values_list('slug', flat=True)[:100])
+        products = list(Product.objects.filter(available=True, stock__gt=0).values_list('id', 'slug')[:100])
+        customers = list(
+            User.objects.filter(order__isnull=False).annotate(orders=models.Count('order')).order_by('-orders')[:samples]
+        )
+        orders = {user.id: Order.objects.filter(user=user).values_list('id', flat=True).first() for user in customers}
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(record))
+
+        visit('shop:product_list', reverse('shop:product_list'))
+        for slug in rng.sample(categories, min(samples, len(categories))):
+            visit('shop:product_list_by_category', reverse('shop:product_list_by_category', args=[slug]))
+        for product_id, slug in rng.sample(products, min(samples, len(products))):
+            visit('shop:product_detail', reverse('shop:product_detail', args=[product_id, slug]))
+            visit('cart:cart_add', reverse('cart:cart_add', args=[product_id]), {'quantity': 1, 'override': 'False'})
+        visit('cart:cart_detail', reverse('cart:cart_detail'))
+        for user in customers:
+            client.force_login(user)
+            visit('orders:order_history', reverse('orders:order_history'))
+            visit('orders:order_detail', reverse('orders:order_detail', args=[orders[user.id]]))
+        payload = json.dumps({
+            'id': 'evt_index_advisor', 'object': 'event', 'type': 'payment_intent.payment_failed',
+            'data': {'object': {'id': 'pi_index_advisor', 'object': 'payment_intent', 'status': 'canceled'}},
+        })
+        visit(
+            'orders:stripe_webhook', reverse('orders:stripe_webhook'), payload, content_type='application/json',
+            HTTP_STRIPE_SIGNATURE=_stripe_signature(payload, webhook_secret),
+        )
+        transaction.set_rollback(True)
+    return workload
+
+
+def plan_problems(vendor, sql, plan):
+    """[(kind, table)] for the full scans and sorts in a plan"""
+    aliases = {alias: table for table, alias in ALIAS_RE.findall(sql)}
+    main = FROM_RE.search(sql)
+    problems = []
+    scan_re, sort_re = (SQLITE_SCAN_RE, SQLITE_SORT_RE) if vendor == 'sqlite' else (POSTGRES_SCAN_RE, POSTGRES_SORT_RE)
+    for name in scan_re.findall(plan):
+        problems.append(('scan', aliases.get(name, name)))
+    if main and sort_re.search(plan):
+        problems.append(('sort', main.group(1)))
+    return problems
+
+
+def _clauses(sql):
+    """The WHERE and ORDER BY clauses of the outer query"""
+    where = order = ''
+    if ' ORDER BY ' in sql:
+        sql, order = sql.rsplit(' ORDER BY ', 1)
+        order = order.split(' LIMIT ', 1)[0]
+    if ' WHERE ' in sql:
+        where = CLAUSE_END_RE.split(sql.split(' WHERE ', 1)[1], 1)[0]
+    return where, order
+
+
+def _model_for_table(table):
+    return next((model for model in apps.get_models() if model._meta.db_table == table), None)
+
+
+def propose_index(sql, table):
+    """
+    The index serving ``sql`` on ``table`` (equality, sort, range columns),
+    as (model, models.Index), or None when nothing in the query can use one.
+    """
+    model = _model_for_table(table)
+    if model is None:
+        return None
+    fields = {field.column: field for field in model._meta.concrete_fields}
+    where, order = _clauses(sql)
+    column = rf'"{table}"\."(\w+)"'
+
+    equality = list(dict.fromkeys(re.findall(r'(?<!NOT \()' + column + r' (?:= |IN \()', where)))
+    ranges = re.findall(column + r' (?:[<>]=?|BETWEEN) ', where)
+    flags = [
+        (name, not negated) for negated, name in re.findall(r'(NOT )?' + column + r'(?=\s*(?:\)|AND\b|OR\b|$))', where)
+        if isinstance(fields.get(name), models.BooleanField)
+    ]
+    ordering = re.findall(rf'("\w+")\."(\w+)" (ASC|DESC)', order)
+    # An index can only provide the order when every ORDER BY column is on this table
+    sort = [(name, direction) for quoted, name, direction in ordering] \
+        if ordering and all(quoted == f'"{table}"' for quoted, name, direction in ordering) else []
+
+    keys = [fields[name].name for name in equality if name in fields]
+    keys += [('-' if direction == 'DESC' else '') + fields[name].name for name, direction in sort
+             if name in fields and fields[name].name not in keys]
+    keys += [fields[name].name for name in ranges[:1] if name in fields and fields[name].name not in keys]
+    if not keys:
+        return None
+    condition = None
+    for name, value in flags:
+        flag = models.Q(**{fields[name].name: value})
+        condition = flag if condition is None else condition & flag
+    index = models.Index(fields=keys)
+    index.set_name_with_model(model)
+    if condition is not None:
+        index = models.Index(fields=keys, condition=condition, name=index.name)
+    return model, index
+
+
+def unique_lookup(sql, table):
+    """Whether the query reads rows of ``table`` by primary key or another unique column"""
+    model = _model_for_table(table)
+    if model is None:
+        return False
+    where, order = _clauses(sql)
+    equality = re.findall(rf'(?<!NOT \()"{table}"\."(\w+)" (?:= |IN \()', where)
+    return any(
+        field.column in equality and (field.primary_key or field.unique) for field in model._meta.concrete_fields
+    )
+
+
+def _index_columns(model, index):
+    return [model._meta.get_field(name.lstrip('-')).column for name in index.fields]
+
+
+def existing_indexes(connection, table):
+    """Column lists of the indexes (unique constraints included) on ``table``"""
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    return [tuple(info['columns']) for info in constraints.values() if info['index'] or info['unique']]
+
+
+def is_covered(connection, model, index):
+    """Whether an existing index already starts with the proposed columns"""
+    if index.condition is not None:
+        return False
+    columns = tuple(_index_columns(model, index))
+    return any(existing[:len(columns)] == columns for existing in existing_indexes(connection, model._meta.db_table))
+
+
+def measure(connection, sql, params, runs=3):
+    """Plan, estimated cost (PostgreSQL only) and median run time in ms of a query"""
+    plan = explain(connection, sql, params)
+    cost = POSTGRES_COST_RE.search(plan) if connection.vendor == 'postgresql' else None
+    timings = []
+    for _ in range(runs):
+        cursor = connection.create_cursor()
+        started = time.perf_counter()
+        try:
+            cursor.execute(sql, params)
+            cursor.fetchall()
+        finally:
+            cursor.close()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {'plan': plan, 'cost': float(cost.group(1)) if cost else None, 'ms': statistics.median(timings)}
+
+
+def table_rows(connection, table):
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}')
+        return cursor.fetchone()[0]
+
+
+def advise(workload, min_rows=1000, runs=3):
+    """
+    Analyse a workload. Returns (findings, proposals): the plan problems per
+    query shape, and the proposed indexes with the shapes they serve and
+    their measured before/after cost.
+    """
+    findings = []
+    proposals = {}
+    row_counts = {}
+    for shape in sorted(workload.shapes.values(), key=lambda shape: -shape['count']):
+        connection = connections[shape['alias']]
+        plan = explain(connection, shape['sql'], shape['params'])
+        for kind, table in dict.fromkeys(plan_problems(connection.vendor, shape['sql'], plan)):
+            if table not in row_counts:
+                row_counts[table] = table_rows(connection, table) if _model_for_table(table) else 0
+            # Sorting the few rows found by a unique key is cheap
+            if row_counts[table] < min_rows or unique_lookup(shape['sql'], table):
+                continue
+            proposal = propose_index(shape['sql'], table)
+            covered = proposal is not None and is_covered(connection, *proposal)
+            findings.append({
+                'kind': kind, 'table': table, 'rows': row_counts[table], 'shape': shape,
+                'index': proposal[1].name if proposal and not covered else None, 'covered': covered, 'unused': False,
+            })
+            if proposal is None or covered:
+                continue
+            model, index = proposal
+            entry = proposals.setdefault(index.name, {
+                'model': model, 'index': index, 'alias': shape['alias'], 'shapes': [], 'problems': set(),
+            })
+            if shape not in entry['shapes']:
+                entry['shapes'].append(shape)
+            entry['problems'].add(kind)
+    for proposal in proposals.values():
+        estimate(proposal, runs)
+    # Keep the indexes that remove a scan or sort from at least one plan
+    useful = {name: proposal for name, proposal in proposals.items() if proposal['fixed']}
+    for finding in findings:
+        if finding['index'] is not None and finding['index'] not in useful:
+            finding['index'] = None
+            finding['unused'] = True
+    return findings, sorted(useful.values(), key=lambda proposal: -proposal['saved_ms'])
+
+
+def estimate(proposal, runs=3):
+    """
+    Fill in the before/after measurements of a proposal. The index is
+    created in a transaction that is rolled back.
+    """
+    connection = connections[proposal['alias']]
+    model, index = proposal['model'], proposal['index']
+    before = [measure(connection, shape['sql'], shape['params'], runs) for shape in proposal['shapes']]
+    # Built from the schema editor's SQL, not applied through it: SQLite's
+    # editor can't run inside a transaction.
+    create_sql = str(index.create_sql(model, connection.schema_editor()))
+    with transaction.atomic(using=proposal['alias']):
+        with connection.cursor() as cursor:
+            cursor.execute(create_sql)
+        after = [measure(connection, shape['sql'], shape['params'], runs) for shape in proposal['shapes']]
+        transaction.set_rollback(True, using=proposal['alias'])
+    vendor, table = connection.vendor, model._meta.db_table
+    proposal['sql'] = create_sql
+    proposal['measurements'] = list(zip(before, after))
+    proposal['fixed'] = sum(
+        {problem for problem in plan_problems(vendor, shape['sql'], a['plan']) if problem[1] == table}
+        < {problem for problem in plan_problems(vendor, shape['sql'], b['plan']) if problem[1] == table}
+        for shape, (b, a) in zip(proposal['shapes'], proposal['measurements'])
+    )
+    proposal['before_ms'] = sum(b['ms'] * shape['count'] for shape, b in zip(proposal['shapes'], before))
+    proposal['after_ms'] = sum(a['ms'] * shape['count'] for shape, a in zip(proposal['shapes'], after))
+    proposal['saved_ms'] = proposal['before_ms'] - proposal['after_ms']
+    if all(b['cost'] is not None for b, a in proposal['measurements']):
+        proposal['before_cost'] = sum(b['cost'] * s['count'] for s, (b, a) in zip(proposal['shapes'], proposal['measurements']))
+        proposal['after_cost'] = sum(a['cost'] * s['count'] for s, (b, a) in zip(proposal['shapes'], proposal['measurements']))
+    return proposal
+
+
+def index_source(index):
+    """models.Index(...) as it would be written in a model's Meta.indexes"""
+    path, args, kwargs = index.deconstruct()
+    parts = [f'fields={kwargs["fields"]!r}']
+    if 'condition' in kwargs:
+        parts.append(f'condition={MigrationWriter.serialize(kwargs["condition"])[0]}')
+    parts.append(f'name={kwargs["name"]!r}')
+    return f"models.Index({', '.join(parts)})"
+
+
+def migrations_for(proposals, name='advised_indexes'):
+    """{app_label: (migration file name, source)} adding the proposed indexes"""
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    by_app = {}
+    for proposal in proposals:
+        by_app.setdefault(proposal['model']._meta.app_label, []).append(proposal)
+    sources = {}
+    for app_label, app_proposals in sorted(by_app.items()):
+        leaves = loader.graph.leaf_nodes(app_label)
+        number = max((MigrationAutodetector.parse_number(leaf[1]) or 0 for leaf in leaves), default=0) + 1
+        migration = migrations.Migration(f'{number:04d}_{name}', app_label)
+        migration.dependencies = leaves
+        migration.operations = [
+            migrations.AddIndex(model_name=proposal['model']._meta.model_name, index=proposal['index'])
+            for proposal in app_proposals
+        ]
+        writer = MigrationWriter(migration)
+        sources[app_label] = (writer.path, writer.as_string())
+    return sources
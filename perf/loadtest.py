@@ -0,0 +1,501 @@
+"""
+Load Test Harness
+Drives user journeys against a running shop over HTTP and reports
+throughput and latency percentiles per step.
+"""
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+
+
+PRODUCT_LINK_RE = re.compile(r'href="(/(\d+)/[-\w]+/)"')
+CATEGORY_LINK_RE = re.compile(r'href="(/category/[-\w]+/)"')
+ORDER_LINK_RE = re.compile(r'href="(/orders/\d+/)"')
+METRIC_LINE_RE = re.compile(r'^(django_view_\w+?)(?:_total)?\{view="([^"]+)"[^}]*\} (\S+)$')
+CLIENT_SECRET_RE = re.compile(r"clientSecret = '((pi_\w+?)_secret_\w+)'")
+
+
+def percentile(values, pct):
+    """Return the pct-th percentile (0-100) of a list using linear interpolation"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+class StepStats:
+    """Latency samples and error count for a single journey step"""
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.errors = 0
+
+    def record(self, latency, ok=True):
+        self.latencies.append(latency)
+        if not ok:
+            self.errors += 1
+
+    def summary(self, elapsed):
+        count = len(self.latencies)
+        return {
+            'step': self.name,
+            'count': count,
+            'errors': self.errors,
+            'throughput': count / elapsed if elapsed else 0.0,
+            'p50_ms': percentile(self.latencies, 50) * 1000,
+            'p95_ms': percentile(self.latencies, 95) * 1000,
+            'p99_ms': percentile(self.latencies, 99) * 1000,
+            'max_ms': max(self.latencies, default=0.0) * 1000,
+        }
+
+
+class LoadReport:
+    """Thread-safe collection of step statistics for one load run"""
+
+    def __init__(self):
+        self.steps = {}
+        self.journeys = 0
+        self.failed_journeys = 0
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def record(self, step, latency, ok=True):
+        with self._lock:
+            if step not in self.steps:
+                self.steps[step] = StepStats(step)
+            self.steps[step].record(latency, ok)
+
+    def journey_done(self, ok):
+        with self._lock:
+            self.journeys += 1
+            if not ok:
+                self.failed_journeys += 1
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - (self.started or time.perf_counter())
+
+    def summary(self):
+        elapsed = self.elapsed
+        return {
+            'elapsed_s': elapsed,
+            'journeys': self.journeys,
+            'failed_journeys': self.failed_journeys,
+            'journeys_per_s': self.journeys / elapsed if elapsed else 0.0,
+            'steps': [stats.summary(elapsed) for stats in self.steps.values()],
+        }
+
+    def format_table(self):
+        summary = self.summary()
+        lines = [
+            f"{'step':<16}{'count':>8}{'errors':>8}{'req/s':>10}"
+            f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+        ]
+        for row in summary['steps']:
+            lines.append(
+                f"{row['step']:<16}{row['count']:>8}{row['errors']:>8}{row['throughput']:>10.1f}"
+                f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['max_ms']:>10.1f}"
+            )
+        lines.append(
+            f"{summary['journeys']} journeys ({summary['failed_journeys']} failed) in "
+            f"{summary['elapsed_s']:.1f}s, {summary['journeys_per_s']:.1f} journeys/s"
+        )
+        return '\n'.join(lines)
+
+
+class StepFailed(Exception):
+    """Raised when a journey step gets an unexpected response"""
+
+
+class ShopClient:
+    """HTTP session for one virtual user, timing every request as a named step"""
+
+    def __init__(self, base_url, report, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.report = report
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def request(self, step, method, path, expect=(200,), **kwargs):
+        url = path if path.startswith('http') else self.base_url + path
+        kwargs.setdefault('timeout', self.timeout)
+        kwargs.setdefault('allow_redirects', False)
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.RequestException as e:
+            self.report.record(step, time.perf_counter() - started, ok=False)
+            raise StepFailed(f'{step}: {e}') from e
+        ok = response.status_code in expect
+        self.report.record(step, time.perf_counter() - started, ok=ok)
+        if not ok:
+            raise StepFailed(f'{step}: HTTP {response.status_code} for {method} {path}')
+        return response
+
+    def get(self, step, path, **kwargs):
+        return self.request(step, 'GET', path, **kwargs)
+
+    def post(self, step, path, data=None, **kwargs):
+        data = dict(data or {})
+        data['csrfmiddlewaretoken'] = self.session.cookies.get('csrftoken', '')
+        headers = {'Referer': self.base_url + path}
+        return self.request(step, 'POST', path, data=data, headers=headers, **kwargs)
+
+
+def checkout_journey(client, rng, stripe_url):
+    """
+    Browse -> add to cart -> order_create (Stripe) -> confirm + webhook.
+    Requires the shop to be configured with STRIPE_API_BASE pointing at the
+    fake Stripe server, which delivers the signed webhook on confirmation.
+    """
+    listing = client.get('product_list', '/')
+    products = PRODUCT_LINK_RE.findall(listing.text)
+    if not products:
+        raise StepFailed('product_list: no products found (load some catalog data first)')
+    detail_path, product_id = rng.choice(products)
+
+    client.get('product_detail', detail_path)
+    client.post('cart_add', f'/cart/add/{product_id}/', {
+        'quantity': rng.randint(1, 3),
+        'override': '',
+    }, expect=(302,))
+
+    client.get('checkout_form', '/orders/create/')
+    user_id = rng.randint(1, 10 ** 9)
+    response = client.post('order_create', '/orders/create/', {
+        'first_name': 'Load',
+        'last_name': f'Test{user_id}',
+        'email': f'load{user_id}@example.com',
+        'address': '1 Benchmark Way',
+        'postal_code': '12345',
+        'city': 'Testville',
+        'payment_method': 'stripe',
+    })
+    match = CLIENT_SECRET_RE.search(response.text)
+    if not match:
+        raise StepFailed('order_create: no Payment Intent client secret in response')
+
+    response = client.request('webhook', 'POST', f'{stripe_url.rstrip("/")}/v1/payment_intents/{match.group(2)}/confirm')
+    webhook_status = response.headers.get('Fake-Stripe-Webhook-Status')
+    if webhook_status != '200':
+        raise StepFailed(f'webhook: shop answered {webhook_status}')
+
+
+def _browse_products(client, rng):
+    listing = client.get('product_list', '/')
+    products = PRODUCT_LINK_RE.findall(listing.text)
+    if not products:
+        raise StepFailed('product_list: no products found (load some catalog data first)')
+    return listing, products
+
+
+def browse_journey(client, rng, **options):
+    """product_list -> maybe a category -> one to three product_detail pages"""
+    listing, products = _browse_products(client, rng)
+    categories = CATEGORY_LINK_RE.findall(listing.text)
+    if categories and rng.random() < 0.5:
+        response = client.get('category_list', rng.choice(categories))
+        products = PRODUCT_LINK_RE.findall(response.text) or products
+    for _ in range(rng.randint(1, 3)):
+        client.get('product_detail', rng.choice(products)[0])
+
+
+def cart_journey(client, rng, **options):
+    """Add a few products, view the cart, remove one and view it again"""
+    listing, products = _browse_products(client, rng)
+    added = rng.sample(products, min(len(products), rng.randint(1, 3)))
+    for detail_path, product_id in added:
+        client.get('product_detail', detail_path)
+        client.post('cart_add', f'/cart/add/{product_id}/', {
+            'quantity': rng.randint(1, 3),
+            'override': '',
+        }, expect=(302,))
+    client.get('cart_detail', '/cart/')
+    client.post('cart_remove', f'/cart/remove/{rng.choice(added)[1]}/', expect=(302,))
+    client.get('cart_detail', '/cart/')
+
+
+def order_journey(client, rng, **options):
+    """
+    Browse -> add to cart -> order_create with a non-Stripe method. The demo
+    gateways sleep PAYMENT_SIMULATED_DELAY seconds and may decline, which
+    redirects to payment_retry; both redirects count as success.
+    """
+    listing, products = _browse_products(client, rng)
+    detail_path, product_id = rng.choice(products)
+    client.get('product_detail', detail_path)
+    client.post('cart_add', f'/cart/add/{product_id}/', {
+        'quantity': rng.randint(1, 3),
+        'override': '',
+    }, expect=(302,))
+    client.get('cart_detail', '/cart/')
+    client.get('checkout_form', '/orders/create/')
+    user_id = rng.randint(1, 10 ** 9)
+    client.post('order_create', '/orders/create/', {
+        'first_name': 'Load',
+        'last_name': f'Test{user_id}',
+        'email': f'load{user_id}@example.com',
+        'address': '1 Benchmark Way',
+        'postal_code': '12345',
+        'city': 'Testville',
+        'payment_method': rng.choice(['bank_transfer', 'paypal']),
+        'paypal_email': f'load{user_id}@example.com',
+        'bank_account': '12345678',
+        'bank_name': 'Benchmark Bank',
+    }, expect=(302,))
+
+
+def history_journey(client, rng, username=None, password=None, **options):
+    """Log in, view order_history and one of the listed orders"""
+    if not username:
+        raise StepFailed('login: no benchmark user configured')
+    client.get('login_form', '/accounts/login/')
+    client.post('login', '/accounts/login/', {'username': username, 'password': password}, expect=(302,))
+    response = client.get('order_history', '/orders/history/')
+    orders = ORDER_LINK_RE.findall(response.text)
+    if orders:
+        client.get('order_detail', rng.choice(orders))
+
+
+# name: (journey, weight)
+STOREFRONT_JOURNEYS = {
+    'browse': (browse_journey, 50),
+    'cart': (cart_journey, 25),
+    'checkout': (order_journey, 15),
+    'history': (history_journey, 10),
+}
+
+
+def storefront_journey(client, rng, weights=None, **options):
+    """
+    Run one journey picked from STOREFRONT_JOURNEYS by weight. ``weights``
+    ({name: weight}) overrides the default mix; weight 0 disables a journey.
+    """
+    names = list(STOREFRONT_JOURNEYS)
+    weights = weights or {}
+    chosen = rng.choices(names, [weights.get(name, STOREFRONT_JOURNEYS[name][1]) for name in names])[0]
+    STOREFRONT_JOURNEYS[chosen][0](client, rng, **options)
+
+
+def scrape_view_metrics(base_url, token='', timeout=10):
+    """
+    Read per-view request and query totals from the shop's /metrics endpoint.
+
+    Returns:
+        dict: {view: {'requests': n, 'queries': n, 'db_seconds': s}}, or None
+        if the endpoint can't be read
+    """
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+    try:
+        response = requests.get(base_url.rstrip('/') + '/metrics', headers=headers, timeout=timeout)
+    except requests.RequestException:
+        return None
+    if response.status_code != 200:
+        return None
+
+    views = {}
+    for line in response.text.splitlines():
+        match = METRIC_LINE_RE.match(line)
+        if not match:
+            continue
+        metric, view, value = match.groups()
+        field = {
+            'django_view_requests': 'requests',
+            'django_view_db_queries_sum': 'queries',
+            'django_view_db_seconds': 'db_seconds',
+        }.get(metric)
+        if field:
+            totals = views.setdefault(view, {'requests': 0, 'queries': 0, 'db_seconds': 0.0})
+            totals[field] += float(value)
+    return views
+
+
+def query_stats(before, after):
+    """Queries per request for each view, from two scrape_view_metrics() results"""
+    stats = {}
+    for view, totals in sorted(after.items()):
+        if view == 'perf:metrics':
+            continue
+        previous = before.get(view, {})
+        requests_made = totals['requests'] - previous.get('requests', 0)
+        if requests_made <= 0:
+            continue
+        stats[view] = {
+            'requests': int(requests_made),
+            'queries_per_request': (totals['queries'] - previous.get('queries', 0)) / requests_made,
+            'db_ms_per_request': (totals['db_seconds'] - previous.get('db_seconds', 0.0)) / requests_made * 1000,
+        }
+    return stats
+
+
+def start_server(kind, port, workers=2, env=None, threads=4):
+    """
+    Start ``manage.py runserver``, gunicorn (WSGI) or gunicorn with uvicorn
+    workers (ASGI) on 127.0.0.1:<port> in a subprocess for a local benchmark
+    run; the caller terminates it.
+    """
+    if kind == 'runserver':
+        command = [sys.executable, 'manage.py', 'runserver', f'127.0.0.1:{port}', '--noreload']
+    elif kind in ('gunicorn', 'uvicorn'):
+        command = [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py']
+        if kind == 'gunicorn':
+            command += ['ecommerce_site.wsgi:application', '--threads', str(threads)]
+        else:
+            command += ['ecommerce_site.asgi:application', '--worker-class', 'uvicorn_worker.UvicornWorker']
+        command += ['--bind', f'127.0.0.1:{port}', '--workers', str(workers)]
+    else:
+        raise ValueError(f'Unknown server {kind!r}')
+    return subprocess.Popen(
+        command, cwd=settings.BASE_DIR, env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def slow_client(base_url, stop, interval=0.5, chunk=8):
+    """
+    Behave like a client on a poor mobile connection until ``stop`` is set:
+    send each request ``chunk`` bytes every ``interval`` seconds, then read
+    the response just as slowly. Without a buffering proxy in front, every
+    such client ties up a connection on the server for seconds.
+    """
+    parts = urlsplit(base_url)
+    request = f'GET / HTTP/1.1\r\nHost: {parts.netloc}\r\nConnection: close\r\n\r\n'.encode()
+    while not stop.is_set():
+        try:
+            with socket.create_connection((parts.hostname, parts.port or 80), timeout=30) as sock:
+                for start in range(0, len(request), chunk):
+                    if stop.wait(interval):
+                        return
+                    sock.sendall(request[start:start + chunk])
+                while sock.recv(chunk * 128):
+                    if stop.wait(interval):
+                        return
+        except OSError:
+            stop.wait(interval)
+
+
+@contextmanager
+def slow_clients(base_url, count, interval=0.5):
+    """Run ``count`` slow_client() threads for the duration of the block"""
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=slow_client, args=(base_url, stop, interval), daemon=True)
+        for _ in range(count)
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join(timeout=5)
+
+
+def wait_until_ready(base_url, timeout=30):
+    """Poll the product list until the server answers"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(base_url.rstrip('/') + '/', timeout=5).status_code < 500:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    return False
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True, timeout=10
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+def compare_results(baseline, current, threshold=0.10):
+    """
+    Compare two benchmark result files (as dicts).
+
+    A step regresses when its p95 latency grows or its throughput drops by
+    more than ``threshold`` (a fraction); a view regresses when it runs more
+    queries per request than before.
+
+    Returns:
+        tuple: (lines describing every change, list of regression lines)
+    """
+    lines, regressions = [], []
+    baseline_steps = {row['step']: row for row in baseline['summary']['steps']}
+    for row in current['summary']['steps']:
+        old = baseline_steps.get(row['step'])
+        if old is None:
+            continue
+        for field, worse in (('p95_ms', 1), ('throughput', -1)):
+            if not old[field]:
+                continue
+            change = (row[field] - old[field]) / old[field]
+            line = f"{row['step']:<16}{field:<14}{old[field]:>10.1f} -> {row[field]:>10.1f} ({change:+.0%})"
+            lines.append(line)
+            if change * worse > threshold:
+                regressions.append(line)
+
+    baseline_queries = baseline.get('queries') or {}
+    for view, stats in (current.get('queries') or {}).items():
+        old = baseline_queries.get(view)
+        if old is None:
+            continue
+        line = f"{view:<30}queries/req {old['queries_per_request']:>6.1f} -> {stats['queries_per_request']:>6.1f}"
+        lines.append(line)
+        # Small drifts come from the random journey mix (cache misses, sessions)
+        if stats['queries_per_request'] > old['queries_per_request'] * (1 + threshold) + 0.5:
+            regressions.append(line)
+    return lines, regressions
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def run_load(journey, base_url, concurrency=10, iterations=10, seed=None, **journey_kwargs):
+    """
+    Run ``journey`` ``iterations`` times in each of ``concurrency`` workers
+
+    Returns:
+        LoadReport: Collected per-step statistics
+    """
+    report = LoadReport()
+
+    def worker(index):
+        rng = random.Random(None if seed is None else seed + index)
+        for _ in range(iterations):
+            client = ShopClient(base_url, report)
+            try:
+                journey(client, rng, **journey_kwargs)
+                report.journey_done(True)
+            except StepFailed:
+                report.journey_done(False)
+
+    report.started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(concurrency)))
+    report.finished = time.perf_counter()
+    return report
@@ -0,0 +1,127 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from perf.indexadvisor import advise, capture_storefront_workload, index_source, load_workload, migrations_for
+
+
+class Command(BaseCommand):
+    help = (
+        'Find full table scans and temporary sorts in the query plans of a workload (a storefront replay, '
+        'or slow query log exports) and propose indexes, with their measured before/after cost and a migration.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workload', action='append', default=[], metavar='FILE',
+            help='Slow query log export (/admin/perf/slow-queries/?format=json) to analyse; repeatable. '
+                 'Default: replay the storefront against the current database.'
+        )
+        parser.add_argument('--samples', type=int, default=5, help='Pages of each kind visited by the replay.')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--min-rows', type=int, default=1000, help='Ignore scans and sorts of tables smaller than this.'
+        )
+        parser.add_argument('--runs', type=int, default=3, help='Timed runs per query before and after an index.')
+        parser.add_argument(
+            '--write', action='store_true',
+            help='Write the migrations into the apps (add the printed indexes to the models as well).'
+        )
+        parser.add_argument('--json', dest='json_path', help='Also write the report to this JSON file.')
+
+    def handle(self, *args, **options):
+        if options['workload']:
+            try:
+                workload = load_workload(options['workload'])
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f'Cannot read the workload: {e}')
+        else:
+            workload = capture_storefront_workload(options['samples'], options['seed'])
+        if not workload.shapes:
+            raise CommandError('The workload has no SELECT queries')
+        findings, proposals = advise(workload, options['min_rows'], options['runs'])
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{workload.source}: {workload.executions} queries, {len(workload.shapes)} shapes'
+        ))
+        if not findings:
+            self.stdout.write(f"No full scans or sorts on tables of {options['min_rows']}+ rows.")
+            return
+
+        self.stdout.write('')
+        self.stdout.write(f"{'problem':<9}{'table':<22}{'rows':>9}{'runs':>6}  view -> index")
+        for finding in findings:
+            shape = finding['shape']
+            if finding['covered']:
+                note = 'covered by an existing index'
+            elif finding['unused']:
+                note = 'no index changes the plan'
+            else:
+                note = finding['index'] or 'nothing to index'
+            self.stdout.write(
+                f"{finding['kind']:<9}{finding['table']:<22}{finding['rows']:>9}{shape['count']:>6}  "
+                f"{', '.join(sorted(shape['views'])) or shape['fingerprint']} -> {note}"
+            )
+            self.stdout.write(f"{'':<46}{shape['normalized'][:120]}")
+
+        self.stdout.write('')
+        for number, proposal in enumerate(proposals, 1):
+            model = proposal['model']
+            self.stdout.write(self.style.MIGRATE_LABEL(
+                f"{number}. {model._meta.label}: {index_source(proposal['index'])}"
+            ))
+            self.stdout.write(f"   fixes {', '.join(sorted(proposal['problems']))} in {proposal['fixed']} shape(s)")
+            for shape, (before, after) in zip(proposal['shapes'], proposal['measurements']):
+                cost = f", cost {before['cost']:.0f} -> {after['cost']:.0f}" if before['cost'] is not None else ''
+                self.stdout.write(
+                    f"   {shape['count']}x {before['ms']:.2f} ms -> {after['ms']:.2f} ms{cost}  "
+                    f"{', '.join(sorted(shape['views'])) or shape['fingerprint']}"
+                )
+                self.stdout.write(f"      plan after: {after['plan'].splitlines()[0] if after['plan'] else ''}")
+            self.stdout.write(
+                f"   workload: {proposal['before_ms']:.1f} ms -> {proposal['after_ms']:.1f} ms"
+                + (f", cost {proposal['before_cost']:.0f} -> {proposal['after_cost']:.0f}"
+                   if 'before_cost' in proposal else '')
+            )
+
+        if proposals:
+            self.stdout.write('')
+            for app_label, (path, source) in migrations_for(proposals).items():
+                if options['write']:
+                    with open(path, 'w') as f:
+                        f.write(source)
+                    self.stdout.write(self.style.SUCCESS(f'Wrote {os.path.relpath(path)}'))
+                else:
+                    self.stdout.write(self.style.MIGRATE_HEADING(f'{os.path.relpath(path)} (not written, use --write)'))
+                    self.stdout.write(source)
+            self.stdout.write(
+                'Add the indexes above to the Meta.indexes of their models too, or makemigrations will remove them.'
+            )
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump({
+                    'source': workload.source,
+                    'queries': workload.executions,
+                    'findings': [
+                        {**{key: finding[key] for key in ('kind', 'table', 'rows', 'index', 'covered', 'unused')},
+                         'fingerprint': finding['shape']['fingerprint'], 'count': finding['shape']['count'],
+                         'sql': finding['shape']['normalized']}
+                        for finding in findings
+                    ],
+                    'proposals': [
+                        {
+                            'model': proposal['model']._meta.label,
+                            'index': index_source(proposal['index']),
+                            'sql': proposal['sql'],
+                            'before_ms': proposal['before_ms'],
+                            'after_ms': proposal['after_ms'],
+                            'before_cost': proposal.get('before_cost'),
+                            'after_cost': proposal.get('after_cost'),
+                            'shapes': [shape['fingerprint'] for shape in proposal['shapes']],
+                        }
+                        for proposal in proposals
+                    ],
+                }, f, indent=2)
+            self.stdout.write(f"Wrote {options['json_path']}")
@@ -0,0 +1,116 @@
+import fnmatch
+import json
+import platform
+from contextlib import ExitStack
+from datetime import datetime, timezone
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from perf.loadtest import git_revision
+from perf.microbench import BENCHMARKS, benchmark_database, compare, run_case
+
+
+def _format_time(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f'{seconds / scale:.2f} {unit}'
+    return f'{seconds / 1e-9:.0f} ns'
+
+
+class Command(BaseCommand):
+    help = (
+        'Run the microbenchmarks (cart, order totals, Stripe amounts, template rendering) '
+        'with warmup, repeated samples and tracemalloc allocation tracking, optionally '
+        'comparing against a saved baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('patterns', nargs='*', help="Benchmarks to run, e.g. 'cart.*' (default: all).")
+        parser.add_argument('--list', action='store_true', help='List the benchmarks and exit.')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed samples per benchmark.')
+        parser.add_argument('--min-time', type=float, default=0.02, help='Minimum seconds per sample.')
+        parser.add_argument('--warmup', type=float, default=0.1, help='Warmup seconds per benchmark.')
+        parser.add_argument('--json', dest='json_path', help='Write the results (with raw samples) to this file.')
+        parser.add_argument('--compare', help='Baseline results JSON to compare against.')
+        parser.add_argument('--threshold', type=float, default=0.05, help='Ignore median changes below this fraction.')
+        parser.add_argument(
+            '--fail-on-regression', action='store_true',
+            help='Exit with an error when a benchmark is significantly slower than the baseline.'
+        )
+
+    def handle(self, *args, **options):
+        patterns = options['patterns'] or ['*']
+        cases = [
+            (bench, case, param)
+            for bench in BENCHMARKS.values()
+            for case, param in bench.cases()
+            if any(fnmatch.fnmatch(case, pattern) or fnmatch.fnmatch(bench.name, pattern) for pattern in patterns)
+        ]
+        if options['list']:
+            for bench, case, param in cases:
+                self.stdout.write(case)
+            return
+        if not cases:
+            raise CommandError(f"No benchmark matches {' '.join(patterns)}")
+        if options['repeat'] < 2:
+            raise CommandError('--repeat must be at least 2')
+
+        baseline = {}
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)['benchmarks']
+
+        results = {}
+        header = f"{'benchmark':<32}{'median':>11}{'iqr':>11}{'+/-95%':>11}{'peak KiB':>10}{'held B':>9}"
+        if baseline:
+            header += f"{'vs base':>10}"
+        self.stdout.write(header)
+
+        regressions = []
+        with ExitStack() as stack:
+            # Like the test runner: no query log or template debug overhead
+            stack.enter_context(override_settings(DEBUG=False))
+            if any(bench.uses_db for bench, case, param in cases):
+                stack.enter_context(benchmark_database())
+            for bench, case, param in cases:
+                result = run_case(bench, param, options['repeat'], options['min_time'], options['warmup'])
+                results[case] = result
+                stats, memory = result['stats'], result['memory']
+                line = (
+                    f"{case:<32}{_format_time(stats['median']):>11}{_format_time(stats['iqr']):>11}"
+                    f"{_format_time(stats['ci95']):>11}{memory['peak_bytes'] / 1024:>10.1f}"
+                    f"{memory['retained_bytes_per_call']:>9.0f}"
+                )
+                style = str
+                if case in baseline:
+                    change, verdict = compare(baseline[case], result, options['threshold'])
+                    line += f"{change:>+10.1%}"
+                    if verdict == 'slower':
+                        style = self.style.ERROR
+                        regressions.append(case)
+                    elif verdict == 'faster':
+                        style = self.style.SUCCESS
+                self.stdout.write(style(line))
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump({
+                    'meta': {
+                        'revision': git_revision(),
+                        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                        'python': platform.python_version(),
+                        'django': django.get_version(),
+                        'repeat': options['repeat'],
+                        'min_time': options['min_time'],
+                    },
+                    'benchmarks': results,
+                }, f, indent=2)
+            self.stdout.write(f"Wrote {options['json_path']}")
+
+        if regressions:
+            message = f"Significantly slower than the baseline: {', '.join(regressions)}"
+            if options['fail_on_regression']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
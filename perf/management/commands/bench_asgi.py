@@ -0,0 +1,162 @@
+import json
+from datetime import datetime, timezone
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from perf.loadtest import (
+    git_revision, percentile, run_load, slow_clients, start_server, storefront_journey, wait_until_ready,
+)
+from .bench_storefront import LOCAL_SERVER_ENV, parse_weights
+
+
+# Interface compared: server kind for start_server()
+SERVERS = {
+    'wsgi': 'gunicorn',
+    'asgi': 'uvicorn',
+}
+SCENARIOS = ('baseline', 'slow-clients', 'slow-gateway')
+# Journey steps served by the async views under ASGI
+ASYNC_VIEW_STEPS = ('product_list', 'category_list', 'product_detail', 'cart_detail', 'order_history')
+
+
+def summarize_run(report):
+    """Throughput and latency over all steps and over the async view steps"""
+    summary = report.summary()
+    latencies = [latency for stats in report.steps.values() for latency in stats.latencies]
+    async_latencies = [
+        latency for name, stats in report.steps.items() if name in ASYNC_VIEW_STEPS for latency in stats.latencies
+    ]
+    return {
+        'requests_per_s': len(latencies) / summary['elapsed_s'] if summary['elapsed_s'] else 0.0,
+        'journeys_per_s': summary['journeys_per_s'],
+        'errors': sum(row['errors'] for row in summary['steps']),
+        'failed_journeys': summary['failed_journeys'],
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'async_views_p95_ms': percentile(async_latencies, 95) * 1000,
+        'steps': summary['steps'],
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare WSGI (gunicorn sync workers) and ASGI (gunicorn with uvicorn workers and the async views) '
+        'on the storefront journeys: unloaded, with slow clients holding connections open, and with a slow '
+        'payment gateway. Each server is started locally with the same number of worker processes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenarios', default=','.join(SCENARIOS),
+            help=f"Comma-separated scenarios to run ({', '.join(SCENARIOS)})."
+        )
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--workers', type=int, default=2, help='Worker processes for both servers.')
+        parser.add_argument(
+            '--threads', type=int, default=1,
+            help='Threads per WSGI worker (1: plain sync workers, as gunicorn.conf.py runs them).'
+        )
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--iterations', type=int, default=10, help='Journeys per worker.')
+        parser.add_argument('--warmup', type=int, default=1, help='Unrecorded journeys per worker first.')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--weights', default='', help="Journey mix, as for bench_storefront.")
+        parser.add_argument(
+            '--slow-clients', type=int, default=16,
+            help='Connections dribbling requests during the slow-clients scenario.'
+        )
+        parser.add_argument(
+            '--gateway-delay', type=float, default=0.5,
+            help='Simulated payment gateway delay in seconds for the slow-gateway scenario.'
+        )
+        parser.add_argument('--username', default='loadtest', help='Account used by the history journey.')
+        parser.add_argument('--password', default='loadtest-password')
+        parser.add_argument('--json', dest='json_path', help='Write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        scenarios = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenario(s) {', '.join(sorted(unknown))}; choose from {', '.join(SCENARIOS)}")
+        weights = parse_weights(options['weights'])
+        if not User.objects.filter(username=options['username']).exists():
+            User.objects.create_user(options['username'], password=options['password'])
+
+        runs = []
+        for scenario in scenarios:
+            for interface, kind in SERVERS.items():
+                self.stdout.write(f'{scenario} / {interface}...')
+                runs.append({
+                    'scenario': scenario,
+                    'interface': interface,
+                    **self.run_scenario(scenario, kind, weights, options),
+                })
+
+        self.stdout.write('')
+        self.stdout.write(
+            f"{'scenario':<14}{'server':<8}{'req/s':>9}{'journeys/s':>12}{'p50 ms':>9}{'p95 ms':>9}"
+            f"{'async p95':>11}{'errors':>8}"
+        )
+        for run in runs:
+            self.stdout.write(
+                f"{run['scenario']:<14}{run['interface']:<8}{run['requests_per_s']:>9.1f}{run['journeys_per_s']:>12.2f}"
+                f"{run['p50_ms']:>9.1f}{run['p95_ms']:>9.1f}{run['async_views_p95_ms']:>11.1f}{run['errors']:>8}"
+            )
+        self.stdout.write('')
+        for scenario in scenarios:
+            wsgi, asgi = (next(run for run in runs if run['scenario'] == scenario and run['interface'] == interface)
+                          for interface in SERVERS)
+            if wsgi['requests_per_s']:
+                self.stdout.write(
+                    f"{scenario}: ASGI serves {asgi['requests_per_s'] / wsgi['requests_per_s']:.2f}x the "
+                    f"WSGI throughput"
+                )
+
+        if options['json_path']:
+            results = {
+                'meta': {
+                    'revision': git_revision(),
+                    'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                    'workers': options['workers'],
+                    'wsgi_threads': options['threads'],
+                    'concurrency': options['concurrency'],
+                    'iterations': options['iterations'],
+                    'seed': options['seed'],
+                    'slow_clients': options['slow_clients'],
+                    'gateway_delay': options['gateway_delay'],
+                },
+                'runs': runs,
+            }
+            with open(options['json_path'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Wrote {options['json_path']}")
+
+    def run_scenario(self, scenario, kind, weights, options):
+        base_url = f"http://127.0.0.1:{options['port']}"
+        env = dict(LOCAL_SERVER_ENV)
+        if scenario == 'slow-gateway':
+            env['PAYMENT_SIMULATED_DELAY'] = str(options['gateway_delay'])
+        journey_options = {
+            'weights': weights,
+            'username': options['username'],
+            'password': options['password'],
+        }
+        server = start_server(kind, options['port'], options['workers'], env, threads=options['threads'])
+        try:
+            if not wait_until_ready(base_url):
+                raise CommandError(f'{kind} did not start on {base_url}')
+            if options['warmup']:
+                run_load(
+                    storefront_journey, base_url, concurrency=options['concurrency'],
+                    iterations=options['warmup'], seed=options['seed'] - 1000, **journey_options
+                )
+            with slow_clients(base_url, options['slow_clients'] if scenario == 'slow-clients' else 0):
+                report = run_load(
+                    storefront_journey, base_url, concurrency=options['concurrency'],
+                    iterations=options['iterations'], seed=options['seed'], **journey_options
+                )
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+        return summarize_run(report)
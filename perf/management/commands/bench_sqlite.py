@@ -0,0 +1,51 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from perf.sqlite_bench import profiles, run_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare concurrent cart and checkout write throughput on SQLite with the default '
+        'options and with the tuned profile (WAL, synchronous=NORMAL, mmap, BEGIN IMMEDIATE).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', default=','.join(profiles()), help='Comma-separated profiles to run.')
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--iterations', type=int, default=200, help='Write transactions per thread.')
+        parser.add_argument('--checkout-ratio', type=float, default=0.25, help='Share of checkout writes.')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--json', dest='json_path', help='Also write the summaries to this JSON file.')
+
+    def handle(self, *args, **options):
+        names = [name.strip() for name in options['profiles'].split(',') if name.strip()]
+        unknown = set(names) - set(profiles())
+        if unknown:
+            raise CommandError(f"Unknown profile(s): {', '.join(sorted(unknown))}")
+
+        reports = run_benchmark(
+            names,
+            threads=options['threads'],
+            iterations=options['iterations'],
+            checkout_ratio=options['checkout_ratio'],
+            seed=options['seed'],
+        )
+
+        summaries = {}
+        for name, report in reports.items():
+            summaries[name] = report.summary()
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{name} profile'))
+            self.stdout.write(report.format_table().replace('journeys', 'writes'))
+            self.stdout.write('')
+
+        if 'default' in summaries and 'tuned' in summaries:
+            baseline = summaries['default']['journeys_per_s'] or 1
+            speedup = summaries['tuned']['journeys_per_s'] / baseline
+            self.stdout.write(self.style.SUCCESS(f'tuned/default write throughput: {speedup:.2f}x'))
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(summaries, f, indent=2)
+            self.stdout.write(f"Wrote {options['json_path']}")
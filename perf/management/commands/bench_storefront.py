@@ -0,0 +1,167 @@
+import json
+import secrets
+import tempfile
+from datetime import datetime, timezone
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from perf.loadtest import (
+    STOREFRONT_JOURNEYS, compare_results, git_revision, load_results, query_stats, run_load,
+    scrape_view_metrics, start_server, storefront_journey, wait_until_ready,
+)
+
+
+# Server environment for local runs: the benchmark sends everything from one
+# IP and should measure the shop, not the simulated payment gateway
+LOCAL_SERVER_ENV = {
+    'RATE_LIMIT_ENABLED': 'False',
+    'PAYMENT_SIMULATED_DELAY': '0',
+}
+
+
+def parse_weights(value):
+    """Parse 'browse=50,cart=25' into {'browse': 50, 'cart': 25}"""
+    weights = {}
+    for part in filter(None, (part.strip() for part in value.split(','))):
+        name, _, weight = part.partition('=')
+        if name not in STOREFRONT_JOURNEYS:
+            raise CommandError(f"Unknown journey {name!r}; choose from {', '.join(STOREFRONT_JOURNEYS)}")
+        try:
+            weights[name] = float(weight)
+        except ValueError:
+            raise CommandError(f'Invalid weight in {part!r}')
+    return weights
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay weighted storefront journeys (browse, cart, non-Stripe checkout, order history) '
+        'against the shop and report throughput, p50/p95/p99 latency and queries per request. '
+        'Results are saved as JSON and can be compared with a previous run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default=None, help='Shop to benchmark (default: the started server).')
+        parser.add_argument(
+            '--server', choices=['none', 'runserver', 'gunicorn', 'uvicorn'], default='none',
+            help='Start this server locally for the run, with rate limits and payment delays off.'
+        )
+        parser.add_argument('--port', type=int, default=8765, help='Port for --server.')
+        parser.add_argument('--workers', type=int, default=2, help='Worker processes for --server gunicorn/uvicorn.')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--iterations', type=int, default=25, help='Journeys per worker.')
+        parser.add_argument('--warmup', type=int, default=2, help='Unrecorded journeys per worker first.')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--weights', default='',
+            help=f"Journey mix, e.g. 'browse=50,cart=25,checkout=15,history=10' ({', '.join(STOREFRONT_JOURNEYS)})."
+        )
+        parser.add_argument('--username', default='loadtest', help='Account used by the history journey.')
+        parser.add_argument('--password', default='loadtest-password')
+        parser.add_argument(
+            '--no-create-user', action='store_true',
+            help="Don't create the history account in the local database if it is missing."
+        )
+        parser.add_argument('--metrics-token', default='', help='Bearer token for /metrics (PERF_METRICS_TOKEN).')
+        parser.add_argument('--json', dest='json_path', help='Write the results to this JSON file.')
+        parser.add_argument('--compare', help='Baseline results JSON to compare against.')
+        parser.add_argument('--threshold', type=float, default=0.10, help='Allowed relative p95/throughput change.')
+        parser.add_argument(
+            '--fail-on-regression', action='store_true',
+            help='Exit with an error when the comparison finds a regression.'
+        )
+
+    def handle(self, *args, **options):
+        weights = parse_weights(options['weights'])
+        if not options['no_create_user'] and not User.objects.filter(username=options['username']).exists():
+            User.objects.create_user(options['username'], password=options['password'])
+
+        server = None
+        base_url = options['base_url']
+        if options['server'] != 'none':
+            base_url = base_url or f"http://127.0.0.1:{options['port']}"
+            env = dict(LOCAL_SERVER_ENV)
+            # /metrics is closed by default; open it to this run only
+            options['metrics_token'] = options['metrics_token'] or secrets.token_urlsafe(32)
+            env['PERF_METRICS_TOKEN'] = options['metrics_token']
+            if options['server'] in ('gunicorn', 'uvicorn'):
+                # Let /metrics sum every worker, each writing after every request
+                env['PERF_METRICS_DIR'] = tempfile.mkdtemp(prefix='bench-metrics-')
+                env['PERF_METRICS_FLUSH_SECONDS'] = '0'
+            server = start_server(options['server'], options['port'], options['workers'], env)
+        elif not base_url:
+            base_url = 'http://127.0.0.1:8000'
+
+        journey_options = {
+            'weights': weights,
+            'username': options['username'],
+            'password': options['password'],
+        }
+        try:
+            if not wait_until_ready(base_url):
+                raise CommandError(f'{base_url} did not answer')
+            if options['warmup']:
+                run_load(
+                    storefront_journey, base_url, concurrency=options['concurrency'],
+                    iterations=options['warmup'], seed=options['seed'] - 1000, **journey_options
+                )
+            before = scrape_view_metrics(base_url, options['metrics_token'])
+            report = run_load(
+                storefront_journey, base_url, concurrency=options['concurrency'],
+                iterations=options['iterations'], seed=options['seed'], **journey_options
+            )
+            after = scrape_view_metrics(base_url, options['metrics_token'])
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+
+        results = {
+            'meta': {
+                'revision': git_revision(),
+                'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'base_url': base_url,
+                'server': options['server'],
+                'concurrency': options['concurrency'],
+                'iterations': options['iterations'],
+                'seed': options['seed'],
+                'weights': {name: weights.get(name, weight) for name, (journey, weight) in STOREFRONT_JOURNEYS.items()},
+            },
+            'summary': report.summary(),
+            'queries': query_stats(before, after) if before is not None and after is not None else None,
+        }
+
+        self.stdout.write(report.format_table())
+        if results['queries'] is None:
+            self.stdout.write(self.style.WARNING(
+                'Queries per request unavailable: /metrics not readable (see PERF_METRICS_ALLOWED_IPS/TOKEN).'
+            ))
+        else:
+            self.stdout.write('')
+            self.stdout.write(f"{'view':<34}{'requests':>10}{'queries/req':>13}{'db ms/req':>11}")
+            for view, stats in results['queries'].items():
+                self.stdout.write(
+                    f"{view:<34}{stats['requests']:>10}{stats['queries_per_request']:>13.2f}"
+                    f"{stats['db_ms_per_request']:>11.2f}"
+                )
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Wrote {options['json_path']}")
+
+        if options['compare']:
+            lines, regressions = compare_results(load_results(options['compare']), results, options['threshold'])
+            self.stdout.write('')
+            self.stdout.write(self.style.MIGRATE_HEADING(f"Compared with {options['compare']}"))
+            for line in lines:
+                style = self.style.ERROR if line in regressions else str
+                self.stdout.write(style(line))
+            if regressions:
+                message = f'{len(regressions)} regression(s) beyond {options["threshold"]:.0%}'
+                if options['fail_on_regression']:
+                    raise CommandError(message)
+                self.stdout.write(self.style.WARNING(message))
+            else:
+                self.stdout.write(self.style.SUCCESS('No regressions'))
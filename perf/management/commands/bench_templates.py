@@ -0,0 +1,58 @@
+import json
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+
+from perf.loadtest import git_revision
+from perf.renderbench import ENGINES, PAGES, compare_engines, jinja2_enabled
+
+
+class Command(BaseCommand):
+    help = (
+        'Render the hot pages (product list, cart) with the Django and the Jinja2 template engines, '
+        'check that both produce the same page and compare their render times.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', default=','.join(PAGES), help=f"Comma-separated pages ({', '.join(PAGES)}).")
+        parser.add_argument('--repeat', type=int, default=20, help='Samples per page, size and engine.')
+        parser.add_argument('--min-time', type=float, default=0.02, help='Minimum seconds per sample.')
+        parser.add_argument('--json', dest='json_path', help='Write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        try:
+            import jinja2  # noqa: F401
+        except ImportError:
+            raise CommandError('Jinja2 is not installed: pip install Jinja2')
+        pages = [name.strip() for name in options['pages'].split(',') if name.strip()]
+        unknown = set(pages) - set(PAGES)
+        if unknown:
+            raise CommandError(f"Unknown page(s) {', '.join(sorted(unknown))}; choose from {', '.join(PAGES)}")
+
+        self.stdout.write(f"{'page':<24}{'django µs':>11}{'jinja2 µs':>11}{'speedup':>9}  output")
+        results = []
+        with jinja2_enabled():
+            for page in pages:
+                for size in PAGES[page][2]:
+                    timings, identical = compare_engines(page, size, options['repeat'], options['min_time'])
+                    django, jinja = (timings[engine]['stats']['median'] for engine in ENGINES)
+                    self.stdout.write(
+                        f"{f'{page}[{size}]':<24}{django * 1e6:>11.1f}{jinja * 1e6:>11.1f}{django / jinja:>8.2f}x  "
+                        + ('identical' if identical else self.style.ERROR('DIFFERS'))
+                    )
+                    results.append({'page': page, 'size': size, 'identical': identical, 'engines': timings})
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump({
+                    'meta': {
+                        'revision': git_revision(),
+                        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                        'repeat': options['repeat'],
+                    },
+                    'results': results,
+                }, f, indent=2)
+            self.stdout.write(f"Wrote {options['json_path']}")
+
+        if not all(result['identical'] for result in results):
+            raise CommandError('The Jinja2 templates render differently from the Django templates')
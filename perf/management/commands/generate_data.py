@@ -0,0 +1,96 @@
+import os
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from ecommerce_site.cache import bump_namespace
+from orders.rollups import rebuild_rollups
+from perf.datagen import default_plan, generate
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk-generate categories, products, users and orders with items and payments for '
+        'benchmarking: Zipfian product popularity, seasonal order timestamps and mixed payment '
+        'methods, inserted in parallel chunks with deterministic seeds. Appends to existing data.'
+    )
+
+    def add_arguments(self, parser):
+        defaults = default_plan()
+        parser.add_argument('--seed', type=int, default=defaults['seed'])
+        parser.add_argument('--categories', type=int, default=defaults['categories'])
+        parser.add_argument('--products', type=int, default=defaults['products'])
+        parser.add_argument('--users', type=int, default=defaults['users'])
+        parser.add_argument('--orders', type=int, default=defaults['orders'])
+        parser.add_argument(
+            '--items-per-order', type=float, default=defaults['items_per_order'],
+            help='Mean order lines per order (e.g. 10M items from 4M orders at 2.5).'
+        )
+        parser.add_argument('--days', type=int, default=defaults['days'], help='History covered by the orders.')
+        parser.add_argument(
+            '--end', help='Date of the newest orders (YYYY-MM-DD, default: now); fix it for reproducible data.'
+        )
+        parser.add_argument('--zipf', type=float, default=defaults['zipf_s'], help='Zipf exponent of product popularity.')
+        parser.add_argument('--guest-ratio', type=float, default=defaults['guest_ratio'], help='Share of guest orders.')
+        parser.add_argument('--chunk-size', type=int, default=defaults['chunk_size'], help='Rows per insert chunk.')
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Parallel insert processes (default: 1 on SQLite, the CPU count otherwise).'
+        )
+        parser.add_argument(
+            '--rebuild-rollups', action='store_true',
+            help='Recompute the sales rollups afterwards (bulk inserts skip the order signals).'
+        )
+
+    def handle(self, *args, **options):
+        for name in ('categories', 'products', 'chunk_size'):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1")
+        end = None
+        if options['end']:
+            try:
+                end = datetime.fromisoformat(options['end']).replace(tzinfo=dt_timezone.utc)
+            except ValueError as e:
+                raise CommandError(f'Invalid date: {e}')
+
+        workers = options['workers']
+        if workers is None:
+            # SQLite serializes writers; parallel chunks would only wait on the lock
+            workers = 1 if connection.vendor == 'sqlite' else os.cpu_count() or 1
+
+        plan = default_plan(
+            seed=options['seed'],
+            categories=options['categories'],
+            products=options['products'],
+            users=options['users'],
+            orders=options['orders'],
+            items_per_order=options['items_per_order'],
+            days=options['days'],
+            end=end,
+            zipf_s=options['zipf'],
+            guest_ratio=options['guest_ratio'],
+            chunk_size=options['chunk_size'],
+        )
+
+        started = time.perf_counter()
+        verbosity = options['verbosity']
+
+        def progress(phase, done, total):
+            if verbosity >= 1:
+                self.stdout.write(f'{phase}: {done}/{total} ({time.perf_counter() - started:.1f}s)')
+
+        counts = generate(plan, workers=workers, progress=progress)
+        bump_namespace('catalog')
+
+        if options['rebuild_rollups']:
+            last_day = (end or datetime.now(dt_timezone.utc)).date()
+            rebuild_rollups(last_day - timedelta(days=options['days'] + 1), last_day)
+
+        elapsed = time.perf_counter() - started
+        rows = sum(counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {', '.join(f'{count} {name}' for name, count in counts.items())} "
+            f'in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s) with {workers} worker(s), seed {plan["seed"]}.'
+        ))
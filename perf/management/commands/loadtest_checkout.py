@@ -0,0 +1,62 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from orders.fake_stripe import start_fake_stripe
+from perf.loadtest import checkout_journey, run_load
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive browse -> cart -> checkout -> Stripe webhook journeys against a running shop '
+        'and report throughput and latency percentiles per step.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--stripe-url', default='http://127.0.0.1:12111')
+        parser.add_argument('--concurrency', type=int, default=10)
+        parser.add_argument('--iterations', type=int, default=10, help='Journeys per worker.')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument(
+            '--start-stripe', action='store_true',
+            help='Start the fake Stripe server in-process on the --stripe-url port.'
+        )
+        parser.add_argument('--latency', type=float, default=0.0, help='Fake Stripe mean latency (with --start-stripe).')
+        parser.add_argument('--failure-rate', type=float, default=0.0, help='Fake Stripe error rate (with --start-stripe).')
+        parser.add_argument('--decline-rate', type=float, default=0.0, help='Fake Stripe decline rate (with --start-stripe).')
+        parser.add_argument('--json', dest='json_path', help='Also write the summary to this JSON file.')
+
+    def handle(self, *args, **options):
+        stripe_server = None
+        if options['start_stripe']:
+            port = int(options['stripe_url'].rsplit(':', 1)[1].strip('/'))
+            stripe_server = start_fake_stripe(
+                port=port,
+                webhook_url=options['base_url'].rstrip('/') + '/orders/stripe/webhook/',
+                webhook_secret=settings.STRIPE_WEBHOOK_SECRET,
+                latency=options['latency'],
+                failure_rate=options['failure_rate'],
+                decline_rate=options['decline_rate'],
+                seed=options['seed'],
+            )
+
+        try:
+            report = run_load(
+                checkout_journey,
+                options['base_url'],
+                concurrency=options['concurrency'],
+                iterations=options['iterations'],
+                seed=options['seed'],
+                stripe_url=options['stripe_url'],
+            )
+        finally:
+            if stripe_server is not None:
+                stripe_server.shutdown()
+                stripe_server.server_close()
+
+        self.stdout.write(report.format_table())
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(report.summary(), f, indent=2)
@@ -0,0 +1,52 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from perf.startup import TARGETS, by_package, profile_startup
+
+
+class Command(BaseCommand):
+    help = (
+        'Import the WSGI/ASGI application (or the URL configuration) in a fresh interpreter '
+        'with -X importtime and show the import time per module and per package.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', choices=list(TARGETS), default='wsgi')
+        parser.add_argument('--top', type=int, default=25, help='Slowest modules to list.')
+        parser.add_argument(
+            '--forbid', default='stripe',
+            help='Comma-separated modules that must stay lazy; fail if the target imports them.'
+        )
+        parser.add_argument('--json', dest='json_path', help='Also write the profile to this JSON file.')
+
+    def handle(self, *args, **options):
+        try:
+            profile = profile_startup(options['target'])
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        modules = profile['modules']
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{options['target']}: {len(modules)} modules, {profile['import_seconds'] * 1000:.0f} ms importing, "
+            f"{profile['wall_seconds'] * 1000:.0f} ms wall (interpreter start included)"
+        ))
+        self.stdout.write(f"{'package':<32}{'modules':>9}{'self ms':>10}")
+        for package, count, self_us in by_package(modules)[:options['top']]:
+            self.stdout.write(f'{package:<32}{count:>9}{self_us / 1000:>10.1f}')
+
+        self.stdout.write('')
+        self.stdout.write(f"{'module':<52}{'self ms':>10}{'cumul. ms':>11}")
+        slowest = sorted(modules, key=lambda row: -row[2])[:options['top']]
+        for module, self_us, cumulative_us, depth in slowest:
+            self.stdout.write(f'{module:<52}{self_us / 1000:>10.1f}{cumulative_us / 1000:>11.1f}')
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(profile, f, indent=2)
+            self.stdout.write(f"Wrote {options['json_path']}")
+
+        imported = {module for module, self_us, cumulative_us, depth in modules}
+        forbidden = [name for name in filter(None, map(str.strip, options['forbid'].split(','))) if name in imported]
+        if forbidden:
+            raise CommandError(f"{options['target']} imports {', '.join(forbidden)} at startup")
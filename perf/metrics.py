@@ -0,0 +1,217 @@
+"""
+Request Metrics
+In-process counters and histograms per resolved URL name, exported in the
+Prometheus text format. With PERF_METRICS_DIR set, every worker process
+periodically writes its snapshot there and /metrics sums all of them.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+METRICS = {
+    'django_view_requests': ('counter', 'Requests per view, method and status.'),
+    'django_view_latency_seconds': ('histogram', 'Request latency per view.'),
+    'django_view_db_queries': ('histogram', 'SQL queries per request per view.'),
+    'django_view_db_seconds': ('counter', 'Time spent in SQL per view.'),
+    'django_view_template_seconds': ('counter', 'Time spent rendering templates per view.'),
+    'django_cache_events': ('counter', 'Cache-aside events (hit, miss, stale, ...) per namespace.'),
+}
+
+# Stats of the request being handled, for the template render hook
+current_request_stats = ContextVar('current_request_stats', default=None)
+
+
+class RequestStats:
+    """Counters for one request, filled by the SQL and template hooks"""
+
+    __slots__ = ('queries', 'db_time', 'template_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper() hook
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - started
+
+
+class MetricsRegistry:
+    """
+    Thread-safe metric store. Samples are keyed by (metric, labels) where
+    labels is a tuple of (name, value) pairs; histograms hold per-bucket
+    counts followed by the sum and the count.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self._last_flush = 0.0
+
+    def inc(self, metric, labels, value=1):
+        with self._lock:
+            self.counters[metric, labels] += value
+
+    def observe(self, metric, labels, value, buckets):
+        with self._lock:
+            self._observe(metric, labels, value, buckets)
+
+    def _observe(self, metric, labels, value, buckets):
+        series = self.histograms.get((metric, labels))
+        if series is None:
+            series = self.histograms[metric, labels] = [0] * (len(buckets) + 2)
+        index = bisect_left(buckets, value)
+        if index < len(buckets):
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def observe_request(self, view, method, status, latency, stats):
+        view_labels = (('view', view),)
+        with self._lock:
+            self.counters['django_view_requests', (('view', view), ('method', method), ('status', str(status)))] += 1
+            self._observe('django_view_latency_seconds', view_labels, latency, LATENCY_BUCKETS)
+            self._observe('django_view_db_queries', view_labels, stats.queries, QUERY_BUCKETS)
+            self.counters['django_view_db_seconds', view_labels] += stats.db_time
+            self.counters['django_view_template_seconds', view_labels] += stats.template_time
+
+    def snapshot(self):
+        """Return the samples as JSON-serializable lists"""
+        from ecommerce_site.cache import cache_metrics
+
+        with self._lock:
+            counters = [[metric, list(labels), value] for (metric, labels), value in self.counters.items()]
+            histograms = [[metric, list(labels), list(series)] for (metric, labels), series in self.histograms.items()]
+        for namespace, events in cache_metrics().items():
+            for event, count in events.items():
+                counters.append(['django_cache_events', [['namespace', namespace], ['event', event]], count])
+        return {'counters': counters, 'histograms': histograms}
+
+    def maybe_flush(self, force=False):
+        """Write this process's snapshot to PERF_METRICS_DIR at most once per interval"""
+        directory = getattr(settings, 'PERF_METRICS_DIR', '')
+        if not directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < settings.PERF_METRICS_FLUSH_SECONDS:
+            return
+        self._last_flush = now
+        path = Path(directory) / f'metrics_{os.getpid()}.json'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_suffix(f'.{threading.get_ident()}.tmp')
+        temporary.write_text(json.dumps(self.snapshot()))
+        os.replace(temporary, path)
+
+
+registry = MetricsRegistry()
+
+
+def _worker_alive(path):
+    """Whether the process that wrote a snapshot (metrics_<pid>.json) still runs"""
+    try:
+        pid = int(path.stem.removeprefix('metrics_'))
+    except ValueError:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Alive, under another user
+        return True
+    return True
+
+
+def collect():
+    """
+    Merge the snapshots of all worker processes (or just this one).
+
+    Returns:
+        tuple: ({(metric, labels): value}, {(metric, labels): [buckets..., sum, count]})
+    """
+    directory = getattr(settings, 'PERF_METRICS_DIR', '')
+    if directory:
+        registry.maybe_flush(force=True)
+        snapshots = []
+        for path in Path(directory).glob('metrics_*.json'):
+            if not _worker_alive(path):
+                # Its counters go with it, which Prometheus reads as a counter reset
+                path.unlink(missing_ok=True)
+                continue
+            try:
+                snapshots.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+    else:
+        snapshots = [registry.snapshot()]
+
+    counters = defaultdict(float)
+    histograms = {}
+    for snapshot in snapshots:
+        for metric, labels, value in snapshot['counters']:
+            counters[metric, tuple(map(tuple, labels))] += value
+        for metric, labels, series in snapshot['histograms']:
+            key = (metric, tuple(map(tuple, labels)))
+            if key in histograms:
+                histograms[key] = [a + b for a, b in zip(histograms[key], series)]
+            else:
+                histograms[key] = list(series)
+    return counters, histograms
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_number(value):
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def render_prometheus():
+    """Render all metrics in the Prometheus text exposition format (0.0.4)"""
+    counters, histograms = collect()
+    lines = []
+    for metric, (kind, help_text) in METRICS.items():
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} {kind}')
+        if kind == 'counter':
+            for (name, labels), value in sorted(counters.items()):
+                if name == metric:
+                    lines.append(f'{metric}_total{_format_labels(labels)} {_format_number(value)}')
+            continue
+        buckets = LATENCY_BUCKETS if metric == 'django_view_latency_seconds' else QUERY_BUCKETS
+        for (name, labels), series in sorted(histograms.items()):
+            if name != metric:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, series):
+                cumulative += count
+                lines.append(f'{metric}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{metric}_bucket{_format_labels(labels, [("le", "+Inf")])} {series[-1]}')
+            lines.append(f'{metric}_sum{_format_labels(labels)} {_format_number(series[-2])}')
+            lines.append(f'{metric}_count{_format_labels(labels)} {series[-1]}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,327 @@
+"""
+Microbenchmarks
+Repeatable timings of hot code paths: cart operations, order totals, Stripe
+amount conversion and template rendering. Each benchmark is calibrated so one
+sample takes at least ``min_time``, warmed up, then sampled ``repeat`` times
+with the garbage collector off (like timeit). Allocations are measured in a
+separate pass with tracemalloc, since tracing distorts timings.
+
+Baselines store the raw samples, so a comparison can use a Mann-Whitney U
+test instead of judging from two noisy medians.
+"""
+import gc
+import math
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.db import connection
+
+
+BENCHMARKS = {}
+
+# Rows created by fixtures, valid for the current benchmark_database() only
+_database_fixtures = ContextVar('database_fixtures', default=None)
+
+
+class Benchmark:
+    """A registered benchmark: ``setup(param)`` returns the callable to time"""
+
+    def __init__(self, name, setup, params, uses_db=False):
+        self.name = name
+        self.setup = setup
+        self.params = params
+        self.uses_db = uses_db
+
+    def cases(self):
+        return [(self.name if param is None else f'{self.name}[{param}]', param) for param in self.params]
+
+
+def benchmark(name, params=(None,), uses_db=False):
+    """Register ``setup(param) -> callable`` as a benchmark"""
+    def decorator(setup):
+        BENCHMARKS[name] = Benchmark(name, setup, tuple(params), uses_db)
+        return setup
+    return decorator
+
+
+def _time(func, number):
+    started = time.perf_counter()
+    for _ in range(number):
+        func()
+    return time.perf_counter() - started
+
+
+def calibrate(func, min_time=0.02):
+    """Return how many calls make one sample last at least min_time (like timeit.autorange)"""
+    number = 1
+    while True:
+        elapsed = _time(func, number)
+        if elapsed >= min_time:
+            return number
+        number *= 10 if elapsed < min_time / 10 else 2
+
+
+def time_samples(func, repeat=20, min_time=0.02, warmup=0.1):
+    """
+    Return (calls per sample, [seconds per call, ...]) after warming up for
+    ``warmup`` seconds.
+    """
+    deadline = time.perf_counter() + warmup
+    while time.perf_counter() < deadline:
+        func()
+    number = calibrate(func, min_time)
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        samples = [_time(func, number) / number for _ in range(repeat)]
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return number, samples
+
+
+def measure_allocations(func, calls=10):
+    """
+    Return the peak traced memory of one call and the memory still held
+    per call after ``calls`` calls, in bytes.
+    """
+    func()
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        start, _ = tracemalloc.get_traced_memory()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        start_retained, _ = tracemalloc.get_traced_memory()
+        for _ in range(calls):
+            func()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'peak_bytes': max(0, peak - start),
+        'retained_bytes_per_call': (current - start_retained) / calls,
+    }
+
+
+def summarize(samples):
+    """Median, IQR and mean with its 95% confidence half-width, in seconds"""
+    quartiles = statistics.quantiles(samples, n=4) if len(samples) > 1 else [samples[0]] * 3
+    stdev = statistics.stdev(samples) if len(samples) > 1 else 0.0
+    return {
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'iqr': quartiles[2] - quartiles[0],
+        'mean': statistics.fmean(samples),
+        'ci95': 1.96 * stdev / math.sqrt(len(samples)),
+    }
+
+
+def mann_whitney_z(a, b):
+    """
+    z score of the Mann-Whitney U test (normal approximation, tie-corrected)
+    for samples a and b; positive when b tends to be larger than a.
+    """
+    combined = sorted([(value, 0) for value in a] + [(value, 1) for value in b])
+    ranks = [0.0] * len(combined)
+    tie_term = 0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        ties = j - i + 1
+        tie_term += ties ** 3 - ties
+        i = j + 1
+
+    n1, n2 = len(a), len(b)
+    rank_sum_b = sum(rank for rank, (value, group) in zip(ranks, combined) if group == 1)
+    u = rank_sum_b - n2 * (n2 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        return 0.0
+    return (u - n1 * n2 / 2) / math.sqrt(variance)
+
+
+def compare(baseline, current, threshold=0.05, z_critical=1.96):
+    """
+    Classify one benchmark against its baseline entry.
+
+    Returns:
+        tuple: (relative change of the median, 'slower' | 'faster' | 'same')
+    """
+    change = current['stats']['median'] / baseline['stats']['median'] - 1
+    z = mann_whitney_z(baseline['samples'], current['samples'])
+    if abs(change) < threshold or abs(z) < z_critical:
+        return change, 'same'
+    return change, 'slower' if change > 0 else 'faster'
+
+
+def run_case(bench, param, repeat=20, min_time=0.02, warmup=0.1):
+    func = bench.setup(param)
+    number, samples = time_samples(func, repeat=repeat, min_time=min_time, warmup=warmup)
+    return {
+        'number': number,
+        'samples': samples,
+        'stats': summarize(samples),
+        'memory': measure_allocations(func),
+    }
+
+
+@contextmanager
+def benchmark_database():
+    """Run inside a fresh test database, so fixtures never touch real data"""
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    token = _database_fixtures.set({})
+    try:
+        yield
+    finally:
+        _database_fixtures.reset(token)
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+# Fixtures
+
+class BenchSession(dict):
+    """Minimal session for Cart: a dict with the 'modified' flag"""
+    modified = False
+
+
+def _fake_request(cart_lines=0):
+    from django.contrib.auth.models import AnonymousUser
+    from django.test import RequestFactory
+
+    request = RequestFactory().get('/')
+    request.user = AnonymousUser()
+    request.session = BenchSession()
+    if cart_lines:
+        request.session['cart'] = {
+            str(product.id): {'quantity': 2, 'price': str(product.price)}
+            for product in _unsaved_products(cart_lines)
+        }
+    return request
+
+
+def _unsaved_products(count):
+    from shop.models import Category, Product
+
+    categories = [Category(id=i + 1, name=f'Category {i}', slug=f'category-{i}') for i in range(10)]
+    return [
+        Product(
+            id=i + 1, category=categories[i % 10], name=f'Product {i}', slug=f'product-{i}',
+            description='A product used for benchmarking. ' * 4,
+            price=Decimal('9.99') + i, stock=i % 7,
+        )
+        for i in range(count)
+    ]
+
+
+def _products_in_db(count):
+    """Create (once per benchmark database) and return ``count`` saved products"""
+    from shop.models import Category, Product
+
+    fixtures = _database_fixtures.get()
+    if fixtures is None:
+        raise RuntimeError('Database benchmarks must run inside benchmark_database()')
+    saved_products = fixtures.setdefault('products', [])
+    if len(saved_products) < count:
+        category, _ = Category.objects.get_or_create(slug='bench', defaults={'name': 'Bench'})
+        start = len(saved_products)
+        saved_products.extend(Product.objects.bulk_create([
+            Product(category=category, name=f'Bench {i}', slug=f'bench-{i}', price=Decimal('9.99') + i, stock=10)
+            for i in range(start, count)
+        ]))
+    return saved_products[:count]
+
+
+LINES = (1, 10, 50, 200)
+
+
+@benchmark('cart.add', params=LINES)
+def bench_cart_add(lines):
+    from cart.cart import Cart
+
+    products = _unsaved_products(lines)
+
+    def run():
+        cart = Cart(SimpleNamespace(session=BenchSession()))
+        for product in products:
+            cart.add(product, quantity=2)
+    return run
+
+
+@benchmark('cart.iter', params=LINES, uses_db=True)
+def bench_cart_iter(lines):
+    from cart.cart import Cart
+
+    session = BenchSession(cart={
+        str(product.id): {'quantity': 2, 'price': str(product.price)}
+        for product in _products_in_db(lines)
+    })
+
+    def run():
+        for item in Cart(SimpleNamespace(session=session)):
+            pass
+    return run
+
+
+@benchmark('cart.get_total_price', params=LINES)
+def bench_cart_total(lines):
+    from cart.cart import Cart
+
+    cart = Cart(_fake_request(lines))
+    return cart.get_total_price
+
+
+@benchmark('order.get_total_cost', params=LINES)
+def bench_order_total(lines):
+    from orders.models import Order, OrderItem
+
+    order = Order(id=1)
+    items = [
+        OrderItem(order=order, product=product, price=product.price, quantity=2)
+        for product in _unsaved_products(lines)
+    ]
+    # Same as a prefetch_related('items') result
+    order._prefetched_objects_cache = {'items': OrderItem.objects.none()}
+    order._prefetched_objects_cache['items']._result_cache = items
+    return order.get_total_cost
+
+
+@benchmark('stripe.dollars_to_cents')
+def bench_dollars_to_cents(param):
+    from orders.stripe_service import StripePaymentService
+
+    amount = Decimal('1234.56')
+    return lambda: StripePaymentService.dollars_to_cents(amount)
+
+
+@benchmark('render.product_list', params=(10, 50, 200))
+def bench_render_product_list(count):
+    from django.template.loader import get_template
+
+    template = get_template('shop/product/list.html')
+    products = _unsaved_products(count)
+    categories = list({product.category.id: product.category for product in products}.values())
+    request = _fake_request()
+    context = {'category': None, 'categories': categories, 'products': products}
+    return lambda: template.render(context, request)
+
+
+@benchmark('render.base', params=(0, 10, 50))
+def bench_render_base(cart_lines):
+    from django.template.loader import get_template
+
+    # Renders through the context processors, including cart.context_processors.cart
+    template = get_template('base.html')
+    request = _fake_request(cart_lines)
+    return lambda: template.render({}, request)
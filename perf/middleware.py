@@ -0,0 +1,107 @@
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .metrics import RequestStats, current_request_stats, registry
+from .slowqueries import SlowQueryWatcher
+
+
+def _watch_queries(stack, wrapper):
+    for alias in connections:
+        stack.enter_context(connections[alias].execute_wrapper(wrapper))
+
+
+class MetricsMiddleware:
+    """
+    Record latency, SQL query count/time and template render time for every
+    request, labelled with the resolved URL name (e.g. 'shop:product_list').
+    Not used while PERF_METRICS_ENABLED is off.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PERF_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                _watch_queries(stack, stats)
+                response = self.get_response(request)
+        finally:
+            current_request_stats.reset(token)
+        self._observe(request, response, time.perf_counter() - started, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            # The async ORM runs queries in the request's sync thread, whose
+            # connections are not the event loop thread's
+            with ExitStack() as stack:
+                await sync_to_async(_watch_queries)(stack, stats)
+                try:
+                    response = await self.get_response(request)
+                finally:
+                    await sync_to_async(stack.close)()
+        finally:
+            current_request_stats.reset(token)
+        self._observe(request, response, time.perf_counter() - started, stats)
+        return response
+
+    def _observe(self, request, response, latency, stats):
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        registry.observe_request(view, request.method, response.status_code, latency, stats)
+        registry.maybe_flush()
+
+
+class SlowQueryMiddleware:
+    """
+    Log the SQL statements slower than PERF_SLOW_QUERY_MS with the view that
+    ran them (see perf/slowqueries.py). Not used while the threshold is 0.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PERF_SLOW_QUERY_MS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = settings.PERF_SLOW_QUERY_MS / 1000
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        with ExitStack() as stack:
+            _watch_queries(stack, SlowQueryWatcher(request, self.threshold))
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with ExitStack() as stack:
+            await sync_to_async(_watch_queries)(stack, SlowQueryWatcher(request, self.threshold))
+            try:
+                return await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
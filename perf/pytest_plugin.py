@@ -0,0 +1,46 @@
+"""
+pytest-django plugin for query budgets.
+
+Enable it with ``pytest_plugins = ['perf.pytest_plugin']`` in conftest.py, then:
+
+    @pytest.mark.query_budget(max_queries=6, max_repeats=2)
+    def test_product_list(client, db):
+        client.get('/')
+
+    def test_checkout(client, db, query_budget):
+        with query_budget(max_queries=40):
+            client.post('/orders/create/', data)
+"""
+import pytest
+
+from .querybudget import query_budget as _query_budget
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        'markers',
+        'query_budget(max_queries=None, max_repeats=2): fail if the test exceeds the '
+        'query budget or repeats a query shape (N+1)',
+    )
+
+
+@pytest.fixture
+def query_budget():
+    """Return the query_budget context manager for use inside a test"""
+    return _query_budget
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    marker = item.get_closest_marker('query_budget')
+    if marker is None:
+        yield
+        return
+    budget = _query_budget(*marker.args, label=item.nodeid, **marker.kwargs)
+    budget.__enter__()
+    outcome = yield
+    try:
+        budget.__exit__(None, None, None)
+    except AssertionError as e:
+        if outcome.excinfo is None:
+            outcome.force_exception(e)
@@ -0,0 +1,168 @@
+"""
+Query Budgets
+Test helpers that cap the number of SQL queries a view or code path may run
+and detect N+1 patterns: the same query shape (SQL with parameters and IN
+lists normalized) executed repeatedly. Failures report the offending SQL
+grouped by the template line or code location that triggered it.
+
+    with query_budget(max_queries=6):
+        client.get(url)
+"""
+import os
+import re
+import sys
+from collections import defaultdict
+from contextlib import ExitStack
+from functools import wraps
+
+from django.db import connections
+
+
+IN_LIST_RE = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+PLACEHOLDER_RUN_RE = re.compile(r'%s(?:\s*,\s*%s)+')
+
+# Frames from these locations are skipped when attributing a query to code:
+# Django, asgiref, the standard library and the perf app's execute_wrapper hooks
+_IGNORED_PATHS = tuple(
+    os.path.dirname(module.__file__)
+    for module in map(sys.modules.get, ('django', 'asgiref', 'contextlib'))
+    if module is not None and getattr(module, '__file__', None)
+) + (os.path.dirname(os.__file__),) + tuple(
+    os.path.join(os.path.dirname(__file__), name) for name in ('querybudget.py', 'metrics.py', 'slowqueries.py')
+)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a block runs more queries, or more repeats, than allowed"""
+
+
+def query_shape(sql):
+    """Normalize SQL so queries differing only in parameters compare equal"""
+    return PLACEHOLDER_RUN_RE.sub('%s', IN_LIST_RE.sub('(...)', sql)).strip()
+
+
+def query_origin():
+    """
+    Describe what triggered the current query: the innermost template node
+    being rendered ('shop/product/list.html:42'), else the innermost project
+    code frame ('cart/cart.py:55 in __iter__').
+    """
+    frame = sys._getframe(2)
+    code_location = None
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                return f'{origin.template_name}:{token.lineno}'
+        if code_location is None and not code.co_filename.startswith(_IGNORED_PATHS):
+            filename = os.path.relpath(code.co_filename)
+            code_location = f'{filename}:{frame.f_lineno} in {code.co_name}'
+        frame = frame.f_back
+    return code_location or 'unknown'
+
+
+class QueryRecorder:
+    """execute_wrapper() hook recording (alias, sql, shape, origin) per query"""
+
+    def __init__(self):
+        self.queries = []
+
+    def wrapper(self, alias):
+        def record(execute, sql, params, many, context):
+            self.queries.append((alias, sql, query_shape(sql), query_origin()))
+            return execute(sql, params, many, context)
+        return record
+
+    def repeated(self, max_repeats):
+        """Return {shape: [origins]} for shapes run more than max_repeats times"""
+        by_shape = defaultdict(list)
+        for alias, sql, shape, origin in self.queries:
+            by_shape[shape].append(origin)
+        return {shape: origins for shape, origins in by_shape.items() if len(origins) > max_repeats}
+
+    def report(self, max_queries=None, max_repeats=None, label=''):
+        """Return a failure description, or '' if the budget was respected"""
+        problems = []
+        if max_queries is not None and len(self.queries) > max_queries:
+            problems.append(f'{len(self.queries)} queries executed, budget is {max_queries}')
+        repeated = self.repeated(max_repeats) if max_repeats is not None else {}
+        if repeated:
+            problems.append(
+                f'{len(repeated)} query shape(s) repeated more than {max_repeats} times (possible N+1)'
+            )
+        if not problems:
+            return ''
+
+        lines = [f"Query budget exceeded{f' in {label}' if label else ''}: " + '; '.join(problems)]
+        if repeated:
+            lines.append('')
+            lines.append('Repeated queries:')
+            for shape, origins in sorted(repeated.items(), key=lambda item: -len(item[1])):
+                lines.append(f'  {len(origins)}x {shape}')
+                for origin, count in _count(origins):
+                    lines.append(f'      {count}x from {origin}')
+        lines.append('')
+        lines.append('All queries by origin:')
+        by_origin = defaultdict(list)
+        for alias, sql, shape, origin in self.queries:
+            by_origin[origin].append(sql)
+        for origin, statements in by_origin.items():
+            lines.append(f'  {origin}')
+            for sql, count in _count(statements):
+                lines.append(f"      {f'{count}x ' if count > 1 else ''}{sql}")
+        return '\n'.join(lines)
+
+
+def _count(values):
+    counts = {}
+    for value in values:
+        counts[value] = counts.get(value, 0) + 1
+    return counts.items()
+
+
+class query_budget:
+    """
+    Context manager / decorator asserting a query budget.
+
+    Args:
+        max_queries: Maximum total queries across all databases (None: no cap)
+        max_repeats: Maximum executions of one query shape (None: no check)
+        label: Name used in the failure report
+    """
+
+    def __init__(self, max_queries=None, max_repeats=2, label=''):
+        self.max_queries = max_queries
+        self.max_repeats = max_repeats
+        self.label = label
+
+    def __enter__(self):
+        self.recorder = QueryRecorder()
+        self._stack = ExitStack()
+        for alias in connections:
+            self._stack.enter_context(connections[alias].execute_wrapper(self.recorder.wrapper(alias)))
+        return self.recorder
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stack.close()
+        if exc_type is None:
+            report = self.recorder.report(self.max_queries, self.max_repeats, self.label)
+            if report:
+                raise QueryBudgetExceeded(report)
+        return False
+
+    def __call__(self, func):
+        @wraps(func)
+        def wrapped(*args, **kwargs):
+            with query_budget(self.max_queries, self.max_repeats, self.label or func.__qualname__):
+                return func(*args, **kwargs)
+        return wrapped
+
+
+class QueryBudgetMixin:
+    """TestCase mixin adding assertQueryBudget()"""
+
+    def assertQueryBudget(self, max_queries=None, max_repeats=2, label=''):
+        return query_budget(max_queries, max_repeats, label or self.id())
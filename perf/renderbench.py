@@ -0,0 +1,92 @@
+"""
+Template Engine Comparison
+Renders the hot pages (the product list and the cart) with the Django
+template engine and with the optional Jinja2 engine, checks that both
+produce the same page, and times each render with the microbenchmark
+sampler.
+"""
+import re
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.conf import settings
+from django.template import engines
+from django.test import override_settings
+
+from .microbench import _fake_request, _unsaved_products, summarize, time_samples
+
+
+ENGINES = ('django', 'jinja2')
+# The CSRF token is masked differently on every render
+CSRF_VALUE = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*"')
+
+
+def _product_list(count):
+    products = _unsaved_products(count)
+    categories = list({product.category.id: product.category for product in products}.values())
+    return {'category': None, 'categories': categories, 'products': products}, _fake_request()
+
+
+def _cart_detail(lines):
+    from cart.cart import Cart
+    from cart.forms import CartAddProductForm
+
+    request = _fake_request(lines)
+    cart = Cart(request)
+    products = {str(product.id): product for product in _unsaved_products(lines)}
+    items = []
+    # What iterating the cart yields, without the product query
+    for product_id, line in cart.cart.items():
+        price = Decimal(line['price'])
+        items.append({
+            **line,
+            'product': products[product_id],
+            'price': price,
+            'total_price': price * line['quantity'],
+            'update_quantity_form': CartAddProductForm(initial={'quantity': line['quantity'], 'override': True}),
+        })
+    return {'cart': cart, 'items': items}, request
+
+
+# Page: (template, context factory taking the size, sizes)
+PAGES = {
+    'product_list': ('shop/product/list.html', _product_list, (10, 50, 200)),
+    'cart_detail': ('cart/detail.html', _cart_detail, (1, 10, 50)),
+}
+
+
+@contextmanager
+def jinja2_enabled():
+    """Make sure the Jinja2 engine is configured, whatever HOT_TEMPLATE_ENGINE says"""
+    if any(engine['BACKEND'] == settings.JINJA2_ENGINE['BACKEND'] for engine in settings.TEMPLATES):
+        yield
+        return
+    with override_settings(TEMPLATES=[*settings.TEMPLATES, settings.JINJA2_ENGINE]):
+        yield
+
+
+def normalize(html):
+    return CSRF_VALUE.sub(r'\1"', html)
+
+
+def render_page(engine, page, size):
+    """Return a function rendering ``page`` of ``size`` items with ``engine``"""
+    template_name, make_context, sizes = PAGES[page]
+    template = engines[engine].get_template(template_name)
+    context, request = make_context(size)
+    return lambda: template.render(context, request)
+
+
+def compare_engines(page, size, repeat=20, min_time=0.02, warmup=0.1):
+    """
+    Render ``page`` with each engine. Returns {engine: summary} and whether
+    the engines produced the same page. Call inside jinja2_enabled().
+    """
+    results = {}
+    pages = set()
+    for engine in ENGINES:
+        render = render_page(engine, page, size)
+        pages.add(normalize(render()))
+        number, samples = time_samples(render, repeat, min_time, warmup)
+        results[engine] = {'number': number, 'samples': samples, 'stats': summarize(samples)}
+    return results, len(pages) == 1
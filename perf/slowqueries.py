@@ -0,0 +1,220 @@
+"""
+Slow Query Log
+Opt-in (PERF_SLOW_QUERY_MS): SlowQueryMiddleware times the SQL statements of
+every request through connection.execute_wrapper() and records those over
+the threshold with the view's URL name, a fingerprint of the normalized SQL
+and the template line or code that ran it. The first slow occurrence of a
+fingerprint, then a sample of the later ones (PERF_SLOW_QUERY_EXPLAIN_RATE),
+is run again under EXPLAIN (EXPLAIN QUERY PLAN on SQLite) to capture its
+plan.
+
+Async views run their queries in a worker thread, away from the view's
+frames, so those are attributed to the view only (origin 'unknown').
+
+Statements on PERF_SLOW_QUERY_REDACTED_TABLES (sessions, users) are kept
+without their parameters and not explained, as PostgreSQL plans repeat the
+values they filter on.
+
+Each process keeps the latest PERF_SLOW_QUERY_BUFFER entries in a ring
+buffer; the superuser page /admin/perf/slow-queries/ aggregates them by
+fingerprint, slowest first, and exports them as JSON.
+"""
+import hashlib
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+
+from django.conf import settings
+from django.utils import timezone
+
+from .querybudget import query_origin, query_shape
+
+
+logger = logging.getLogger(__name__)
+
+STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL_RE = re.compile(r'(?<![\w."])-?\d+(?:\.\d+)?\b')
+EXPLAINABLE = ('SELECT', 'WITH')
+
+
+def normalize_sql(sql):
+    """SQL with parameters, literals and IN lists replaced, whitespace collapsed"""
+    sql = NUMBER_LITERAL_RE.sub('%s', STRING_LITERAL_RE.sub('%s', sql))
+    return ' '.join(query_shape(sql).split())
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+def redacted(sql):
+    """Whether the statement touches one of PERF_SLOW_QUERY_REDACTED_TABLES"""
+    return any(re.search(rf'\b{re.escape(table)}\b', sql) for table in settings.PERF_SLOW_QUERY_REDACTED_TABLES)
+
+
+def explain(connection, sql, params):
+    """
+    Return the plan of a statement as text. The cursor is created directly
+    on the backend, so the EXPLAIN bypasses the execute wrappers (metrics,
+    budgets, this log); backend errors are raised as Django's DatabaseError.
+    Inside a transaction it runs in a savepoint, so a failed EXPLAIN doesn't
+    abort the caller's transaction on PostgreSQL.
+    """
+    savepoint = connection.in_atomic_block and connection.features.uses_savepoints
+    with connection.wrap_database_errors:
+        cursor = connection.create_cursor()
+        try:
+            if savepoint:
+                cursor.execute(connection.ops.savepoint_create_sql('perf_explain'))
+            try:
+                cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+                rows = cursor.fetchall()
+            except Exception:
+                if savepoint:
+                    cursor.execute(connection.ops.savepoint_rollback_sql('perf_explain'))
+                raise
+            if savepoint:
+                cursor.execute(connection.ops.savepoint_commit_sql('perf_explain'))
+        finally:
+            cursor.close()
+    if connection.vendor != 'sqlite':
+        return '\n'.join(str(row[0]) for row in rows)
+    # EXPLAIN QUERY PLAN rows: (id, parent, notused, detail)
+    depths = {}
+    lines = []
+    for node, parent, notused, detail in rows:
+        depths[node] = depths.get(parent, -1) + 1
+        lines.append('  ' * depths[node] + detail)
+    return '\n'.join(lines)
+
+
+class SlowQueryLog:
+    """Ring buffer of this process's slow queries and their latest plans"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.entries = deque(maxlen=settings.PERF_SLOW_QUERY_BUFFER)
+        # fingerprint -> plan, least recently explained first
+        self.plans = OrderedDict()
+
+    def should_explain(self, key):
+        return key not in self.plans or random.random() < settings.PERF_SLOW_QUERY_EXPLAIN_RATE
+
+    def add(self, entry, plan=None):
+        with self._lock:
+            if self.entries.maxlen != settings.PERF_SLOW_QUERY_BUFFER:
+                self.entries = deque(self.entries, maxlen=settings.PERF_SLOW_QUERY_BUFFER)
+            self.entries.append(entry)
+            if plan is not None:
+                self.plans[entry['fingerprint']] = plan
+                self.plans.move_to_end(entry['fingerprint'])
+                while len(self.plans) > self.entries.maxlen:
+                    self.plans.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.plans.clear()
+
+    def recent(self, limit=50):
+        """Latest entries, newest first"""
+        with self._lock:
+            return list(reversed(self.entries))[:limit]
+
+    def top(self, limit=25):
+        """Fingerprints in the buffer by total time, with their views, origins and plan"""
+        with self._lock:
+            entries = list(self.entries)
+            plans = dict(self.plans)
+        groups = {}
+        for entry in entries:
+            group = groups.get(entry['fingerprint'])
+            if group is None:
+                group = groups[entry['fingerprint']] = {
+                    'fingerprint': entry['fingerprint'],
+                    'normalized': entry['normalized'],
+                    'count': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'views': Counter(),
+                    'origins': Counter(),
+                }
+            group['count'] += 1
+            group['total_ms'] += entry['duration_ms']
+            group['max_ms'] = max(group['max_ms'], entry['duration_ms'])
+            group['views'][entry['view']] += 1
+            group['origins'][entry['origin']] += 1
+            group['example'] = entry['sql']
+        rows = sorted(groups.values(), key=lambda group: -group['total_ms'])[:limit]
+        for group in rows:
+            group['mean_ms'] = group['total_ms'] / group['count']
+            group['views'] = group['views'].most_common(3)
+            group['origins'] = group['origins'].most_common(3)
+            group['plan'] = plans.get(group['fingerprint'], '')
+        return rows
+
+    def export(self):
+        """The buffer as JSON-serializable data (parameters included, for replaying, unless redacted)"""
+        with self._lock:
+            return {
+                'threshold_ms': settings.PERF_SLOW_QUERY_MS,
+                'entries': list(self.entries),
+                'plans': dict(self.plans),
+            }
+
+
+slow_query_log = SlowQueryLog()
+
+
+class SlowQueryWatcher:
+    """connection.execute_wrapper() hook recording one request's statements over ``threshold`` seconds"""
+
+    def __init__(self, request, threshold, log=slow_query_log):
+        self.request = request
+        self.threshold = threshold
+        self.log = log
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = time.perf_counter() - started
+        if duration >= self.threshold:
+            self.record(sql, params, many, context['connection'], duration)
+        return result
+
+    def record(self, sql, params, many, connection, duration):
+        match = getattr(self.request, 'resolver_match', None)
+        normalized = normalize_sql(sql)
+        is_redacted = redacted(sql)
+        entry = {
+            'fingerprint': fingerprint(normalized),
+            'normalized': normalized,
+            'sql': sql,
+            'params': (
+                None if many or is_redacted or params is None else params if isinstance(params, dict) else list(params)
+            ),
+            'params_redacted': is_redacted,
+            'many': many,
+            'duration_ms': duration * 1000,
+            'alias': connection.alias,
+            'view': match.view_name if match else 'unresolved',
+            'origin': query_origin(),
+            'time': timezone.now(),
+        }
+        plan = None
+        if (
+            not many and not is_redacted and sql.lstrip().upper().startswith(EXPLAINABLE)
+            and self.log.should_explain(entry['fingerprint'])
+        ):
+            # The statement itself succeeded; its EXPLAIN must not fail the request
+            try:
+                plan = explain(connection, sql, params)
+            except Exception as e:
+                plan = f'EXPLAIN failed: {e}'
+        self.log.add(entry, plan)
+        logger.warning(
+            'Slow query (%.1f ms) in %s from %s: %s', entry['duration_ms'], entry['view'], entry['origin'], sql
+        )
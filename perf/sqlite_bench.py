@@ -0,0 +1,155 @@
+"""
+SQLite Concurrency Benchmark
+Replays cart (session save) and checkout (order, items, stock, payment) write
+transactions from concurrent threads against scratch SQLite files, once per
+options profile, so the stock settings can be compared with the tuned profile.
+"""
+import random
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from orders.models import Order, OrderItem, Payment
+from shop.models import Category, Product
+from .loadtest import LoadReport
+
+
+def profiles():
+    return {
+        'default': {},
+        'tuned': settings.SQLITE_TUNED_OPTIONS,
+    }
+
+
+def register_sqlite_alias(alias, path, options):
+    """Add a SQLite connection alias at runtime, based on the default's settings"""
+    connections.settings[alias] = {
+        **connections.settings[DEFAULT_DB_ALIAS],
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': str(path),
+        'OPTIONS': dict(options),
+        'CONN_MAX_AGE': None,
+    }
+
+
+def build_template(directory, products=50):
+    """Create a migrated, seeded database file to copy for each run"""
+    path = Path(directory) / 'template.sqlite3'
+    register_sqlite_alias('bench_template', path, {})
+    try:
+        call_command('migrate', database='bench_template', verbosity=0, interactive=False)
+        category = Category.objects.using('bench_template').create(name='Bench', slug='bench')
+        Product.objects.using('bench_template').bulk_create(
+            Product(category_id=category.pk, name=f'Bench product {i}', slug=f'bench-product-{i}',
+                    price=Decimal('19.99'), stock=1_000_000)
+            for i in range(products)
+        )
+    finally:
+        connections['bench_template'].close()
+        del connections.settings['bench_template']
+    return path
+
+
+def cart_write(alias, rng, product_ids):
+    """A session save, as done by every cart add/update"""
+    session_key = f'bench{rng.randrange(1000):04d}'.ljust(32, '0')
+    data = f'{{"cart": {{"{rng.choice(product_ids)}": {{"quantity": {rng.randint(1, 3)}}}}}}}'
+    with transaction.atomic(using=alias):
+        Session.objects.using(alias).update_or_create(
+            session_key=session_key,
+            defaults={'session_data': data, 'expire_date': timezone.now() + timedelta(weeks=2)},
+        )
+
+
+def checkout_write(alias, rng, product_ids):
+    """Order creation with items, stock decrement and a pending payment"""
+    with transaction.atomic(using=alias):
+        order = Order.objects.using(alias).create(
+            first_name='Bench', last_name='User', email='bench@example.com',
+            address='1 Bench Street', postal_code='00000', city='Benchville', payment_method='bank_transfer',
+        )
+        items = [
+            OrderItem(order_id=order.pk, product_id=product_id, price=Decimal('19.99'), quantity=rng.randint(1, 3))
+            for product_id in rng.sample(product_ids, 2)
+        ]
+        OrderItem.objects.using(alias).bulk_create(items)
+        for item in items:
+            Product.objects.using(alias).filter(pk=item.product_id).update(stock=F('stock') - item.quantity)
+        Payment.objects.using(alias).create(
+            order_id=order.pk, payment_method='bank_transfer',
+            amount=sum(item.price * item.quantity for item in items),
+        )
+
+
+def run_profile(name, options, template, directory, threads=8, iterations=200, checkout_ratio=0.25, seed=None):
+    """
+    Run the write mix against a fresh copy of the template with one profile.
+
+    Returns:
+        LoadReport: cart_write/checkout_write steps; errors are lock failures
+    """
+    path = Path(directory) / f'{name}.sqlite3'
+    shutil.copyfile(template, path)
+    alias = f'bench_{name}'
+    register_sqlite_alias(alias, path, options)
+    product_ids = list(Product.objects.using(alias).values_list('pk', flat=True))
+    connections[alias].close()
+
+    report = LoadReport()
+    start = threading.Barrier(threads)
+
+    def worker(number):
+        rng = random.Random(None if seed is None else seed + number)
+        try:
+            start.wait()
+            for _ in range(iterations):
+                step, write = (
+                    ('checkout_write', checkout_write) if rng.random() < checkout_ratio
+                    else ('cart_write', cart_write)
+                )
+                started = time.perf_counter()
+                try:
+                    write(alias, rng, product_ids)
+                    ok = True
+                except OperationalError:
+                    # "database is locked" once the busy timeout is exhausted
+                    ok = False
+                report.record(step, time.perf_counter() - started, ok=ok)
+                report.journey_done(ok)
+        finally:
+            connections[alias].close()
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    report.started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    report.finished = time.perf_counter()
+    del connections.settings[alias]
+    return report
+
+
+def run_benchmark(names=None, **kwargs):
+    """Run every requested profile on identical data and return {name: LoadReport}"""
+    available = profiles()
+    directory = tempfile.mkdtemp(prefix='bench_sqlite_')
+    try:
+        template = build_template(directory)
+        return {
+            name: run_profile(name, available[name], template, directory, **kwargs)
+            for name in (names or available)
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
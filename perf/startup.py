@@ -0,0 +1,79 @@
+"""
+Startup Profiling
+Measures what a fresh worker imports before it can serve a request, using
+CPython's ``-X importtime`` in a clean subprocess, and breaks the time down
+per module and per top-level package.
+"""
+import re
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+
+
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$')
+
+# What each target does at worker startup
+TARGETS = {
+    # The WSGI/ASGI entry points, as gunicorn or uvicorn load them
+    'wsgi': 'import ecommerce_site.wsgi',
+    'asgi': 'import ecommerce_site.asgi',
+    # django.setup() plus the URL configuration, as the first request does
+    'urls': (
+        'import django; django.setup(); '
+        'from django.urls import get_resolver; get_resolver().url_patterns'
+    ),
+}
+
+
+def parse_importtime(stderr):
+    """
+    Parse ``-X importtime`` output.
+
+    Returns:
+        list: (module, self microseconds, cumulative microseconds, depth)
+        in import completion order
+    """
+    modules = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            modules.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return modules
+
+
+def by_package(modules):
+    """Sum the self time of modules per top-level package, slowest first"""
+    totals = {}
+    for module, self_us, cumulative_us, depth in modules:
+        package = module.split('.', 1)[0]
+        count, total = totals.get(package, (0, 0))
+        totals[package] = (count + 1, total + self_us)
+    return sorted(((package, count, total) for package, (count, total) in totals.items()), key=lambda row: -row[2])
+
+
+def profile_startup(target='wsgi', env=None):
+    """
+    Import ``target`` in a fresh interpreter with -X importtime.
+
+    Returns:
+        dict: wall time, total import time and the parsed modules
+    """
+    code = TARGETS[target]
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, timeout=120,
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f'Importing {target} failed:\n{result.stderr[-2000:]}')
+    modules = parse_importtime(result.stderr)
+    return {
+        'target': target,
+        'wall_seconds': wall,
+        'import_seconds': sum(self_us for module, self_us, cumulative_us, depth in modules) / 1e6,
+        'modules': modules,
+    }
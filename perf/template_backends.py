@@ -0,0 +1,57 @@
+"""
+Template Render Timing
+Template backends whose templates add each top-level render's duration to
+the current request's metrics (see MetricsMiddleware). settings.TEMPLATES
+points at them while PERF_METRICS_ENABLED is on; nothing is patched, and
+with metrics off the stock backends are used.
+"""
+import time
+
+from django.template.backends import django as django_backend
+
+from .metrics import current_request_stats
+
+
+class TimedTemplate:
+    """Backend template wrapper timing render(); everything else is forwarded"""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        stats = current_request_stats.get()
+        if stats is None:
+            return self.template.render(context, request)
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            stats.template_time += time.perf_counter() - started
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+try:
+    from django.template.backends import jinja2 as jinja2_backend
+except ImportError:
+    # Jinja2 is optional (HOT_TEMPLATE_ENGINE)
+    jinja2_backend = None
+
+if jinja2_backend is not None:
+    class Jinja2(jinja2_backend.Jinja2):
+
+        def from_string(self, template_code):
+            return TimedTemplate(super().from_string(template_code))
+
+        def get_template(self, template_name):
+            return TimedTemplate(super().get_template(template_name))
@@ -0,0 +1,434 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from importlib.util import find_spec
+from pathlib import Path
+from random import Random
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connection, connections, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from django.template import engines
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from ecommerce_site.startup import warm_templates
+from orders.models import Order, OrderItem, Payment
+from shop.models import Category, Product
+from .datagen import default_plan, generate
+from .indexadvisor import advise, capture_storefront_workload, index_source, load_workload, migrations_for
+from .loadtest import LoadReport, compare_results, query_stats
+from .management.commands.bench_asgi import summarize_run
+from .metrics import collect
+from .middleware import MetricsMiddleware
+from .microbench import BENCHMARKS, compare, mann_whitney_z, summarize
+from .querybudget import QueryBudgetExceeded, query_budget, query_shape
+from .renderbench import PAGES, jinja2_enabled, normalize, render_page
+from .slowqueries import SlowQueryWatcher, explain, fingerprint, normalize_sql, slow_query_log
+from .sqlite_bench import checkout_write
+from .startup import by_package, parse_importtime, profile_startup
+from .template_backends import DjangoTemplates
+
+
+class QueryBudgetTests(TestCase):
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Books', slug='books')
+        for i in range(3):
+            Product.objects.create(category=self.category, name=f'Book {i}', slug=f'book-{i}', price=1, stock=1)
+
+    def test_query_shape_normalizes_in_lists(self):
+        self.assertEqual(
+            query_shape('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+            query_shape('SELECT * FROM t WHERE id IN (%s)'),
+        )
+
+    def test_over_budget(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, '2 queries executed, budget is 1'):
+            with query_budget(1):
+                list(Category.objects.all())
+                list(Product.objects.all())
+
+    def test_n_plus_one_is_reported_with_origin(self):
+        with self.assertRaises(QueryBudgetExceeded) as cm:
+            with query_budget(max_repeats=2):
+                for product in Product.objects.all():
+                    product.category.name
+        self.assertIn('possible N+1', str(cm.exception))
+        self.assertIn('perf/tests.py', str(cm.exception))
+
+        with query_budget(max_queries=1, max_repeats=1):
+            for product in Product.objects.select_related('category'):
+                product.category.name
+
+
+class BenchmarkComparisonTests(SimpleTestCase):
+
+    def _results(self, p95, throughput, queries):
+        return {
+            'summary': {'steps': [{'step': 'product_list', 'p95_ms': p95, 'throughput': throughput}]},
+            'queries': {'shop:product_list': {'queries_per_request': queries}},
+        }
+
+    def test_query_stats_uses_deltas(self):
+        before = {'shop:product_list': {'requests': 10, 'queries': 20, 'db_seconds': 0.1}}
+        after = {
+            'shop:product_list': {'requests': 15, 'queries': 30, 'db_seconds': 0.2},
+            'perf:metrics': {'requests': 2, 'queries': 0, 'db_seconds': 0.0},
+        }
+        stats = query_stats(before, after)
+        self.assertEqual(list(stats), ['shop:product_list'])
+        self.assertEqual(stats['shop:product_list']['requests'], 5)
+        self.assertEqual(stats['shop:product_list']['queries_per_request'], 2)
+
+    def test_regressions(self):
+        baseline = self._results(p95=100, throughput=50, queries=2)
+        lines, regressions = compare_results(baseline, self._results(105, 48, 2))
+        self.assertEqual(regressions, [])
+        lines, regressions = compare_results(baseline, self._results(130, 40, 4))
+        self.assertEqual(len(regressions), 3)
+
+    def test_summarize_server_run(self):
+        report = LoadReport()
+        report.started, report.finished = 1.0, 3.0
+        for latency in (0.01, 0.02, 0.03):
+            report.record('product_list', latency)
+        report.record('order_create', 1.0, ok=False)
+        summary = summarize_run(report)
+        self.assertEqual(summary['requests_per_s'], 2.0)
+        self.assertEqual(summary['errors'], 1)
+        self.assertAlmostEqual(summary['async_views_p95_ms'], 29.0)
+
+
+class MicrobenchTests(SimpleTestCase):
+
+    def _result(self, samples):
+        return {'samples': samples, 'stats': summarize(samples)}
+
+    def test_mann_whitney(self):
+        self.assertEqual(mann_whitney_z([1.0] * 10, [1.0] * 10), 0)
+        self.assertGreater(mann_whitney_z([1.0, 1.1, 0.9] * 5, [2.0, 2.1, 1.9] * 5), 1.96)
+
+    def test_compare_needs_significance_and_size(self):
+        baseline = self._result([1.0, 1.1, 0.9, 1.05, 0.95] * 4)
+        self.assertEqual(compare(baseline, self._result([1.5, 1.6, 1.4, 1.55, 1.45] * 4))[1], 'slower')
+        self.assertEqual(compare(baseline, self._result([0.5, 0.6, 0.4, 0.55, 0.45] * 4))[1], 'faster')
+        # Significant but below the threshold
+        self.assertEqual(compare(baseline, self._result([1.02, 1.12, 0.92, 1.07, 0.97] * 4))[1], 'same')
+
+    def test_benchmarks_run(self):
+        for name in ('cart.add', 'order.get_total_cost', 'stripe.dollars_to_cents'):
+            bench = BENCHMARKS[name]
+            bench.setup(bench.params[0])()
+
+    def test_database_fixtures_need_a_benchmark_database(self):
+        bench = BENCHMARKS['cart.iter']
+        with self.assertRaisesMessage(RuntimeError, 'benchmark_database()'):
+            bench.setup(bench.params[0])
+
+
+class DataGeneratorTests(TestCase):
+
+    def test_generate(self):
+        plan = default_plan(categories=3, products=50, users=10, orders=200, chunk_size=60)
+        counts = generate(plan)
+
+        self.assertEqual(Product.objects.filter(category__in=Category.objects.all()).count(), 50)
+        self.assertEqual(Order.objects.count(), 200)
+        self.assertEqual(Payment.objects.count(), 200)
+        self.assertEqual(OrderItem.objects.count(), counts['order_items'])
+        # Timestamps rise with the order id
+        created = list(Order.objects.order_by('id').values_list('created', flat=True))
+        self.assertEqual(created, sorted(created))
+        # Paid orders have a completed payment
+        self.assertFalse(Order.objects.filter(paid=True).exclude(payment__status='completed').exists())
+
+
+class StartupProfileTests(SimpleTestCase):
+
+    def test_parse_importtime(self):
+        stderr = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       120 |        120 |     stripe._error\n'
+            'import time:       300 |        420 |   stripe\n'
+            'import time:        50 |         50 | json\n'
+        )
+        modules = parse_importtime(stderr)
+        self.assertEqual(modules[0], ('stripe._error', 120, 120, 2))
+        self.assertEqual(by_package(modules), [('stripe', 2, 420), ('json', 1, 50)])
+
+    def test_urls_do_not_import_stripe(self):
+        modules = {module for module, *times in profile_startup('urls')['modules']}
+        self.assertIn('orders.views', modules)
+        self.assertNotIn('stripe', modules)
+
+
+@skipUnless(find_spec('jinja2'), 'Jinja2 is not installed')
+class TemplateEngineTests(SimpleTestCase):
+
+    def test_jinja2_renders_the_same_pages(self):
+        with jinja2_enabled():
+            for page, (template_name, make_context, sizes) in PAGES.items():
+                with self.subTest(page=page):
+                    django, jinja = (normalize(render_page(engine, page, sizes[0])()) for engine in ('django', 'jinja2'))
+                    self.assertIn('csrfmiddlewaretoken', django)
+                    self.assertEqual(jinja, django)
+
+    def test_warm_templates_compiles_both_engines(self):
+        with jinja2_enabled():
+            warm_templates()
+            cached_loader = engines['django'].engine.template_loaders[0]
+            self.assertIn('shop/product/list.html', cached_loader.get_template_cache)
+            self.assertIn('shop/product/list.html', {name for loader, name in engines['jinja2'].env.cache})
+
+
+@override_settings(PERF_METRICS_DIR='', PERF_METRICS_TOKEN='', PERF_METRICS_ALLOWED_IPS=[], TRUSTED_PROXIES=['127.0.0.1'])
+class MetricsEndpointTests(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name='Books', slug='books')
+        Product.objects.create(category=category, name='Book', slug='book', price=1, stock=1)
+
+    def test_closed_by_default(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+    @override_settings(PERF_METRICS_TOKEN='scrape-token')
+    def test_token(self):
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-token').status_code, 200)
+
+    @override_settings(PERF_METRICS_ALLOWED_IPS=['10.0.0.5'])
+    def test_allowed_ips_behind_the_proxy(self):
+        # The proxy itself is not a scraper
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_X_FORWARDED_FOR='203.0.113.10').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_X_FORWARDED_FOR='10.0.0.5').status_code, 200)
+        # Only the hop added by the trusted proxy counts
+        self.assertEqual(
+            self.client.get('/metrics', HTTP_X_FORWARDED_FOR='10.0.0.5, 203.0.113.10').status_code, 403
+        )
+
+    @override_settings(PERF_METRICS_TOKEN='scrape-token')
+    def test_exposition_format(self):
+        self.client.get(reverse('shop:product_list'))
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        lines = response.content.decode().splitlines()
+        self.assertIn('# TYPE django_view_requests counter', lines)
+        self.assertIn('# TYPE django_view_latency_seconds histogram', lines)
+        sample = re.compile(r'^[a-z_]+(\{[a-z_]+="[^"]*"(,[a-z_]+="[^"]*")*\})? [0-9.e+-]+$')
+        for line in lines:
+            if not line.startswith('#'):
+                self.assertRegex(line, sample)
+        self.assertTrue(any(
+            line.startswith('django_view_requests_total{') and 'view="shop:product_list"' in line for line in lines
+        ))
+        self.assertTrue(any(
+            line.startswith('django_view_latency_seconds_bucket{') and 'le="+Inf"' in line for line in lines
+        ))
+
+
+class MetricsCollectionTests(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name='Books', slug='books')
+        Product.objects.create(category=category, name='Book', slug='book', price=1, stock=1)
+        cache.clear()
+
+    def _template_seconds(self):
+        counters, histograms = collect()
+        return counters.get(('django_view_template_seconds', (('view', 'shop:product_list'),)), 0)
+
+    @override_settings(PERF_METRICS_DIR='')
+    def test_template_time_through_the_backend(self):
+        self.assertIsInstance(engines['django'], DjangoTemplates)
+        before = self._template_seconds()
+        self.client.get(reverse('shop:product_list'))
+        self.assertGreater(self._template_seconds(), before)
+
+        # Outside a request the template renders untimed
+        self.assertEqual(engines['django'].from_string('{{ 1|add:1 }}').render(), '2')
+
+    @override_settings(PERF_METRICS_ENABLED=False)
+    def test_disabled(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            MetricsMiddleware(lambda request: None)
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+    def test_snapshots_of_exited_workers_are_removed(self):
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory)
+        exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+        exited.wait()
+        snapshot = {'counters': [['django_view_requests', [['view', 'gone']], 5]], 'histograms': []}
+        (directory / f'metrics_{exited.pid}.json').write_text(json.dumps(snapshot))
+
+        with self.settings(PERF_METRICS_DIR=str(directory)):
+            counters, histograms = collect()
+        self.assertNotIn(('django_view_requests', (('view', 'gone'),)), counters)
+        self.assertEqual([path.name for path in directory.iterdir()], [f'metrics_{os.getpid()}.json'])
+
+
+@override_settings(PERF_SLOW_QUERY_MS=0.001, PERF_SLOW_QUERY_EXPLAIN_RATE=0)
+class SlowQueryLogTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        slow_query_log.clear()
+        category = Category.objects.create(name='Books', slug='books')
+        Product.objects.create(category=category, name='Book', slug='book', price=1, stock=1)
+
+    def test_fingerprint_ignores_literals(self):
+        self.assertEqual(
+            fingerprint(normalize_sql("SELECT * FROM t WHERE name = 'a' AND id IN (1, 2) LIMIT 21")),
+            fingerprint(normalize_sql("SELECT *  FROM t WHERE name = 'b''c' AND id IN (%s) LIMIT 5")),
+        )
+
+    def test_slow_queries_are_logged_with_view_origin_and_plan(self):
+        with self.assertLogs('perf.slowqueries', 'WARNING'):
+            self.client.get(reverse('shop:product_list_by_category', args=['books']))
+        rows = {row['normalized']: row for row in slow_query_log.top()}
+        products = next(row for sql, row in rows.items() if sql.startswith('SELECT') and '"shop_product"' in sql)
+        self.assertEqual(products['views'], [('shop:product_list_by_category', 1)])
+        self.assertIn('shop/views.py', products['origins'][0][0])
+        self.assertIn('shop_product', products['plan'])
+
+    def test_superuser_page(self):
+        with self.assertLogs('perf.slowqueries', 'WARNING'):
+            self.client.get(reverse('shop:product_list_by_category', args=['books']))
+            response = self.client.get('/admin/perf/slow-queries/')
+            self.assertEqual(response.status_code, 302)
+
+            User.objects.create_user('staff', password='secret', is_staff=True)
+            self.client.login(username='staff', password='secret')
+            self.assertEqual(self.client.get('/admin/perf/slow-queries/?format=json').status_code, 302)
+
+            User.objects.create_superuser('admin', password='secret')
+            self.client.login(username='admin', password='secret')
+            response = self.client.get('/admin/perf/slow-queries/')
+            self.assertContains(response, 'shop:product_list_by_category')
+            export = self.client.get('/admin/perf/slow-queries/?format=json').json()
+            self.assertIn('shop:product_list_by_category', {entry['view'] for entry in export['entries']})
+
+            self.client.post('/admin/perf/slow-queries/')
+        self.assertEqual(slow_query_log.recent(), [])
+
+    def _watch(self, query):
+        with self.assertLogs('perf.slowqueries', 'WARNING'), connection.execute_wrapper(
+            SlowQueryWatcher(RequestFactory().get('/'), threshold=0)
+        ):
+            query()
+        return slow_query_log.recent()[0]
+
+    def test_session_and_user_parameters_are_redacted(self):
+        entry = self._watch(lambda: Session.objects.filter(session_key='secret-session-key').first())
+        self.assertIsNone(entry['params'])
+        self.assertTrue(entry['params_redacted'])
+        entry = self._watch(lambda: User.objects.filter(username='ada').first())
+        self.assertIsNone(entry['params'])
+        self.assertNotIn('secret-session-key', json.dumps(slow_query_log.export(), cls=DjangoJSONEncoder))
+
+        entry = self._watch(lambda: Product.objects.filter(slug='book').first())
+        self.assertEqual(entry['params'], ['book'])
+        self.assertFalse(entry['params_redacted'])
+
+    def test_failed_explain_does_not_fail_the_query(self):
+        with mock.patch('perf.slowqueries.explain', side_effect=RuntimeError('no plan')):
+            with transaction.atomic():
+                entry = self._watch(lambda: Product.objects.filter(slug='book').first())
+                self.assertEqual(Product.objects.count(), 1)
+        self.assertEqual(slow_query_log.top()[0]['plan'], 'EXPLAIN failed: no plan')
+        self.assertEqual(entry['view'], 'unresolved')
+
+    def test_explain_errors_are_database_errors_and_keep_the_transaction(self):
+        with transaction.atomic():
+            with self.assertRaises(DatabaseError):
+                explain(connection, 'SELECT * FROM perf_missing_table', None)
+            self.assertEqual(Product.objects.count(), 1)
+
+
+class IndexAdvisorTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        generate(default_plan(categories=3, products=60, users=5, orders=100))
+
+    def test_storefront_replay_proposes_indexes(self):
+        workload = capture_storefront_workload(samples=2)
+        findings, proposals = advise(workload, min_rows=0, runs=1)
+
+        by_model = {proposal['model']._meta.label: proposal['index'] for proposal in proposals}
+        labels = {label: index_source(index) for label, index in by_model.items()}
+        self.assertIn("fields=['transaction_id']", labels['orders.Payment'])
+        self.assertIn("fields=['user', '-created']", labels['orders.Order'])
+        self.assertIn("fields=['category', 'name'], condition=models.Q(('available', True))", labels['shop.Product'])
+        for proposal in proposals:
+            self.assertGreater(proposal['fixed'], 0)
+            self.assertIn('CREATE INDEX', proposal['sql'])
+        # The indexes only existed while they were measured
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Payment._meta.db_table)
+        self.assertNotIn(by_model['orders.Payment'].name, constraints)
+
+        migrations = migrations_for(proposals)
+        self.assertEqual(set(migrations), {'orders', 'shop'})
+        path, source = migrations['orders']
+        self.assertTrue(path.endswith('_advised_indexes.py'))
+        self.assertIn('migrations.AddIndex(', source)
+
+    def test_load_workload(self):
+        entry = {
+            'sql': 'SELECT "orders_order"."id" FROM "orders_order" WHERE "orders_order"."email" = %s',
+            'params': ['a@example.com'], 'many': False, 'alias': 'default', 'view': 'orders:order_history',
+        }
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as f:
+            json.dump({'entries': [entry, entry, {**entry, 'sql': 'UPDATE "orders_order" SET "paid" = %s'}]}, f)
+            f.flush()
+            workload = load_workload([f.name])
+        self.assertEqual(workload.executions, 2)
+        self.assertEqual([shape['views'] for shape in workload.shapes.values()], [{'orders:order_history'}])
+
+
+class SQLiteBenchTests(TestCase):
+
+    def test_tuned_options_apply_to_new_connections(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        # A connection of its own, outside the test databases
+        connection = SQLiteDatabaseWrapper({
+            **connections['default'].settings_dict,
+            'NAME': str(Path(directory) / 'tuned.sqlite3'),
+            'OPTIONS': settings.SQLITE_TUNED_OPTIONS,
+        }, alias='bench_tuned_test')
+        self.addCleanup(connection.close)
+        with connection.cursor() as cursor:
+            pragmas = {}
+            for pragma in ('journal_mode', 'synchronous', 'temp_store', 'cache_size', 'mmap_size'):
+                cursor.execute(f'PRAGMA {pragma}')
+                pragmas[pragma] = cursor.fetchone()[0]
+        self.assertEqual(pragmas, {
+            'journal_mode': 'wal', 'synchronous': 1, 'temp_store': 2, 'cache_size': -20000, 'mmap_size': 268435456,
+        })
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+    def test_checkout_write_uses_valid_choices(self):
+        category = Category.objects.create(name='Books', slug='books')
+        product_ids = [
+            Product.objects.create(category=category, name=f'Book {i}', slug=f'book-{i}', price=1, stock=10).pk
+            for i in range(2)
+        ]
+        checkout_write('default', Random(1), product_ids)
+
+        payment = Payment.objects.select_related('order').get()
+        payment.full_clean()
+        payment.order.full_clean()
@@ -0,0 +1,56 @@
+import hmac
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.decorators import user_passes_test
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+
+from ecommerce_site.clientip import get_client_ip
+
+from .metrics import render_prometheus
+from .slowqueries import slow_query_log
+
+
+# The slow query log holds statements (and parameters) of every table
+superuser_required = user_passes_test(lambda user: user.is_active and user.is_superuser, login_url='admin:login')
+
+def metrics(request):
+    """
+    Prometheus scrape endpoint. Closed unless PERF_METRICS_TOKEN is set (then
+    scrape with 'Authorization: Bearer <token>') or the client IP, as seen
+    through TRUSTED_PROXIES, is in PERF_METRICS_ALLOWED_IPS.
+    """
+    if not settings.PERF_METRICS_ENABLED:
+        raise Http404
+    token = settings.PERF_METRICS_TOKEN
+    authorized = (
+        (token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'))
+        or get_client_ip(request) in settings.PERF_METRICS_ALLOWED_IPS
+    )
+    if not authorized:
+        return HttpResponseForbidden()
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@superuser_required
+def slow_queries(request):
+    """
+    Superuser page: this process's slow queries by fingerprint, with their
+    plans. ?format=json exports the ring buffer; POST clears it.
+    """
+    if request.method == 'POST':
+        slow_query_log.clear()
+        return redirect('slow_queries')
+    if request.GET.get('format') == 'json':
+        return JsonResponse(slow_query_log.export(), encoder=DjangoJSONEncoder, json_dumps_params={'indent': 2})
+    context = {
+        **admin.site.each_context(request),
+        'title': 'Slow queries',
+        'threshold_ms': settings.PERF_SLOW_QUERY_MS,
+        'top': slow_query_log.top(),
+        'recent': slow_query_log.recent(),
+    }
+    return TemplateResponse(request, 'admin/perf/slow_queries.html', context)
@@ -1,5 +1,14 @@
-from django.contrib import admin
+from decimal import Decimal
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Round
+
+from ecommerce_site.paginator import EstimatedCountPaginator
 from .models import Category, Product
+from .signals import products_changed
 
 
 @admin.register(Category)
@@ -8,11 +17,77 @@ class CategoryAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name',)}
 
 
+class ProductActionForm(ActionForm):
+    """Action form with the inputs used by the bulk price/stock actions"""
+    percent = forms.DecimalField(
+        required=False, max_digits=6, decimal_places=2,
+        label='Percent', help_text='e.g. 10 or -15',
+        widget=forms.NumberInput(attrs={'step': '0.01', 'style': 'width: 6em'})
+    )
+    stock = forms.IntegerField(
+        required=False, min_value=0,
+        label='Stock',
+        widget=forms.NumberInput(attrs={'style': 'width: 6em'})
+    )
+
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ['name', 'slug', 'category', 'price', 'stock', 'available', 'created', 'updated']
-    list_filter = ['available', 'created', 'updated', 'category']
+    # No filter on created/updated: sorting by the created column (indexed)
+    # finds recent products without an unindexed date-range filter
+    list_filter = ['available', 'category']
+    # Saves only the rows of the current page
     list_editable = ['price', 'stock', 'available']
+    list_select_related = ['category']
     prepopulated_fields = {'slug': ('name',)}
-    search_fields = ['name', 'description']
+    search_fields = ['^name', '=slug']
     ordering = ['-created']
+    raw_id_fields = ['category']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    action_form = ProductActionForm
+    actions = ['adjust_price', 'set_stock', 'toggle_availability']
+
+    def _bulk_update(self, queryset, **changes):
+        """Apply a single set-based UPDATE and notify storefront caches"""
+        updated = queryset.update(**changes)
+        products_changed.send(sender=Product)
+        return updated
+
+    @admin.action(description='Adjust price by percent')
+    def adjust_price(self, request, queryset):
+        percent = self._action_value(request, 'percent')
+        if percent is None:
+            self.message_user(request, 'Enter a percent to adjust prices by.', messages.ERROR)
+            return
+        factor = Decimal('1') + percent / Decimal('100')
+        if factor <= 0:
+            self.message_user(request, 'Prices cannot be reduced by 100% or more.', messages.ERROR)
+            return
+        updated = self._bulk_update(queryset, price=Round(F('price') * Value(factor), 2))
+        self.message_user(request, f'Adjusted the price of {updated} products by {percent}%.', messages.SUCCESS)
+
+    @admin.action(description='Set stock')
+    def set_stock(self, request, queryset):
+        stock = self._action_value(request, 'stock')
+        if stock is None:
+            self.message_user(request, 'Enter the stock level to set.', messages.ERROR)
+            return
+        updated = self._bulk_update(queryset, stock=stock)
+        self.message_user(request, f'Set stock to {stock} for {updated} products.', messages.SUCCESS)
+
+    @admin.action(description='Toggle availability')
+    def toggle_availability(self, request, queryset):
+        updated = self._bulk_update(
+            queryset, available=Case(When(available=True, then=Value(False)), default=Value(True))
+        )
+        self.message_user(request, f'Toggled availability of {updated} products.', messages.SUCCESS)
+
+    def _action_value(self, request, field):
+        """Read a cleaned value from the action form"""
+        form = self.action_form(request.POST)
+        form.fields['action'].choices = self.get_action_choices(request)
+        if not form.is_valid():
+            return None
+        return form.cleaned_data[field]
@@ -0,0 +1,15 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from ecommerce_site.staticfiles import build_tailwind
+
+
+class Command(BaseCommand):
+    help = 'Build the purged, minified Tailwind stylesheet for collectstatic (needs `npm install`).'
+
+    def handle(self, *args, **options):
+        try:
+            output = build_tailwind()
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f'Built {output}.'))
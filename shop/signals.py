@@ -0,0 +1,25 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal
+
+from ecommerce_site.cache import bump_namespace
+
+
+# Sent when products change without going through Model.save()/delete(),
+# e.g. set-based queryset.update() calls from the admin bulk actions, which
+# can touch every product, so no ids are sent. The catalog cache listens to
+# it alongside post_save and post_delete.
+products_changed = Signal()
+
+
+def invalidate_catalog(sender, **kwargs):
+    """Drop every cached catalog read (see shop.views._catalog) once committed"""
+    transaction.on_commit(lambda: bump_namespace('catalog'))
+
+
+def connect_catalog_invalidation():
+    from .models import Category, Product
+    for model in (Category, Product):
+        post_save.connect(invalidate_catalog, sender=model, dispatch_uid=f'catalog-save-{model.__name__}')
+        post_delete.connect(invalidate_catalog, sender=model, dispatch_uid=f'catalog-delete-{model.__name__}')
+    products_changed.connect(invalidate_catalog, dispatch_uid='catalog-products-changed')
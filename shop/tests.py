@@ -1,3 +1,166 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.admin import helpers
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from ecommerce_site.cache import versioned_key
+from perf.querybudget import QueryBudgetMixin
+from .models import Category, Product
+
+
+class ShopQueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Books', slug='books')
+        self.products = [
+            Product.objects.create(
+                category=self.category, name=f'Book {i}', slug=f'book-{i}',
+                price=Decimal('10.00'), stock=5
+            )
+            for i in range(5)
+        ]
+
+    def test_product_list(self):
+        with self.assertQueryBudget(2):
+            self.client.get(reverse('shop:product_list'))
+        # Cached page for anonymous visitors
+        with self.assertQueryBudget(0):
+            self.client.get(reverse('shop:product_list'))
+
+    def test_product_list_by_category(self):
+        with self.assertQueryBudget(2):
+            self.client.get(reverse('shop:product_list_by_category', args=['books']))
+
+    def test_product_detail(self):
+        with self.assertQueryBudget(2):
+            self.client.get(self.products[0].get_absolute_url())
+
+    def test_checkout(self):
+        with self.assertQueryBudget(0):
+            self.client.get(reverse('shop:checkout'))
+
+
+@override_settings(ASYNC_VIEWS=True)
+class AsyncShopViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Books', slug='books')
+        self.products = [
+            Product.objects.create(
+                category=self.category, name=f'Book {i}', slug=f'book-{i}',
+                price=Decimal('10.00'), stock=5
+            )
+            for i in range(5)
+        ]
+
+    def test_resolves_to_async_views(self):
+        self.assertEqual(resolve(reverse('shop:product_list')).func.__name__, 'aproduct_list')
+        with self.settings(ASYNC_VIEWS=False):
+            self.assertEqual(resolve(reverse('shop:product_list')).func.__name__, 'product_list')
+
+    async def test_product_list(self):
+        response = await self.async_client.get(reverse('shop:product_list'))
+        self.assertContains(response, 'Book 4')
+        # Served from the page cache
+        response = await self.async_client.get(reverse('shop:product_list'))
+        self.assertContains(response, 'Book 4')
+
+    async def test_product_list_by_category(self):
+        response = await self.async_client.get(reverse('shop:product_list_by_category', args=['books']))
+        self.assertContains(response, 'Book 0')
+        response = await self.async_client.get(reverse('shop:product_list_by_category', args=['missing']))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_logged_in_user_with_uncached_query_string(self):
+        user = await User.objects.acreate_user('ada', password='secret')
+        await self.async_client.aforce_login(user)
+        for url in (reverse('shop:product_list') + '?utm_source=x', self.products[0].get_absolute_url() + '?x=1'):
+            response = await self.async_client.get(url)
+            self.assertContains(response, 'Hello, ada')
+
+    async def test_product_detail(self):
+        response = await self.async_client.get(self.products[0].get_absolute_url())
+        self.assertContains(response, 'Book 0')
+        self.assertContains(response, 'Book 1')
+        response = await self.async_client.get(reverse('shop:product_detail', args=[self.products[0].id, 'wrong']))
+        self.assertEqual(response.status_code, 404)
+
+
+class ProductAdminActionTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Books', slug='books')
+        self.products = [
+            Product.objects.create(
+                category=category, name=f'Book {i}', slug=f'book-{i}',
+                price=Decimal('10.00'), stock=5, available=i % 2 == 0
+            )
+            for i in range(4)
+        ]
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'secret'))
+
+    def _run(self, action, products=None, **data):
+        selected = {'select_across': 1} if products is None else {'select_across': 0}
+        version = versioned_key('catalog')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('admin:shop_product_changelist'), {
+                'action': action,
+                helpers.ACTION_CHECKBOX_NAME: [product.pk for product in products or self.products[:1]],
+                'index': 0,
+                **selected,
+                **data,
+            })
+        self.assertEqual(response.status_code, 302)
+        # The storefront catalog cache was invalidated
+        self.assertNotEqual(versioned_key('catalog'), version)
+
+    def test_adjust_price_across_all_products(self):
+        with CaptureQueriesContext(connection) as queries:
+            self._run('adjust_price', percent='-12.5')
+        # One UPDATE over the changelist queryset, without loading the ids
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn(' IN (', updates[0])
+        self.assertEqual(set(Product.objects.values_list('price', flat=True)), {Decimal('8.75')})
+
+    def test_set_stock(self):
+        self._run('set_stock', self.products[:2], stock=0)
+        self.assertEqual(
+            list(Product.objects.order_by('id').values_list('stock', flat=True)), [0, 0, 5, 5]
+        )
+
+    def test_toggle_availability(self):
+        self._run('toggle_availability')
+        self.assertEqual(
+            list(Product.objects.order_by('id').values_list('available', flat=True)), [False, True, False, True]
+        )
+
+    def test_missing_value_changes_nothing(self):
+        response = self.client.post(reverse('admin:shop_product_changelist'), {
+            'action': 'set_stock', helpers.ACTION_CHECKBOX_NAME: [self.products[0].pk], 'index': 0,
+        }, follow=True)
+        self.assertContains(response, 'Enter the stock level to set.')
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).stock, 5)
+
+    def test_list_editable(self):
+        data = {'form-TOTAL_FORMS': 4, 'form-INITIAL_FORMS': 4, '_save': 'Save'}
+        for i, product in enumerate(self.products):
+            data.update({
+                f'form-{i}-id': product.pk, f'form-{i}-price': '10.00', f'form-{i}-stock': 5,
+                f'form-{i}-available': 'on' if product.available else '',
+            })
+        data['form-1-stock'] = 9
+        version = versioned_key('catalog')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('admin:shop_product_changelist'), data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Product.objects.get(pk=self.products[1].pk).stock, 9)
+        self.assertNotEqual(versioned_key('catalog'), version)
@@ -1,11 +1,15 @@
 from django.urls import path
+from ecommerce_site.async_views import async_path
 from . import views
 
 app_name = 'shop'
 
 urlpatterns = [
-    path('', views.product_list, name='product_list'),
-    path('category/<slug:category_slug>/', views.product_list, name='product_list_by_category'),
-    path('<int:id>/<slug:slug>/', views.product_detail, name='product_detail'),
+    async_path('', views.product_list, views.aproduct_list, name='product_list'),
+    async_path(
+        'category/<slug:category_slug>/', views.product_list, views.aproduct_list,
+        name='product_list_by_category'
+    ),
+    async_path('<int:id>/<slug:slug>/', views.product_detail, views.aproduct_detail, name='product_detail'),
     path('checkout/', views.checkout, name='checkout'),
 ]
\ No newline at end of file
@@ -1,36 +1,73 @@
-from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponse
+from django.conf import settings
+from django.shortcuts import render, redirect
+from django.http import Http404, HttpResponse
+from ecommerce_site.async_views import alist
+from ecommerce_site.cache import aget_or_compute, aversioned_key, get_or_compute, versioned_key
+from ecommerce_site.page_cache import page_cache
 from .models import Category, Product
 from cart.forms import CartAddProductForm
 
 # Views for the e-commerce functionality
 
+def _catalog(compute, *parts):
+    """Cache a catalog read; invalidated whenever products or categories change"""
+    return get_or_compute(versioned_key('catalog', *parts), compute, ttl=settings.CATALOG_CACHE_TTL)
+
+async def _acatalog(compute, *parts):
+    """_catalog() for async views; ``compute`` returns an awaitable"""
+    key = await aversioned_key('catalog', *parts)
+    return await aget_or_compute(key, compute, ttl=settings.CATALOG_CACHE_TTL)
+
+def _available_products(category=None):
+    products = Product.objects.filter(available=True)
+    if category:
+        products = products.filter(category=category)
+    return products
+
+def _find_category(categories, category_slug):
+    category = next((c for c in categories if c.slug == category_slug), None)
+    if category is None:
+        raise Http404('No Category matches the given query.')
+    return category
+
+def _related_products(product):
+    return Product.objects.filter(
+        category_id=product.category_id,
+        available=True
+    ).exclude(id=product.id)[:4]
+
+@page_cache
 def product_list(request, category_slug=None):
     """Display list of products, optionally filtered by category"""
     category = None
-    categories = Category.objects.all()
-    products = Product.objects.filter(available=True)
+    categories = _catalog(lambda: list(Category.objects.all()), 'categories')
     
     if category_slug:
-        category = get_object_or_404(Category, slug=category_slug)
-        products = products.filter(category=category)
+        category = _find_category(categories, category_slug)
+    
+    products = _catalog(
+        lambda: list(_available_products(category)), 'products', category.id if category else 'all'
+    )
     
     return render(request, 'shop/product/list.html', {
         'category': category,
         'categories': categories,
         'products': products
-    })
+    }, using=settings.HOT_TEMPLATE_ENGINE)
 
+@page_cache
 def product_detail(request, id, slug):
     """Display detailed view of a single product"""
-    product = get_object_or_404(Product, id=id, slug=slug, available=True)
+    product = _catalog(
+        lambda: Product.objects.select_related('category').filter(id=id, available=True).first(),
+        'product', id
+    )
+    if product is None or product.slug != slug:
+        raise Http404('No Product matches the given query.')
     cart_product_form = CartAddProductForm()
     
     # Get related products from the same category
-    related_products = Product.objects.filter(
-        category=product.category,
-        available=True
-    ).exclude(id=product.id)[:4]
+    related_products = _catalog(lambda: list(_related_products(product)), 'related', product.id)
     
     return render(request, 'shop/product/detail.html', {
         'product': product,
@@ -38,6 +75,43 @@ def product_detail(request, id, slug):
         'related_products': related_products
     })
 
+@page_cache
+async def aproduct_list(request, category_slug=None):
+    """product_list() for ASGI, reading the catalog without holding a thread"""
+    category = None
+    categories = await _acatalog(lambda: alist(Category.objects.all()), 'categories')
+    
+    if category_slug:
+        category = _find_category(categories, category_slug)
+    
+    products = await _acatalog(
+        lambda: alist(_available_products(category)), 'products', category.id if category else 'all'
+    )
+    
+    return render(request, 'shop/product/list.html', {
+        'category': category,
+        'categories': categories,
+        'products': products
+    }, using=settings.HOT_TEMPLATE_ENGINE)
+
+@page_cache
+async def aproduct_detail(request, id, slug):
+    """product_detail() for ASGI"""
+    product = await _acatalog(
+        lambda: Product.objects.select_related('category').filter(id=id, available=True).afirst(),
+        'product', id
+    )
+    if product is None or product.slug != slug:
+        raise Http404('No Product matches the given query.')
+    
+    related_products = await _acatalog(lambda: alist(_related_products(product)), 'related', product.id)
+    
+    return render(request, 'shop/product/detail.html', {
+        'product': product,
+        'cart_product_form': CartAddProductForm(),
+        'related_products': related_products
+    })
+
 def checkout(request):
     """Handle checkout process - redirect to order creation"""
     return redirect('orders:order_create')
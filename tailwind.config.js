@@ -1,9 +1,13 @@
 /** @type {import('tailwindcss').Config} */
 module.exports = {
+  // Every file that can contain class names; anything else is purged
   content: [
-    './shop/templates/**/*.html',
+    './templates/**/*.html',
+    './jinja2/**/*.html',
+    './{shop,cart,accounts,orders}/{templates,jinja2}/**/*.html',
     './static/**/*.js',
-    './shop/**/*.py',
+    // Form widgets set classes in Python
+    './{shop,cart,accounts,orders}/*.py',
   ],
   theme: {
     extend: {
@@ -18,4 +22,4 @@ module.exports = {
     },
   },
   plugins: [],
-}
\ No newline at end of file
+}